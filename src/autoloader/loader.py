@@ -135,11 +135,13 @@ class AutoLoader:
     def reload_module(self, path):
         """Reload the module to integrate changes.
         
-        If the module was not imported, do nothing.
+        If the module was not imported, do nothing.  The dispatcher's
+        lock is held in write mode:  the running requests are
+        completed and the new ones wait for the module to be reloaded.
         
         """
         if path in self.loaded_modules:
-            with self.server.dispatcher.req_lock:
+            with self.server.dispatcher.req_lock.write():
                 module, rule_name = self.loaded_modules[path]
                 rule = self.rules[rule_name]
                 rule.unload(module)
@@ -41,4 +41,6 @@ class ServerConfiguration(Configuration):
             "forwarding_port": Data("the port on which to forward the " \
                     "data (could be different from the port itself)",
                     type=int, default=None),
+            "concurrent_dispatch": Data("should the requests be dispatched " \
+                    "concurrently", type=bool, default=True),
     })
@@ -0,0 +1,327 @@
+# Copyright (c) 2013 LE GOFF Vincent
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the names of its contributors
+#   may be used to endorse or promote products derived from this software
+#   without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT
+# OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""This module contains the object caches used by the repository managers.
+
+The repository manager keeps, for each model, a cache of the model
+objects it has loaded or created ({primary key: object}).  The
+cache of each model follows a policy:
+    unbounded -- the objects stay in cache until they are removed
+    lru -- the least recently used objects are evicted first
+    lfu -- the least frequently used objects are evicted first
+
+The bounded policies ('lru' and 'lfu') keep at most 'max_entries'
+objects in cache.  Any policy can also have a 'ttl' (time to live,
+in seconds):  an object cached for longer is evicted.
+
+The policies are set in the data connector's configuration file
+(data_connector.yml), under the 'cache' key.  The 'default' entry
+applies to every model without specific policy:
+    cache:
+        default:
+            policy: lru
+            max_entries: 1000
+            ttl: 600
+        User:
+            policy: lfu
+            max_entries: 200
+
+Each cache counts its hits, misses and evictions (see the
+'statistics' method).  An object that can't be evicted (because
+it has not been saved yet) stays in cache, even if the cache grows
+beyond its bound.  The object just added is never evicted to make
+room for itself.
+
+"""
+
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from time import monotonic
+
+class ObjectCache(MutableMapping):
+
+    """Cache of model objects for a single model, with no bound.
+
+    This class can be used as a dictionary {primary key: object}.
+    The 'fetch' method should be used to look for an object, since
+    it updates the statistics and the policy (using '[]' or 'get'
+    doesn't).  The subclasses define the eviction policy by
+    overriding the 'touch', 'forget' and 'victims' methods.
+
+    Two optional callbacks can be given to the constructor:
+        can_evict -- called with an object, return whether the
+                object can be evicted
+        on_evict -- called with an object when it has been evicted.
+
+    """
+
+    policy = "unbounded"
+
+    def __init__(self, max_entries=None, ttl=None, can_evict=None,
+            on_evict=None):
+        self.objects = {}
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.can_evict = can_evict
+        self.on_evict = on_evict
+        self.expiries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return "<{} cache ({} objects)>".format(self.policy, len(self))
+
+    def __getitem__(self, key):
+        return self.objects[key]
+
+    def __setitem__(self, key, model_object):
+        self.objects[key] = model_object
+        self.touch(key)
+        if self.ttl is not None:
+            self.expiries.pop(key, None)
+            self.expiries[key] = monotonic() + self.ttl
+
+        self.expire()
+        self.shrink(keep=key)
+
+    def __delitem__(self, key):
+        del self.objects[key]
+        self.forget(key)
+        self.expiries.pop(key, None)
+
+    def __iter__(self):
+        return iter(self.objects)
+
+    def __len__(self):
+        return len(self.objects)
+
+    def fetch(self, key):
+        """Return the cached object or None.
+
+        The statistics are updated.  An expired object is evicted
+        and None is returned.
+
+        """
+        model_object = self.objects.get(key)
+        if model_object is not None and self.ttl is not None and \
+                self.expiries[key] <= monotonic() and self.evict(key):
+            model_object = None
+
+        if model_object is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.touch(key)
+
+        return model_object
+
+    def evict(self, key):
+        """Evict the object stored with this key.
+
+        Return whether the object was evicted:  if the 'can_evict'
+        callback returns False, the object is kept in cache.
+
+        """
+        model_object = self.objects[key]
+        if self.can_evict and not self.can_evict(model_object):
+            return False
+
+        del self[key]
+        self.evictions += 1
+        if self.on_evict:
+            self.on_evict(model_object)
+
+        return True
+
+    def expire(self):
+        """Evict the expired objects.
+
+        An expired object that can't be evicted is kept for
+        another TTL.
+
+        """
+        now = monotonic()
+        kept = []
+        while self.expiries:
+            key, expiry = next(iter(self.expiries.items()))
+            if expiry > now:
+                break
+
+            if not self.evict(key):
+                del self.expiries[key]
+                kept.append(key)
+
+        for key in kept:
+            self.expiries[key] = now + self.ttl
+
+    def shrink(self, keep=None):
+        """Evict objects until the cache doesn't exceed its bound.
+
+        The object stored with the 'keep' key is not evicted.
+
+        """
+        if self.max_entries is None:
+            return
+
+        while len(self.objects) > self.max_entries:
+            for key in self.victims():
+                if key != keep and self.evict(key):
+                    break
+            else:
+                break
+
+    def touch(self, key):
+        """The object stored with this key has been used."""
+        pass
+
+    def forget(self, key):
+        """The object stored with this key has been removed."""
+        pass
+
+    def victims(self):
+        """Return an iterator on the keys to evict, in order."""
+        return iter(())
+
+    def statistics(self):
+        """Return a dictionary containing the cache's statistics."""
+        lookups = self.hits + self.misses
+        return {
+            "policy": self.policy,
+            "size": len(self),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+
+class LRUCache(ObjectCache):
+
+    """Cache evicting the least recently used objects first."""
+
+    policy = "lru"
+
+    def __init__(self, *args, **kwargs):
+        ObjectCache.__init__(self, *args, **kwargs)
+        self.order = OrderedDict()
+
+    def touch(self, key):
+        """The object has been used, move it to the end."""
+        if key in self.order:
+            self.order.move_to_end(key)
+        else:
+            self.order[key] = None
+
+    def forget(self, key):
+        """Remove the key from the order."""
+        self.order.pop(key, None)
+
+    def victims(self):
+        """Return the keys, the least recently used first."""
+        return iter(self.order)
+
+
+class LFUCache(ObjectCache):
+
+    """Cache evicting the least frequently used objects first.
+
+    The keys are stored in buckets (one bucket per number of uses).
+    The least recently used key of a bucket is evicted first.
+
+    """
+
+    policy = "lfu"
+
+    def __init__(self, *args, **kwargs):
+        ObjectCache.__init__(self, *args, **kwargs)
+        self.uses = {}
+        self.buckets = {}
+
+    def touch(self, key):
+        """The object has been used, move it to the next bucket."""
+        uses = self.uses.get(key, 0)
+        if uses:
+            self.remove_from_bucket(key, uses)
+
+        self.uses[key] = uses + 1
+        self.buckets.setdefault(uses + 1, OrderedDict())[key] = None
+
+    def forget(self, key):
+        """Remove the key from its bucket."""
+        uses = self.uses.pop(key, None)
+        if uses:
+            self.remove_from_bucket(key, uses)
+
+    def remove_from_bucket(self, key, uses):
+        """Remove the key from the bucket of this number of uses."""
+        bucket = self.buckets[uses]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[uses]
+
+    def victims(self):
+        """Return the keys, the least frequently used first."""
+        for uses in sorted(self.buckets):
+            for key in self.buckets[uses]:
+                yield key
+
+
+POLICIES = {
+    "unbounded": ObjectCache,
+    "lru": LRUCache,
+    "lfu": LFUCache,
+}
+
+def create_cache(configuration=None, can_evict=None, on_evict=None):
+    """Create and return a cache based on the configuration.
+
+    The configuration is a dictionary which can contain the
+    'policy' (the name of one of the POLICIES, 'unbounded' by
+    default), the 'max_entries' and the 'ttl' (in seconds).  If
+    the configuration is not valid, raise a ValueError.
+
+    """
+    configuration = configuration or {}
+    policy = configuration.get("policy", "unbounded")
+    max_entries = configuration.get("max_entries")
+    ttl = configuration.get("ttl")
+    if policy not in POLICIES:
+        raise ValueError("unknown cache policy {}".format(repr(policy)))
+
+    if max_entries is not None:
+        max_entries = int(max_entries)
+        if max_entries < 1:
+            raise ValueError("the cache must contain at least one entry")
+
+    if ttl is not None:
+        ttl = float(ttl)
+
+    return POLICIES[policy](max_entries, ttl, can_evict, on_evict)
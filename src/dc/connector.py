@@ -28,6 +28,7 @@
 
 """This file contains the DataConnector class, defined below."""
 
+from contextlib import contextmanager, nullcontext
 import os
 import yaml
 
@@ -58,13 +59,106 @@ class DataConnector:
     def u_lock(self):
         return self.driver.u_lock
 
-    def setup(self, configuration_path):
-        """Try to setup and open the data connector."""
+    @property
+    def r_lock(self):
+        """Return the lock to hold while reading.
+
+        If the driver can read concurrently (see
+        'Driver.concurrent_reads'), the reads are not serialized and
+        a context manager doing nothing is returned.  Otherwise, it's
+        the 'u_lock', also held by the writes.
+
+        """
+        if self.driver.concurrent_reads:
+            return nullcontext()
+
+        return self.u_lock
+
+    def begin_request(self):
+        """Begin a request for the current thread.
+
+        Until the end of the request (see 'release_connection'), the
+        updated objects are written at once (see
+        'RepositoryManager.begin_request').
+
+        """
+        self.repository_manager.begin_request()
+
+    def release_connection(self):
+        """Release the connection used by the current thread.
+
+        The objects modified during the request are written first.
+
+        """
+        try:
+            self.repository_manager.end_request()
+        finally:
+            self.driver.release_connection()
+
+    def stream(self, iterator):
+        """Iterate over the iterator, locking the data connector.
+
+        The data connector is only locked (see 'r_lock') to get the
+        next element, so that other threads can use it while the
+        elements are processed.  This is used to stream model objects
+        (see Repository.iter_all and Query.iterate).
+
+        """
+        while True:
+            with self.r_lock:
+                try:
+                    element = next(iterator)
+                except StopIteration:
+                    return
+
+            yield element
+
+    @contextmanager
+    def transaction(self):
+        """Group the changes made in the block in a transaction.
+
+        >>> with data_connector.transaction():
+        ...     user.username = "Bob"
+        ...     repository.delete(post)
+
+        The changes are committed at the end of the block.  If an
+        exception is raised, the transaction is rolled back (the
+        modified objects are restored) and the exception is raised
+        again.  The data connector is locked during the transaction.
+
+        The queries made in the block read the changes of the
+        transaction.  If the data storage has no transaction (like
+        MongoDB), the changes are sent before these queries and are
+        visible to the other clients until the transaction ends (if
+        it's rolled back, they are then cancelled).
+
+        """
+        with self.u_lock:
+            self.repository_manager.begin()
+            try:
+                yield
+            except BaseException:
+                self.repository_manager.rollback()
+                raise
+            else:
+                self.repository_manager.commit()
+
+    def setup(self, configuration_path, **options):
+        """Try to setup and open the data connector.
+
+        The options, if any, replace the entries of the configuration.
+
+        """
         config = type(self).configuration
         configuration = config.read_YAML(configuration_path)
+        for name, value in options.items():
+            configuration[name] = value
+
         self.driver.open(configuration)
+        self.repository_manager.set_cache_policies(
+                configuration.get("cache", {}))
 
-    def setup_test(self):
+    def setup_test(self, **options):
         """Setup for testing."""
         path = "tests/config/dc/" + type(self).name + ".yml"
-        self.setup(path)
+        self.setup(path, **options)
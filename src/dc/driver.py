@@ -29,7 +29,7 @@
 """This file contains the Driver class, described below."""
 
 from abc import *
-from threading import RLock
+from threading import RLock, local
 
 from dc.converters import *
 from dc.exceptions import *
@@ -92,6 +92,16 @@ class Driver(metaclass=ABCMeta):
 
         return value
 
+    def storage_to_value(self, name, field_name, value):
+        """Return a stored attribute converted back."""
+        table = self.tables[name]
+        type_field = table.fields[field_name].name_type
+        if type(self).converters.get(type_field):
+            converter = type(self).converters[type_field]
+            value = converter.to_object(value)
+
+        return value
+
     def storage_to_line(self, table_name, line):
         """Return the converted line of data."""
         # First we get the table's field
@@ -115,8 +125,35 @@ class Driver(metaclass=ABCMeta):
         # Locks for threads
         self.u_lock = RLock()
         self.running = False
+        self.transactions = local()
+        self.in_transaction = False
         self.tables = {}
 
+    @property
+    def in_transaction(self):
+        """Return whether the current thread is in a transaction.
+
+        The transaction state is kept for each thread, like the
+        connections of a pool.
+
+        """
+        return getattr(self.transactions, "active", False)
+
+    @in_transaction.setter
+    def in_transaction(self, active):
+        self.transactions.active = active
+
+    @property
+    def concurrent_reads(self):
+        """Return whether the threads can read at the same time.
+
+        If True, the reads don't hold the 'u_lock' (see
+        'DataConnector.r_lock'):  each thread should have its own
+        connection.  By default, the reads are serialized.
+
+        """
+        return False
+
     @abstractmethod
     def can_run(self):
         """Return whether the driver can run or not.
@@ -162,6 +199,44 @@ class Driver(metaclass=ABCMeta):
         self.clear()
         self.close()
 
+    def release_connection(self):
+        """Release the connection used by the current thread.
+
+        This method is called at the end of each request.  By
+        default, nothing is done.
+
+        """
+        pass
+
+    def begin(self):
+        """Begin a transaction.
+
+        Until 'commit' or 'rollback' is called, the driver should
+        defer its writes (or use a real transaction if the data storage
+        supports it).  Transactions are not nested:  the repository
+        manager only calls 'begin' for the outermost transaction.
+
+        """
+        self.in_transaction = True
+
+    def commit(self):
+        """Commit (write) the changes made during the transaction."""
+        self.in_transaction = False
+
+    def rollback(self):
+        """Cancel the changes made during the transaction."""
+        self.in_transaction = False
+
+    def send_pending(self):
+        """Send the writes deferred during the transaction.
+
+        This method is called before the driver is queried during a
+        transaction, so that the transaction reads its own writes.
+        By default, nothing is done (the writes are not deferred).
+
+        """
+        pass
+
     @abstractmethod
     def add_table(self, table):
         """Add a new table to the driver, if it doesn't exist.
@@ -186,6 +261,17 @@ class Driver(metaclass=ABCMeta):
         """
         return []
 
+    def iter_lines(self, table_name, batch_size):
+        """Iterate over the table's lines.
+
+        The lines (dictionaries) should be read from the data storage
+        by batches of 'batch_size' lines, so that the whole table
+        doesn't have to be in memory at once.  By default, the lines
+        returned by 'query_for_lines' are iterated over.
+
+        """
+        yield from self.query_for_lines(table_name)
+
     @abstractmethod
     def query_for_line(self, table_name, identifiers):
         """Query for the specified line.
@@ -212,6 +298,22 @@ class Driver(metaclass=ABCMeta):
         """
         pass
 
+    def find_lines_in(self, table_name, field_name, values):
+        """Return the lines whose field's value is one of 'values'.
+
+        This method is used to load the related objects of several
+        objects at once.  By default, 'find_matching_lines' is called
+        for each value.  The drivers should redefine this method to
+        select the lines with a single query.
+
+        """
+        lines = []
+        for value in values:
+            lines.extend(self.find_matching_lines(table_name,
+                    {field_name: value}))
+
+        return lines
+
     @abstractmethod
     def add_line(self, table_name, line):
         """Add a new line to the table.
@@ -229,6 +331,20 @@ class Driver(metaclass=ABCMeta):
         """
         pass
 
+    def add_lines(self, table_name, lines):
+        """Add several lines to the table.
+
+        The lines are a list of dictionaries (see 'add_line').  This
+        method should return a list of dictionaries, one for each line,
+        containing the values set by the driver (like the auto
+        increment fields), as 'add_line' does.
+
+        By default, 'add_line' is called for each line.  The drivers
+        should redefine this method to add the lines at once.
+
+        """
+        return [self.add_line(table_name, line) for line in lines]
+
     @abstractmethod
     def update_line(self, table_name, identifiers, element, value):
         """Update an existing table line.
@@ -250,6 +366,30 @@ class Driver(metaclass=ABCMeta):
         """
         pass
 
+    def update_fields(self, table_name, identifiers, values):
+        """Update several fields of an existing table line.
+
+        The values are given as a dictionary {element: value}.  See
+        'update_line' for the other arguments.  By default,
+        'update_line' is called for each field.  The drivers should
+        redefine this method to update the line at once.
+
+        """
+        for element, value in values.items():
+            self.update_line(table_name, identifiers, element, value)
+
+    def update_lines(self, updates):
+        """Update several lines at once.
+
+        The updates are a list of tuples (table_name, identifiers,
+        values), with the arguments of 'update_fields'.  By default,
+        'update_fields' is called for each line.  The drivers should
+        redefine this method to send the updates together.
+
+        """
+        for table_name, identifiers, values in updates:
+            self.update_fields(table_name, identifiers, values)
+
     @abstractmethod
     def remove_line(self, table_name, identifiers):
         """Delete a line.
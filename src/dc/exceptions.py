@@ -50,3 +50,9 @@ class ConnexionAlreadyEstablished(ConnectorError):
     """This exception raised when trying to open a already-open connexion."""
 
     pass
+
+class PoolTimeout(ConnectorError):
+
+    """Exception raised when no pooled connection could be checked out."""
+
+    pass
@@ -30,20 +30,80 @@
 
 from abc import *
 
+from dc.cache import create_cache
 from dc.driver import Driver
+from dc.generic.sql.pool import ConnectionPool
 from dc import exceptions
 
 class SQLDriver(Driver):
 
-    """Generic driver for sending SQL queries."""
+    """Generic driver for sending SQL queries.
+
+    The prepared statements (or anything the driver needs to execute
+    a statement again) are kept in the 'statements' cache, keyed on
+    the SQL text.  This cache is a bounded LRU cache (see dc.cache),
+    whose size can be set with the 'statement_cache_size'
+    configuration.  It's cleared when the tables are created or
+    dropped.
+
+    By default, a single connection is shared by every thread.  If
+    the configuration contains a 'pool' dictionary, a pool of
+    connections is used instead (see dc.generic.sql.pool):  each
+    thread checks out its own connection and releases it at the end
+    of the request (see 'release_connection').  The pool is
+    configured with the following keys:
+        min_size -- the number of connections opened (default 1)
+        max_size -- the maximum number of connections (default 10)
+        timeout -- the seconds to wait for a connection (default 30)
+        health_check -- check a connection before using it (default
+                True).
+    Since the prepared statements are bound to their connection,
+    each connection has its own statement cache.  With a pool, the
+    threads read concurrently (see 'concurrent_reads'), each on its
+    own connection, whereas the writes are still serialized.
+
+    The IN_CHUNK class attribute is the maximum number of values
+    given to a single 'IN (...)' condition (see 'find_lines_in').
+
+    """
 
     SQL_TYPES = {}
+    DDL_KEYWORDS = ("ALTER", "CREATE", "DROP")
+    IN_CHUNK = 500
+    STATEMENT_CACHE_SIZE = 100
 
     def __init__(self):
         Driver.__init__(self)
         self.format = "?"
         self.tables = {}
-        self.connection = None
+        self.single_connection = None
+        self.pool = None
+        self.statement_cache_size = type(self).STATEMENT_CACHE_SIZE
+        self.statement_caches = {}
+
+    @property
+    def connection(self):
+        """Return the connection of the current thread."""
+        if self.pool is not None:
+            return self.pool.get()
+
+        return self.single_connection
+
+    @property
+    def concurrent_reads(self):
+        """Return whether the threads can read at the same time."""
+        return self.pool is not None
+
+    @property
+    def statements(self):
+        """Return the statement cache of the current connection."""
+        connection = self.connection
+        cache = self.statement_caches.get(id(connection))
+        if cache is None:
+            cache = self.build_statement_cache(self.statement_cache_size)
+            self.statement_caches[id(connection)] = cache
+
+        return cache
 
     def generate_formats(self, nb):
         """Generate a tuple of formatted values.
@@ -62,20 +122,75 @@ class SQLDriver(Driver):
         return formats
 
     def open(self, configuration):
-        """Open the connection.
+        """Open the connection (or the connection pool).
 
-        The connection must be set up in the 'connection' instance
-        attribute.  While redefining this method, you MUST call the
-        parent AFTER setting up the connection.
+        The connections are opened by the 'connect' method.  While
+        redefining this method, you MUST call the parent AFTER reading
+        the configuration needed by 'connect'.
 
         """
         Driver.open(self, configuration)
+        self.statement_cache_size = configuration.get(
+                "statement_cache_size", type(self).STATEMENT_CACHE_SIZE)
+        self.statement_caches = {}
+        pool = configuration.get("pool")
+        if pool:
+            check = None
+            if pool.get("health_check", True):
+                check = self.check_connection
+
+            self.pool = ConnectionPool(self.connect, self.close_connection,
+                    check, min_size=int(pool.get("min_size", 1)),
+                    max_size=int(pool.get("max_size", 10)),
+                    timeout=float(pool.get("timeout", 30)))
+            self.pool.open()
+        else:
+            self.single_connection = self.connect()
+
         self.check_existing_tables()
 
     def close(self):
         """Close the data connector (simply close the conection)."""
         Driver.close(self)
-        self.connection.close()
+        self.close_connections()
+
+    @abstractmethod
+    def connect(self):
+        """Open and return a new connection."""
+        pass
+
+    def check_connection(self, connection):
+        """Return whether the connection can still be used."""
+        return True
+
+    def close_connection(self, connection):
+        """Close a connection and release its cached statements."""
+        cache = self.statement_caches.pop(id(connection), None)
+        if cache is not None:
+            for prepared in cache.values():
+                self.release_statement(prepared)
+
+        connection.close()
+
+    def close_connections(self):
+        """Close the connection or the connection pool."""
+        if self.pool is not None:
+            self.pool.release_thread()
+            self.pool.close()
+            self.pool = None
+        elif self.single_connection is not None:
+            self.close_connection(self.single_connection)
+            self.single_connection = None
+
+    def release_connection(self):
+        """Release the connection of the current thread.
+
+        With a connection pool, the connection is given back to the
+        pool (except during a transaction).  Otherwise, nothing is done.
+
+        """
+        if self.pool is not None and not self.in_transaction:
+            self.pool.release_thread()
 
     def clear(self):
         """Clear (delete) the stored datas."""
@@ -83,10 +198,67 @@ class SQLDriver(Driver):
             if table is not None:
                 self.execute_query("DROP TABLE {}".format(name))
         self.tables = {}
+        self.clear_statements()
 
     def destroy(self):
         """Erase EVERY stored data."""
-        self.connection.close()
+        self.close_connections()
+
+    def build_statement_cache(self, size):
+        """Return a new statement cache of the given size."""
+        return create_cache({"policy": "lru", "max_entries": size},
+                on_evict=self.release_statement)
+
+    def is_ddl(self, statement):
+        """Return whether the statement changes the tables (DDL)."""
+        keyword = statement.lstrip().split(" ", 1)[0].upper()
+        return keyword in type(self).DDL_KEYWORDS
+
+    def get_statement(self, statement):
+        """Return the prepared statement, from the cache if possible.
+
+        If the statement is not in the cache, it's prepared (see
+        'prepare') and cached.
+
+        """
+        prepared = self.statements.fetch(statement)
+        if prepared is None:
+            prepared = self.prepare(statement)
+            self.statements[statement] = prepared
+
+        return prepared
+
+    def prepare(self, statement):
+        """Prepare the statement and return it.
+
+        This method should be redefined by the drivers which use
+        the statement cache.
+
+        """
+        raise NotImplementedError
+
+    def release_statement(self, prepared):
+        """Release a prepared statement removed from the cache."""
+        pass
+
+    def clear_statements(self):
+        """Release and remove every cached statement.
+
+        The statements of the current connection are released, the
+        caches of the other connections (used by other threads) are
+        simply forgotten.
+
+        """
+        statements = self.statements
+        for prepared in statements.values():
+            self.release_statement(prepared)
+
+        statements.clear()
+        self.statement_caches = {id(self.connection): statements}
+
+    def statement_statistics(self):
+        """Return the statistics of the statement cache."""
+        return self.statements.statistics()
 
     @abstractmethod
     def check_existing_tables(self):
@@ -102,8 +274,33 @@ class SQLDriver(Driver):
         """
         pass
 
+    def iter_query(self, statement, *args, batch_size):
+        """Execute a query and iterate over the returned rows.
+
+        The rows should be fetched by batches of 'batch_size' rows.  By
+        default, they are all fetched at once by 'execute_query'.
+
+        """
+        yield from self.execute_query(statement, *args)
+
+    def execute_many(self, statement, rows):
+        """Execute the same statement with several rows of arguments.
+
+        By default, the statement is executed once for each row.
+        Drivers should redefine this method if their library can
+        execute it more efficiently.
+
+        """
+        for row in rows:
+            self.execute_query(statement, *row)
+
     def add_table(self, table):
-        """Add the new table if it doesn't exist."""
+        """Add the new table if it doesn't exist.
+
+        The table's indexes are created if they don't exist, even if
+        the table itself already exists.
+
+        """
         name = table.name
         existing_tables = list(self.tables.keys())
         Driver.add_table(self, table)
@@ -119,6 +316,17 @@ class SQLDriver(Driver):
             query = "CREATE TABLE {} ({})".format(name, ", ".join(sql_fields))
             self.execute_query(query)
 
+        for index_name, field_names, unique in table.indexes:
+            self.execute_query(self.instruction_create_index(name,
+                    index_name, field_names, unique))
+
+    def instruction_create_index(self, table_name, index_name, field_names,
+            unique=False):
+        """Return the instruction used to create an index."""
+        return "CREATE {}INDEX IF NOT EXISTS {} ON {} ({})".format(
+                "UNIQUE " if unique else "", index_name, table_name,
+                ", ".join(field_names))
+
     def instruction_create_field(self, field_name, constraint):
         """Return the instruction used to create a simple field."""
         sql_field = type(self).SQL_TYPES[constraint.name_type]
@@ -149,6 +357,14 @@ class SQLDriver(Driver):
 
         return lines
 
+    def iter_lines(self, table_name, batch_size):
+        """Iterate over the table's lines, fetched by batches."""
+        table = self.tables[table_name]
+        names = list(table.fields.keys())
+        query = "SELECT * FROM " + table_name
+        for row in self.iter_query(query, batch_size=batch_size):
+            yield dict(zip(names, row))
+
     def query_for_line(self, table_name, identifiers):
         """Query for the specified line.
 
@@ -207,13 +423,39 @@ class SQLDriver(Driver):
 
         return lines
 
-    def add_line(self, table_name, line):
-        """Add a new line."""
+    def find_lines_in(self, table_name, field_name, values):
+        """Return the lines whose field's value is one of 'values'.
+
+        The values are sent by chunks of IN_CHUNK values, each chunk
+        being selected with a single 'IN (...)' query.
+
+        """
+        table = self.tables[table_name]
+        names = list(table.fields.keys())
+        values = list(values)
+        size = type(self).IN_CHUNK
+        lines = []
+        for i in range(0, len(values), size):
+            chunk = values[i:i + size]
+            query = "SELECT * FROM {} WHERE {} IN ({})".format(table_name,
+                    field_name, ", ".join(self.generate_formats(len(chunk))))
+            for row in self.execute_query(query, *chunk):
+                lines.append(dict(zip(names, row)))
+
+        return lines
+
+    def build_insert(self, table_name):
+        """Return the INSERT statement of the table.
+
+        The returned tuple contains:
+            The INSERT statement (with formats for the values)
+            The list of field names to be inserted
+            The list of auto increment field names (not inserted).
+
+        """
         table = self.tables[table_name]
-        ret = {}
         query = "INSERT INTO " + table_name + " ("
         names = []
-        values = []
         auto_increments = []
         for field_name, constraint in table.fields.items():
             if constraint.has("auto_increment"):
@@ -221,32 +463,89 @@ class SQLDriver(Driver):
                 continue
 
             names.append(field_name)
-            values.append(line.get(field_name))
 
         query += ", ".join(names) + ") values("
-        query += ", ".join(self.generate_formats(len(values))) + ")"
-        self.execute_query(query, *values)
-
-        for field in auto_increments:
-            query = "SELECT max(" + field + ") FROM " + table_name
-            row = self.execute_query(query, many=False)
-            value = row[0]
-            ret[field] = value
+        query += ", ".join(self.generate_formats(len(names))) + ")"
+        return query, names, auto_increments
 
+    def add_line(self, table_name, line):
+        """Add a new line."""
+        query, names, auto_increments = self.build_insert(table_name)
+        values = [line.get(name) for name in names]
+        ret = self.insert_line(table_name, query, values, auto_increments)
         self.save()
         return ret
 
+    def add_lines(self, table_name, lines):
+        """Add several lines and commit once.
+
+        Without auto increment field, the statement is executed with
+        the 'execute_many' method.  Otherwise, the lines are inserted
+        one by one (see 'insert_line'), so that the value of each
+        line is read from the database, whatever the other writers
+        do in the meantime.
+
+        """
+        if not lines:
+            return []
+
+        query, names, auto_increments = self.build_insert(table_name)
+        rows = [tuple(line.get(name) for name in names) for line in lines]
+        if not auto_increments:
+            self.execute_many(query, rows)
+            rets = [{} for line in lines]
+        else:
+            rets = [self.insert_line(table_name, query, row,
+                    auto_increments) for row in rows]
+
+        self.save()
+        return rets
+
+    def insert_line(self, table_name, statement, values, auto_increments):
+        """Execute the INSERT statement and return the auto increments.
+
+        The returned dictionary contains the value of each auto
+        increment field of the inserted line.  By default, they are
+        read by 'last_auto_increment', right after the insertion.
+
+        """
+        self.execute_query(statement, *values)
+        return dict((field, self.last_auto_increment(table_name, field)) \
+                for field in auto_increments)
+
+    def last_auto_increment(self, table_name, field):
+        """Return the last value of an auto increment field.
+
+        This method is called right after a line has been inserted.
+        By default, the maximum value is returned, which is only
+        reliable without concurrent writers:  the drivers should
+        redefine it (or 'insert_line') to read the value of the
+        line inserted by the current connection.
+
+        """
+        query = "SELECT max(" + field + ") FROM " + table_name
+        row = self.execute_query(query, many=False)
+        return row[0]
+
     def update_line(self, table_name, identifiers, element, value):
-        """Update a line (does nothing)."""
-        params = [value]
+        """Update a line."""
+        self.update_fields(table_name, identifiers, {element: value})
+
+    def update_fields(self, table_name, identifiers, values):
+        """Update several fields of a line with a single statement."""
+        params = list(values.values())
         params.extend(identifiers.values())
-        names = []
         formats = self.generate_formats(len(params))
+        sets = []
+        for i, element in enumerate(values):
+            sets.append(element + "=" + formats[i])
+
+        names = []
         for i, name in enumerate(identifiers):
-            format = formats[i + 1]
+            format = formats[len(values) + i]
             names.append(name + "={}".format(format))
 
-        query = "UPDATE " + table_name + " SET " + element + "=" + formats[0]
+        query = "UPDATE " + table_name + " SET " + ", ".join(sets)
         query += " WHERE " + " AND ".join(names)
         self.execute_query(query, *params)
         self.save()
@@ -0,0 +1,164 @@
+# Copyright (c) 2013 LE GOFF Vincent
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the names of its contributors
+#   may be used to endorse or promote products derived from this software
+#   without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT
+# OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Module defining the ConnectionPool class, described below."""
+
+from threading import Condition, local
+from time import monotonic
+
+from dc.exceptions import PoolTimeout
+
+class ConnectionPool:
+
+    """A pool of database connections shared by the threads.
+
+    The connections are created by the 'connect' callable and closed
+    by the 'close' one.  A thread checks out a connection the first
+    time it needs it (see 'get') and keeps it until it releases it
+    (see 'release_thread'), usually at the end of the request.  Thus
+    each thread works with its own connection.
+
+    The pool keeps at least 'min_size' connections and never opens
+    more than 'max_size' connections.  If no connection is available,
+    the thread waits at most 'timeout' seconds before a PoolTimeout
+    exception is raised.  If specified, the 'check' callable is called
+    with an idle connection before it's checked out:  if it returns
+    False, the connection is closed and replaced.
+
+    """
+
+    def __init__(self, connect, close, check=None, min_size=1,
+            max_size=10, timeout=30):
+        self.connect = connect
+        self.close_connection = close
+        self.check = check
+        self.min_size = min_size
+        self.max_size = max(min_size, max_size)
+        self.timeout = timeout
+        self.condition = Condition()
+        self.idle = []
+        self.size = 0
+        self.local = local()
+
+    def __repr__(self):
+        return "<ConnectionPool ({} connections, {} idle)>".format(
+                self.size, len(self.idle))
+
+    def open(self):
+        """Open the first 'min_size' connections."""
+        while self.size < self.min_size:
+            connection = self.connect()
+            with self.condition:
+                self.size += 1
+                self.idle.append(connection)
+
+    def close(self):
+        """Close the idle connections.
+
+        The connections checked out are closed when released.
+
+        """
+        with self.condition:
+            idle = self.idle
+            self.idle = []
+            self.size -= len(idle)
+            self.max_size = 0
+
+        for connection in idle:
+            self.close_connection(connection)
+
+    def get(self):
+        """Return the connection of the current thread.
+
+        If the thread has no connection, one is checked out.
+
+        """
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self.acquire()
+            self.local.connection = connection
+
+        return connection
+
+    def release_thread(self):
+        """Release the connection of the current thread, if any."""
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            self.local.connection = None
+            self.release(connection)
+
+    def acquire(self):
+        """Check out and return a connection.
+
+        Raise a PoolTimeout exception if no connection is available
+        after 'timeout' seconds.
+
+        """
+        deadline = monotonic() + self.timeout
+        with self.condition:
+            while not self.idle and self.size >= self.max_size:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout("no connection available after " \
+                            "{} seconds".format(self.timeout))
+
+                self.condition.wait(remaining)
+
+            if self.idle:
+                connection = self.idle.pop()
+            else:
+                connection = None
+                self.size += 1
+
+        if connection is not None and self.check and \
+                not self.check(connection):
+            self.close_connection(connection)
+            connection = None
+
+        if connection is None:
+            try:
+                connection = self.connect()
+            except Exception:
+                with self.condition:
+                    self.size -= 1
+                    self.condition.notify()
+                raise
+
+        return connection
+
+    def release(self, connection):
+        """Give back a connection checked out by 'acquire'."""
+        with self.condition:
+            if self.size <= self.max_size:
+                self.idle.append(connection)
+                self.condition.notify()
+                return
+
+            self.size -= 1
+
+        self.close_connection(connection)
@@ -29,7 +29,9 @@
 """Module defining the SqLQueryManager class, defined below."""
 
 from abc import *
+from threading import Lock
 
+from dc.cache import create_cache
 from dc.query_manager import QueryManager
 from model.functions import *
 
@@ -43,35 +45,46 @@ class SQLQueryManager(QueryManager):
     (or suport them the same way).  Therefore, this class should
     be inherited to integrate specific behaviors.
 
-    """
+    The NO_LIMIT class attribute contains the LIMIT parameter used when
+    the query only has an offset.
 
-    def query(self, query):
-        """Look for the specified objects."""
-        model = query.first_model
-        plural_name = get_plural_name(model)
-        table = self.driver.tables[plural_name]
-        fields = table.fields
-        statement = "SELECT * FROM {}".format(plural_name)
-        if query.filters:
-            statement += " WHERE "
+    The statements are kept in a cache (the plans), with the shape
+    of the query as key:  the model class (a reloaded model doesn't
+    use the plans of the previous class), the filtered fields and
+    their operators, the connectors, the ordering and so on.  When a
+    query with the same shape is executed again, only the parameters
+    have to be bound.  The size of this cache is set by the
+    PLAN_CACHE_SIZE class attribute.  Since the queries can be
+    executed by several threads at once, the plans are protected by
+    the 'p_lock'.
 
-        values = []
-        list_formats = self.driver.generate_formats(
-                sum(len(filter.parameters) for filter in query.filters))
-        j = 0
-        for i, filter in enumerate(query.filters):
-            formats = []
-            for parameter in filter.parameters:
-                formats.append(list_formats[j])
-                j += 1
+    """
 
-            if i != 0:
-                connector = query.connectors[i - 1]
-                statement += " " + connector.upper() + " "
+    NO_LIMIT = None
+    PLAN_CACHE_SIZE = 256
+    FILTER_METHODS = {
+        "=": "op_equal",
+        "!=": "op_notequal",
+        "<": "op_lowerthan",
+        "<=": "op_lowerequal",
+        ">": "op_greaterthan",
+        ">=": "op_greaterequal",
+        "between": "op_between",
+        "in": "op_in",
+        "is null": "op_isnull",
+        "startswith": "op_startswith",
+        "like": "op_like",
+    }
 
-            statement += self.get_statement_from_filter(filter, formats)
-            values.extend(self.get_parameters_for_filter(filter))
+    def __init__(self, driver, repository_manager):
+        QueryManager.__init__(self, driver, repository_manager)
+        self.plans = create_cache({"policy": "lru",
+                "max_entries": type(self).PLAN_CACHE_SIZE})
+        self.p_lock = Lock()
 
+    def query(self, query):
+        """Look for the specified objects."""
+        statement, values, fields = self.build_select(query)
         lines = self.driver.execute_query(statement, *values)
         dict_lines = []
         for line in lines:
@@ -83,17 +96,244 @@ class SQLQueryManager(QueryManager):
 
         return dict_lines
 
-    def get_statement_from_filter(self, filter, formats):
-        """Return the corresponding statement."""
+    def iter_query(self, query, batch_size):
+        """Iterate over the lines, fetched by batches."""
+        statement, values, fields = self.build_select(query)
+        for line in self.driver.iter_query(statement, *values,
+                batch_size=batch_size):
+            yield dict(zip(fields, line))
+
+    def query_values(self, query, batch_size=None):
+        """Select the projected columns only."""
+        statement, values, fields = self.build_select(query,
+                query.projection)
+        if batch_size is None:
+            rows = self.driver.execute_query(statement, *values)
+        else:
+            rows = self.driver.iter_query(statement, *values,
+                    batch_size=batch_size)
+
+        converters = self.get_converters(query.first_model, fields)
+        if not any(converters):
+            yield from (tuple(row) for row in rows)
+            return
+
+        for row in rows:
+            yield tuple(value if converter is None or value is None else \
+                    converter.to_object(value) for converter, value in \
+                    zip(converters, row))
+
+    def query_aggregate(self, query, function, field_name):
+        """Compute the aggregate with a SQL aggregate function."""
+        plural_name = get_plural_name(query.first_model)
+        column = function.upper() + "(" + (field_name or "*") + ")"
+        statement, values, fields = self.build_select(query,
+                query.grouping + [column], aggregate=True)
+        rows = self.driver.execute_query(statement, *values)
+        results = {}
+        for row in rows:
+            group = tuple(self.driver.storage_to_value(plural_name, name,
+                    value) for name, value in zip(query.grouping, row))
+            if len(group) == 1:
+                group = group[0]
+
+            result = row[-1]
+            if function in ("min", "max") and result is not None:
+                result = self.driver.storage_to_value(plural_name,
+                        field_name, result)
+
+            results[group] = result
+
+        if query.grouping:
+            return results
+
+        return results[()]
+
+    def query_exists(self, query):
+        """Return whether the query selects at least one line."""
+        statement, values, fields = self.build_select(query)
+        statement = "SELECT EXISTS ({})".format(statement)
+        return bool(self.driver.execute_query(statement, *values,
+                many=False)[0])
+
+    def build_select(self, query, columns=None, aggregate=False):
+        """Return the SELECT statement corresponding to the query.
+
+        A tuple (statement, values, fields) is returned, the values
+        being the parameters of the statement and the fields the name
+        of the selected columns.  The statement is read from the
+        plans if a query with the same shape was already built.
+
+        Optional arguments:
+            columns -- the list of selected columns (every field if None)
+            aggregate -- True if the columns contain aggregate functions:
+                    the query's grouping is added and, if the query is
+                    paginated, the lines are selected in a sub-query.
+
+        """
+        filter_values = [self.get_values_for_filter(filter) for filter in \
+                query.filters]
+        keyset = self.get_keyset(query)
+        paginated = query.nb_limit is not None or bool(query.nb_offset)
+        shape = (query.first_model, tuple((filter.field,
+                filter.operator.name, len(parameters)) for filter, \
+                parameters in zip(query.filters, filter_values)),
+                tuple(query.connectors), tuple((name, descending) for \
+                name, descending, value in keyset),
+                tuple(query.get_ordering()), paginated,
+                None if columns is None else tuple(columns), aggregate,
+                tuple(query.grouping))
+        with self.p_lock:
+            plan = self.plans.fetch(shape)
+
+        if plan is None:
+            plan = self.build_plan(query, columns, aggregate, filter_values,
+                    keyset, paginated)
+            with self.p_lock:
+                self.plans[shape] = plan
+
+        statement, fields = plan
+        values = [value for parameters in filter_values for value in \
+                parameters]
+        values.extend(self.get_values_for_keyset(keyset))
+        if paginated:
+            limit = query.nb_limit
+            values.append(type(self).NO_LIMIT if limit is None else limit)
+            values.append(query.nb_offset)
+
+        return statement, values, fields
+
+    def build_plan(self, query, columns, aggregate, filter_values, keyset,
+            paginated):
+        """Build and return the statement of the query.
+
+        A tuple (statement, fields) is returned.  The parameters are
+        the ones used by 'build_select':  'filter_values' contains
+        the list of values of each filter (see 'get_values_for_filter')
+        and 'keyset' is the query's keyset (see
+        QueryManager.get_keyset).
+
+        """
+        model = query.first_model
+        plural_name = get_plural_name(model)
+        table = self.driver.tables[plural_name]
+        fields = list(columns or table.fields.keys())
+        subquery = aggregate and paginated
+        if columns is None or subquery:
+            selection = "*"
+        else:
+            selection = ", ".join(columns)
+
+        statement = "SELECT {} FROM {}".format(selection, plural_name)
+        nb_keyset = len(keyset) * (len(keyset) + 1) // 2
+        list_formats = iter(self.driver.generate_formats(
+                sum(len(parameters) for parameters in filter_values) + \
+                nb_keyset + (2 if paginated else 0)))
+        if query.filters or keyset:
+            statement += " WHERE "
+
+        conditions = ""
+        for i, filter in enumerate(query.filters):
+            formats = [next(list_formats) for parameter in filter_values[i]]
+            if i != 0:
+                connector = query.connectors[i - 1]
+                conditions += " " + connector.upper() + " "
+
+            conditions += self.get_statement_from_filter(filter, formats)
+
+        if keyset:
+            if conditions:
+                conditions = "(" + conditions + ") AND "
+
+            conditions += self.get_statement_from_keyset(keyset,
+                    list_formats)
+
+        statement += conditions
+        ordering = query.get_ordering()
+        if ordering and (subquery or not aggregate):
+            statement += " ORDER BY " + ", ".join(name + (" DESC" if \
+                    descending else " ASC") for name, descending in ordering)
+
+        if paginated:
+            statement += " LIMIT {} OFFSET {}".format(next(list_formats),
+                    next(list_formats))
+
+        if subquery:
+            statement = "SELECT {} FROM ({}) AS selected".format(
+                    ", ".join(columns), statement)
+        if aggregate and query.grouping:
+            statement += " GROUP BY " + ", ".join(query.grouping)
+
+        return statement, fields
+
+    def get_statement_from_keyset(self, keyset, formats):
+        """Return the statement selecting the lines after the keyset.
+
+        The keyset is a list of (field_name, descending, value) (see
+        QueryManager.get_keyset).  For instance, a keyset on
+        (published_at DESC, id ASC) gives:
+            (published_at<? OR (published_at=? AND id>?))
+        The formats are read from the 'formats' iterator.  The
+        parameters are returned by 'get_values_for_keyset', in
+        the same order.
+
+        """
+        clauses = []
+        for i, (name, descending, value) in enumerate(keyset):
+            clause = []
+            for previous, previous_descending, previous_value in \
+                    keyset[:i]:
+                clause.append(previous + "=" + next(formats))
+
+            operator = "<" if descending else ">"
+            clause.append(name + operator + next(formats))
+            if len(clause) == 1:
+                clauses.append(clause[0])
+            else:
+                clauses.append("(" + " AND ".join(clause) + ")")
+
+        return "(" + " OR ".join(clauses) + ")"
+
+    @staticmethod
+    def get_values_for_keyset(keyset):
+        """Return the parameters of the keyset's statement."""
+        values = []
+        for i, (name, descending, value) in enumerate(keyset):
+            values.extend(previous_value for previous, previous_descending, \
+                    previous_value in keyset[:i])
+            values.append(value)
+
+        return values
+
+    def get_values_for_filter(self, filter):
+        """Return the list of the statement's values for the filter.
+
+        The parameters are converted (see 'get_parameters_for_filter').
+        The sequences of the 'in' operator are flattened (a format
+        is used for each value) and the prefix of the 'startswith'
+        operator is converted into a LIKE pattern.
+
+        """
         operator = filter.operator.name
-        methods = {
-                "=": self.op_equal,
-                "!=": self.op_notequal,
-                "<": self.op_lowerthan,
-                "<=": self.op_lowerequal,
-        }
+        parameters = self.get_parameters_for_filter(filter)
+        if operator == "in":
+            return list(parameters[0])
+        elif operator == "startswith":
+            prefix = parameters[0]
+            for character in "\\%_":
+                prefix = prefix.replace(character, "\\" + character)
+            return [prefix + "%"]
+
+        return list(parameters)
+
+    def get_statement_from_filter(self, filter, formats):
+        """Return the corresponding statement.
+
+        The method is found in the FILTER_METHODS class attribute.
 
-        return methods[operator](filter, formats)
+        """
+        method = type(self).FILTER_METHODS[filter.operator.name]
+        return getattr(self, method)(filter, formats)
 
     def op_equal(self, filter, formats):
         """Return the statement corresponding to the equal (=) operator."""
@@ -110,3 +350,44 @@ class SQLQueryManager(QueryManager):
     def op_lowerthan(self, filter, formats):
         """Return the statement corresponding to the lowerthan (<) operator."""
         return filter.field + "<" + formats[0]
+
+    def op_greaterthan(self, filter, formats):
+        """Return the statement corresponding to the '>' operator."""
+        return filter.field + ">" + formats[0]
+
+    def op_greaterequal(self, filter, formats):
+        """Return the statement corresponding to the '>=' operator."""
+        return filter.field + ">=" + formats[0]
+
+    def op_between(self, filter, formats):
+        """Return the statement corresponding to the between operator."""
+        return filter.field + " BETWEEN " + formats[0] + " AND " + formats[1]
+
+    def op_in(self, filter, formats):
+        """Return the statement corresponding to the in operator.
+
+        A format is expected for each value.  An empty list of values
+        doesn't select anything.
+
+        """
+        if not formats:
+            return "1=0"
+
+        return filter.field + " IN (" + ", ".join(formats) + ")"
+
+    def op_isnull(self, filter, formats):
+        """Return the statement corresponding to the is null operator."""
+        return filter.field + " IS NULL"
+
+    def op_startswith(self, filter, formats):
+        """Return the statement corresponding to the startswith operator.
+
+        The prefix is converted into a pattern (see
+        'get_values_for_filter') so that LIKE can use an index.
+
+        """
+        return filter.field + " LIKE " + formats[0] + " ESCAPE '\\'"
+
+    def op_like(self, filter, formats):
+        """Return the statement corresponding to the like operator."""
+        return filter.field + " LIKE " + formats[0]
@@ -44,9 +44,11 @@ class SQLRepositoryManager(RepositoryManager):
         """Add the new model."""
         table = self.build_table(model)
         self.driver.add_table(table)
+        self.build_indexes(model)
 
     def save(self):
         """Commit the database connexion."""
+        self.flush()
         self.driver.save()
 
     def add_object(self, model_object):
@@ -0,0 +1,311 @@
+# Copyright (c) 2013 LE GOFF Vincent
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the names of its contributors
+#   may be used to endorse or promote products derived from this software
+#   without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT
+# OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""This module contains the cache indexes used by the repository managers.
+
+An index is a structure bound to a model's field which allows to find
+cached objects without browsing every cached object.  There are two
+types of indexes:
+    HashIndex -- a dictionary {value: objects}, used for equality
+    SortedIndex -- a sorted list of values, also used for comparisons
+
+The indexes are declared on the model's fields, using the 'index'
+argument:
+    class Post(Model):
+        title = String(index=True)  # or index="hash"
+        published_at = DateTime(index="sorted")
+
+The indexes are built and maintained by the repository manager (see
+dc.repository_manager.RepositoryManager).  They only index the cached
+objects, therefore they are useful to query connectors that keep all
+their objects in cache (like the YAML connector).
+
+"""
+
+from bisect import bisect_left, bisect_right
+
+from model.types import BaseType
+from query.operators import LikeOperator
+
+class Index:
+
+    """Abstract class for a cache index.
+
+    Each index is bound to a field (the field's name is stored in
+    the 'field_name' attribute).  The indexed objects are stored in
+    the index with the field's value, therefore an index doesn't
+    need to read the objects to remove them:  the old value should
+    be provided.
+
+    The 'operators' class attribute is a dictionary containing, as keys,
+    the name of the query operators (see the query.operators package)
+    the index can answer and, as values, the name of the method to call.
+
+    """
+
+    operators = {}
+
+    def __init__(self, field_name):
+        self.field_name = field_name
+
+    def __repr__(self):
+        return "<{} on {}>".format(type(self).__name__, self.field_name)
+
+    def get_value(self, model_object):
+        """Return the indexed value of the model object.
+
+        If the field is not set, None is returned.
+
+        """
+        value = getattr(model_object, self.field_name)
+        if isinstance(value, BaseType):
+            value = None
+
+        return value
+
+    def can_lookup(self, operator):
+        """Return whether the index can answer this operator."""
+        return operator in type(self).operators
+
+    def lookup(self, operator, *parameters):
+        """Return the list of objects matching the operator.
+
+        The operator is the name of the query operator (like '=').
+
+        """
+        method = getattr(self, type(self).operators[operator])
+        return method(*parameters)
+
+    def add(self, model_object, value):
+        """Add the model object, with the specified value."""
+        raise NotImplementedError
+
+    def remove(self, model_object, value):
+        """Remove the model object, indexed with the specified value.
+
+        Return whether the object was found in the index.
+
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """Remove all the indexed objects."""
+        raise NotImplementedError
+
+
+class HashIndex(Index):
+
+    """Index based on a dictionary, used to test equality.
+
+    The values of the field must be hashable.
+
+    """
+
+    operators = {
+        "=": "equal",
+        "in": "in_values",
+        "is null": "is_null",
+    }
+
+    def __init__(self, field_name):
+        Index.__init__(self, field_name)
+        self.values = {}
+
+    def add(self, model_object, value):
+        """Add the model object, with the specified value."""
+        self.values.setdefault(value, {})[id(model_object)] = model_object
+
+    def remove(self, model_object, value):
+        """Remove the model object."""
+        objects = self.values.get(value)
+        if not objects or id(model_object) not in objects:
+            return False
+
+        del objects[id(model_object)]
+        if not objects:
+            del self.values[value]
+
+        return True
+
+    def clear(self):
+        """Remove all the indexed objects."""
+        self.values.clear()
+
+    def equal(self, value):
+        """Return the objects whose value is equal to the parameter."""
+        return list(self.values.get(value, {}).values())
+
+    def in_values(self, values):
+        """Return the objects whose value is one of the parameters."""
+        objects = []
+        for value in set(values):
+            objects.extend(self.values.get(value, {}).values())
+
+        return objects
+
+    def is_null(self):
+        """Return the objects without value."""
+        return self.equal(None)
+
+
+class SortedIndex(Index):
+
+    """Index based on a sorted list of values, used to compare them.
+
+    The values (except None) should be comparable with each other.
+    The objects whose value is None are stored separately and
+    only returned when looking for None.
+
+    """
+
+    operators = {
+        "=": "equal",
+        "<": "lower_than",
+        "<=": "lower_equal",
+        ">": "greater_than",
+        ">=": "greater_equal",
+        "between": "between",
+        "in": "in_values",
+        "is null": "is_null",
+        "startswith": "starts_with",
+        "like": "like",
+    }
+
+    def __init__(self, field_name):
+        Index.__init__(self, field_name)
+        self.keys = []
+        self.objects = []
+        self.nulls = {}
+
+    def add(self, model_object, value):
+        """Add the model object, with the specified value."""
+        if value is None:
+            self.nulls[id(model_object)] = model_object
+            return
+
+        i = bisect_right(self.keys, value)
+        self.keys.insert(i, value)
+        self.objects.insert(i, model_object)
+
+    def remove(self, model_object, value):
+        """Remove the model object."""
+        if value is None:
+            return self.nulls.pop(id(model_object), None) is not None
+
+        start = bisect_left(self.keys, value)
+        end = bisect_right(self.keys, value)
+        for i in range(start, end):
+            if self.objects[i] is model_object:
+                del self.keys[i]
+                del self.objects[i]
+                return True
+
+        return False
+
+    def clear(self):
+        """Remove all the indexed objects."""
+        self.keys = []
+        self.objects = []
+        self.nulls = {}
+
+    def equal(self, value):
+        """Return the objects whose value is equal to the parameter."""
+        if value is None:
+            return list(self.nulls.values())
+
+        start = bisect_left(self.keys, value)
+        end = bisect_right(self.keys, value)
+        return self.objects[start:end]
+
+    def lower_than(self, value):
+        """Return the objects whose value is lower than the parameter."""
+        return self.objects[:bisect_left(self.keys, value)]
+
+    def lower_equal(self, value):
+        """Return the objects whose value is lower or equal."""
+        return self.objects[:bisect_right(self.keys, value)]
+
+    def greater_than(self, value):
+        """Return the objects whose value is greater than the parameter."""
+        return self.objects[bisect_right(self.keys, value):]
+
+    def greater_equal(self, value):
+        """Return the objects whose value is greater or equal."""
+        return self.objects[bisect_left(self.keys, value):]
+
+    def between(self, start, end):
+        """Return the objects whose value is between the parameters."""
+        return self.objects[bisect_left(self.keys, start):bisect_right(
+                self.keys, end)]
+
+    def in_values(self, values):
+        """Return the objects whose value is one of the parameters."""
+        objects = []
+        for value in set(values):
+            objects.extend(self.equal(value))
+
+        return objects
+
+    def is_null(self):
+        """Return the objects without value."""
+        return list(self.nulls.values())
+
+    def starts_with(self, prefix):
+        """Return the objects whose value begins with the prefix.
+
+        Only the strings can begin with a prefix:  if the field is
+        not a string field, no object is returned.
+
+        """
+        keys = self.keys
+        if not isinstance(prefix, str) or not keys or not isinstance(
+                keys[0], str):
+            return []
+
+        start = bisect_left(keys, prefix)
+        end = start
+        while end < len(keys) and isinstance(keys[end], str) and \
+                keys[end].startswith(prefix):
+            end += 1
+
+        return self.objects[start:end]
+
+    def like(self, pattern):
+        """Return the objects whose value begins like the pattern.
+
+        Only the beginning of the pattern (before the first wildcard)
+        is used, the pattern itself still has to be tested.
+
+        """
+        return self.starts_with(LikeOperator.get_prefix(pattern))
+
+
+INDEXES = {
+    "hash": HashIndex,
+    "sorted": SortedIndex,
+}
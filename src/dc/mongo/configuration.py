@@ -38,5 +38,11 @@ class MongoConfiguration(Configuration):
             "datas": Data("the collection's to store datas", default="datas"),
             "increments": Data("the collection's to store auto increments",
                     default="increments"),
+            "increment_block": Data("the number of auto increment " \
+                    "values reserved at once", default=1, type=int),
+            "write_concern": Data("the write concern of every write " \
+                    "(w, j, fsync, wtimeout)", default={"w": 1}, type=dict),
+            "ordered": Data("should the bulk writes be ordered",
+                    default=True, type=bool),
     })
     default_file = "dc/mongo/parameters.yml"
@@ -28,10 +28,14 @@
 
 """Module defining the MongoDriver class."""
 
+from collections import OrderedDict
+
 driver = True
 
 try:
     import pymongo
+    from bson.objectid import ObjectId
+    from pymongo.errors import DuplicateKeyError
 except ImportError:
     driver = False
 
@@ -46,6 +50,29 @@ class MongoDriver(Driver):
     between the Python Aboard's data layer (not the model's one) and
     the data storage (a MongoDB connection).
 
+    The auto increment values are kept in the increments database,
+    one document per field ({"name": field, "current": next value}),
+    and reserved with an atomic $inc.  If the 'increment_block'
+    configuration entry is greater than 1, the driver reserves
+    blocks of values and hands them out without querying MongoDB
+    until the block is exhausted (the unused values of a block are
+    lost when the driver is closed).
+
+    The updates only send the modified fields ($set, or $unset for
+    the fields set to None).  During a transaction, the writes are
+    buffered and sent by 'flush' as one bulk operation per
+    collection, ordered unless the 'ordered' configuration entry is
+    False.  The objects updated during a request are also written
+    with one bulk operation per collection (see 'update_lines').
+    Every write uses the configured 'write_concern'.
+
+    MongoDB has no multi-document transaction:  before a read in a
+    transaction, the buffered writes are sent (see 'send_pending'),
+    so that the transaction reads its own writes.  If the
+    transaction is then rolled back, these writes are cancelled by
+    compensating writes.  In the meantime, other clients can read
+    them (the transactions are not isolated).
+
     """
 
     def __init__(self):
@@ -58,6 +85,15 @@ class MongoDriver(Driver):
         self.collections = {}
         self.inc_collections = {}
         self.object_ids = {}
+        self.pending = []
+        self.journal = []
+        self.sent = OrderedDict()
+        self.originals = {}
+        self.increment_block = 1
+        self.counters = set()
+        self.blocks = {}
+        self.write_concern = {"w": 1}
+        self.ordered = True
 
     def can_run(self):
         """Return whether the YAML driver can run."""
@@ -68,6 +104,13 @@ class MongoDriver(Driver):
         Driver.open(self, configuration)
         self.db_name = configuration["datas"]
         self.inc_name = configuration["increments"]
+        self.increment_block = max(1, int(configuration.get(
+                "increment_block", 1)))
+        self.counters = set()
+        self.blocks = {}
+        self.write_concern = dict(configuration.get("write_concern",
+                {"w": 1}) or {})
+        self.ordered = bool(configuration.get("ordered", True))
 
         # Try to connect
         self.connection = pymongo.Connection()
@@ -97,20 +140,65 @@ class MongoDriver(Driver):
             self.increments[name].remove({})
             self.increments.drop_collection(name)
         self.tables.clear()
+        self.counters.clear()
+        self.blocks.clear()
 
     def destroy(self):
         """Erase EVERY stored data."""
         self.connection.drop_database(self.db_name)
         self.connection.drop_database(self.inc_name)
         self.connection.close()
+        self.counters.clear()
+        self.blocks.clear()
 
     def add_table(self, table):
-        """Add the new table."""
+        """Add the new table.
+
+        The collection's indexes are created, if they don't exist:  a
+        unique index on the primary keys and the table's indexes.
+
+        """
         Driver.add_table(self, table)
         name = table.name
         self.collections[name] = self.datas[name]
         self.inc_collections[name] = self.increments[name]
         self.line_ids[name] = {}
+        self.merge_counters(name)
+        self.increments[name].create_index("name", unique=True,
+                name="name_key")
+        collection = self.datas[name]
+        pkey_names = [field_name for field_name, constraint in \
+                table.fields.items() if constraint and constraint.has("pkey")]
+        if pkey_names:
+            collection.create_index([(field_name, pymongo.ASCENDING) for \
+                    field_name in pkey_names], unique=True,
+                    name=name + "_pkey")
+
+        for index_name, field_names, unique in table.indexes:
+            collection.create_index([(field_name, pymongo.ASCENDING) for \
+                    field_name in field_names], unique=unique,
+                    name=index_name)
+
+    def merge_counters(self, table_name):
+        """Merge the duplicate counters of the table.
+
+        The counters used to be removed and inserted again, which
+        could leave several documents for the same field.  For each
+        field, only the document with the greatest value is kept, so
+        that the unique index on the names can be created.
+
+        """
+        increments = self.increments[table_name]
+        counters = {}
+        for counter in increments.find():
+            previous = counters.get(counter["name"])
+            if previous is not None:
+                if previous["current"] > counter["current"]:
+                    previous, counter = counter, previous
+
+                increments.remove(previous["_id"], **self.write_concern)
+
+            counters[counter["name"]] = counter
 
     def query_for_lines(self, table_name):
         """Return all the table's line.
@@ -119,22 +207,30 @@ class MongoDriver(Driver):
         line in a list of dictionary.
 
         """
-        table = self.tables[table_name]
         datas = self.datas[table_name].find()
-        lines = []
-        for data in datas:
-            identifiers = {}
-            for name, constraint in table.fields.items():
-                if constraint.has("pkey"):
-                    identifiers[name] = data[name]
+        return [self.register_line(table_name, data) for data in datas]
 
-            m_id = data["_id"]
-            del data["_id"]
-            self.line_ids[table_name][tuple(identifiers.items())] = m_id
-            self.id_lines[m_id] = data
-            lines.append(data)
+    def iter_lines(self, table_name, batch_size):
+        """Iterate over the table's lines, read by batches."""
+        datas = self.datas[table_name].find().batch_size(batch_size)
+        for data in datas:
+            yield self.register_line(table_name, data)
 
-        return lines
+    def register_line(self, table_name, data):
+        """Register the MongoDB ID of a read line and return the line."""
+        table = self.tables[table_name]
+        identifiers = {}
+        for name, constraint in table.fields.items():
+            if constraint.has("pkey"):
+                identifiers[name] = data[name]
+            elif name not in data:
+                data[name] = None # unset field
+
+        m_id = data["_id"]
+        del data["_id"]
+        self.line_ids[table_name][tuple(identifiers.items())] = m_id
+        self.id_lines[m_id] = data
+        return data
 
     def query_for_line(self, table_name, identifiers):
         """Query for the specified line.
@@ -146,11 +242,7 @@ class MongoDriver(Driver):
         datas = self.datas[table_name].find_one(dict(identifiers))
 
         if datas:
-            m_id = datas["_id"]
-            del datas["_id"]
-            self.line_ids[table_name][tuple(identifiers.items())] = m_id
-            self.id_lines[m_id] = datas
-            return datas
+            return self.register_line(table_name, datas)
 
         return None
 
@@ -162,71 +254,314 @@ class MongoDriver(Driver):
         line's attributes that should match.
 
         """
-        table = self.tables[table_name]
         datas = self.datas[table_name].find(matches)
-        lines = []
-        for data in datas:
-            identifiers = {}
-            for name, constraint in table.fields.items():
-                if constraint.has("pkey"):
-                    identifiers[name] = data[name]
-
-            m_id = data["_id"]
-            del data["_id"]
-            self.line_ids[table_name][tuple(identifiers.items())] = m_id
-            self.id_lines[m_id] = data
-            lines.append(data)
+        return [self.register_line(table_name, data) for data in datas]
 
-        return lines
+    def find_lines_in(self, table_name, field_name, values):
+        """Return the lines whose field's value is one of 'values'."""
+        datas = self.datas[table_name].find({field_name: {"$in": list(
+                values)}})
+        return [self.register_line(table_name, data) for data in datas]
 
-    def get_and_update_increment(self, table, field):
+    def get_and_update_increment(self, table, field, nb=1):
         """Get and update an auto-increment field.
 
         If not found in the specified table, return 1 but update to 2.
+        If 'nb' is specified, 'nb' values are reserved and the first
+        one is returned.  The values are read from the current block,
+        if possible.
 
         """
-        value = self.increments[table].find_one({"name": field})
-        if value:
-            value = value["current"]
-        else:
-            value = 1
-
-        self.increments[table].remove({"name": field})
-        self.increments[table].insert({
-                "name": field,
-                "current": value + 1,
-        }, w=True)
+        key = (table, field)
+        block = self.blocks.get(key)
+        if block and block[1] - block[0] >= nb:
+            value = block[0]
+            block[0] += nb
+            return value
+
+        reserved = max(nb, self.increment_block)
+        value = self.reserve_increments(table, field, reserved)
+        if reserved > nb:
+            self.blocks[key] = [value + nb, value + reserved]
 
         return value
 
+    def reserve_increments(self, table, field, nb):
+        """Reserve 'nb' values of the field and return the first one.
+
+        The counter is created if needed (its first value is 1), then
+        incremented atomically.
+
+        """
+        increments = self.increments[table]
+        if (table, field) not in self.counters:
+            try:
+                increments.update({"name": field},
+                        {"$setOnInsert": {"current": 1}}, upsert=True)
+            except DuplicateKeyError:
+                pass # created by another process in the meantime
+
+            self.counters.add((table, field))
+
+        counter = increments.find_and_modify({"name": field},
+                {"$inc": {"current": nb}})
+        return counter["current"]
+
     def add_line(self, table_name, line):
         """Add a new line."""
+        return self.add_lines(table_name, [line])[0]
+
+    def add_lines(self, table_name, lines):
+        """Add several lines with a single bulk insert.
+
+        The auto increment values are reserved for all the lines at
+        once.  During a transaction, the insertion is deferred.
+
+        """
+        if not lines:
+            return []
+
         table = self.tables[table_name]
-        ret = {}
+        rets = [{} for line in lines]
         auto_increments = [field_name for field_name, constraint in \
                 table.fields.items() if constraint.has("auto_increment")]
         for field in auto_increments:
-            ret[field] = self.get_and_update_increment(table_name, field)
+            first = self.get_and_update_increment(table_name, field,
+                    len(lines))
+            for i, ret in enumerate(rets):
+                ret[field] = first + i
+
+        for line, ret in zip(lines, rets):
+            line.update(ret)
+
+        if self.in_transaction:
+            m_ids = []
+            for line in lines:
+                line["_id"] = ObjectId()
+                m_ids.append(line["_id"])
+        else:
+            m_ids = self.datas[table_name].insert(lines,
+                    **self.write_concern)
 
-        line.update(ret)
-        m_id = self.datas[table_name].insert(line, w=True)
-        identifiers = dict((field_name, line[field_name]) for \
-                field_name, constraint in table.fields.items() if \
-                constraint.has("pkey"))
-        self.line_ids[table_name][tuple(identifiers.items())] = m_id
-        self.id_lines[m_id] = line
-        return ret
+        for line, m_id in zip(lines, m_ids):
+            identifiers = dict((field_name, line[field_name]) for \
+                    field_name, constraint in table.fields.items() if \
+                    constraint.has("pkey"))
+            key = tuple(identifiers.items())
+            self.line_ids[table_name][key] = m_id
+            self.id_lines[m_id] = line
+            if self.in_transaction:
+                self.defer("insert", table_name, key, m_id, line)
+
+        return rets
 
     def update_line(self, table_name, identifiers, element, value):
-        """Update a line (does nothing)."""
-        m_id = self.line_ids[table_name][tuple(identifiers.items())]
+        """Update a line."""
+        self.update_fields(table_name, identifiers, {element: value})
+
+    def update_fields(self, table_name, identifiers, values):
+        """Update several fields of a line with a single write.
+
+        Only the updated fields are sent to MongoDB.
+
+        """
+        key = tuple(identifiers.items())
+        m_id = self.line_ids[table_name][key]
         all_line = self.id_lines[m_id]
-        all_line.update({element: value})
-        self.datas[table_name].update({"_id": m_id}, all_line)
+        if self.in_transaction:
+            self.originals.setdefault(m_id, dict(all_line))
+            self.defer("update", table_name, key, m_id, dict(values))
+
+        all_line.update(values)
+        if not self.in_transaction:
+            self.datas[table_name].update({"_id": m_id},
+                    self.get_update_document(values), **self.write_concern)
+
+    def update_lines(self, updates):
+        """Update several lines with a single bulk write per collection.
+
+        The updates are sent through the 'pending' list, as the
+        writes of a transaction (see 'flush').  During a
+        transaction, they are deferred.
+
+        """
+        if self.in_transaction:
+            Driver.update_lines(self, updates)
+            return
+
+        for table_name, identifiers, values in updates:
+            key = tuple(identifiers.items())
+            m_id = self.line_ids[table_name][key]
+            self.id_lines[m_id].update(values)
+            self.pending.append(("update", table_name, key, m_id,
+                    dict(values)))
+
+        self.flush()
+
+    @staticmethod
+    def get_update_document(values):
+        """Return the update document ($set and $unset) of 'values'.
+
+        The fields set to None are removed from the document.
+
+        """
+        document = {}
+        for name, value in values.items():
+            if value is None:
+                document.setdefault("$unset", {})[name] = ""
+            else:
+                document.setdefault("$set", {})[name] = value
+
+        return document
 
     def remove_line(self, table_name, identifiers):
-        """Delete the line (do nothing)."""
-        m_id = self.line_ids[table_name][tuple(identifiers.items())]
-        self.datas[table_name].remove(m_id, fsync=True)
-        del self.line_ids[table_name][tuple(identifiers.items())]
+        """Delete the line."""
+        key = tuple(identifiers.items())
+        m_id = self.line_ids[table_name][key]
+        line = self.id_lines[m_id]
+        if self.in_transaction:
+            self.defer("remove", table_name, key, m_id, line)
+        else:
+            self.datas[table_name].remove(m_id, **self.write_concern)
+
+        del self.line_ids[table_name][key]
         del self.id_lines[m_id]
+
+    def begin(self):
+        """Begin a transaction.
+
+        MongoDB has no transaction:  the writes are kept in the
+        'pending' list and sent by 'flush' when the transaction is
+        committed, or before a read.  The 'journal' list contains
+        every write of the transaction and the 'sent' dictionary, the
+        lines written before the commit (see 'send_pending').  The
+        'originals' dictionary contains the updated lines, as they
+        were before the transaction.
+
+        """
+        Driver.begin(self)
+        self.pending = []
+        self.journal = []
+        self.sent = OrderedDict()
+        self.originals = {}
+
+    def defer(self, operation, table_name, key, m_id, line):
+        """Buffer a write until the transaction is committed."""
+        write = (operation, table_name, key, m_id, line)
+        self.pending.append(write)
+        self.journal.append(write)
+
+    def commit(self):
+        """Send the pending writes."""
+        Driver.commit(self)
+        self.journal = []
+        self.sent = OrderedDict()
+        self.originals = {}
+        self.flush()
+
+    def send_pending(self):
+        """Send the pending writes before a read.
+
+        For each line written, the way to cancel the write is kept in
+        the 'sent' dictionary:  a line inserted in the transaction is
+        removed, any other line is written back as it was before the
+        transaction (without its unset fields).
+
+        """
+        if not self.pending:
+            return
+
+        for operation, table_name, key, m_id, line in self.pending:
+            if m_id in self.sent:
+                continue
+
+            if operation == "insert":
+                self.sent[m_id] = (table_name, None)
+            else:
+                original = self.originals.get(m_id, line)
+                self.sent[m_id] = (table_name, dict((name, value) for \
+                        name, value in original.items() if value is not None))
+
+        self.flush()
+
+    def flush(self):
+        """Send the pending writes in bulk.
+
+        The writes are grouped by collection, in the order of their
+        first appearance.  Several updates of the same line are
+        merged, a line inserted then updated is only inserted, and a
+        line inserted then removed is not sent at all.  Each
+        collection receives a single bulk operation, executed with
+        the configured write concern.
+
+        """
+        pending = self.pending
+        self.pending = []
+        operations = OrderedDict()
+        for operation, table_name, key, m_id, line in pending:
+            writes = operations.setdefault(table_name, OrderedDict())
+            previous = writes.get(m_id)
+            if operation == "insert":
+                writes[m_id] = ("insert", line)
+            elif operation == "update":
+                if previous is None:
+                    writes[m_id] = ("update", dict(line))
+                elif previous[0] == "update":
+                    previous[1].update(line)
+            elif operation == "remove":
+                writes.pop(m_id, None)
+                if previous is None or previous[0] != "insert":
+                    writes[m_id] = ("remove", None)
+
+        for table_name, writes in operations.items():
+            if not writes:
+                continue
+
+            collection = self.datas[table_name]
+            if self.ordered:
+                bulk = collection.initialize_ordered_bulk_op()
+            else:
+                bulk = collection.initialize_unordered_bulk_op()
+
+            for m_id, (operation, line) in writes.items():
+                if operation == "insert":
+                    bulk.insert(line)
+                elif operation == "update":
+                    bulk.find({"_id": m_id}).update_one(
+                            self.get_update_document(line))
+                else:
+                    bulk.find({"_id": m_id}).remove_one()
+
+            bulk.execute(self.write_concern)
+
+    def rollback(self):
+        """Forget the pending writes and restore the lines.
+
+        The writes already sent are cancelled.
+
+        """
+        Driver.rollback(self)
+        for m_id, (table_name, original) in self.sent.items():
+            collection = self.datas[table_name]
+            if original is None:
+                collection.remove(m_id, **self.write_concern)
+            else:
+                collection.update({"_id": m_id}, original, upsert=True,
+                        **self.write_concern)
+
+        for operation, table_name, key, m_id, line in reversed(self.journal):
+            if operation == "insert":
+                self.line_ids[table_name].pop(key, None)
+                self.id_lines.pop(m_id, None)
+            elif operation == "update":
+                line = self.id_lines[m_id]
+                line.clear()
+                line.update(self.originals[m_id])
+            elif operation == "remove":
+                self.line_ids[table_name][key] = m_id
+                self.id_lines[m_id] = line
+
+        self.pending = []
+        self.journal = []
+        self.sent = OrderedDict()
+        self.originals = {}
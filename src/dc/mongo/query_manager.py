@@ -28,8 +28,16 @@
 
 """Module defining the MongoQueryManager class, defined below."""
 
+from collections import OrderedDict
+import re
+
 from dc.query_manager import QueryManager
 from model.functions import *
+from query.operators import LikeOperator
+
+# Sort directions (pymongo.ASCENDING and pymongo.DESCENDING)
+ASCENDING = 1
+DESCENDING = -1
 
 class MongoQueryManager(QueryManager):
 
@@ -42,10 +50,142 @@ class MongoQueryManager(QueryManager):
 
     def query(self, query):
         """Look for the specified objects."""
+        return list(self.find(query))
+
+    def iter_query(self, query, batch_size):
+        """Iterate over the documents, read by batches."""
+        return iter(self.find(query, batch_size))
+
+    def query_values(self, query, batch_size=None):
+        """Select the projected fields only."""
+        names = query.projection
+        converters = self.get_converters(query.first_model, names)
+        projection = dict((name, 1) for name in names)
+        projection["_id"] = 0
+        documents = self.find(query, batch_size or 0, projection)
+        for document in documents:
+            values = []
+            for name, converter in zip(names, converters):
+                value = document.get(name)
+                if converter and value is not None:
+                    value = converter.to_object(value)
+
+                values.append(value)
+
+            yield tuple(values)
+
+    def find(self, query, batch_size=0, projection=None):
+        """Return the MongoDB cursor corresponding to the query.
+
+        The query's order and pagination are converted into the
+        cursor's sort, skip and limit.  The documents are read by
+        batches of 'batch_size' documents (0 means the server's
+        default).  If specified, the projection is a dictionary
+        of the fields to select.
+
+        """
         model = query.first_model
         plural_name = get_plural_name(model)
+        expression = self.get_query_expression(query)
+        cursor = self.driver.datas[plural_name].find(expression,
+                projection)
+        cursor = cursor.batch_size(batch_size)
+        ordering = query.get_ordering()
+        if ordering:
+            cursor = cursor.sort([(name, DESCENDING if descending else \
+                    ASCENDING) for name, descending in ordering])
+        if query.nb_offset:
+            cursor = cursor.skip(query.nb_offset)
+        if query.nb_limit is not None:
+            if query.nb_limit == 0:
+                # In MongoDB, a limit of 0 means no limit
+                return iter([])
+
+            cursor = cursor.limit(query.nb_limit)
+
+        return cursor
+
+    def query_aggregate(self, query, function, field_name):
+        """Compute the aggregate with an aggregation pipeline.
+
+        If the query isn't paginated, the objects are counted with
+        the cursor's 'count' method.
+
+        """
+        plural_name = get_plural_name(query.first_model)
+        collection = self.driver.datas[plural_name]
+        expression = self.get_query_expression(query)
+        paginated = query.nb_limit is not None or query.nb_offset
+        if function == "count" and field_name is None and not \
+                query.grouping and not paginated:
+            return collection.find(expression).count()
+
+        pipeline = [{"$match": expression}]
+        if paginated:
+            ordering = query.get_ordering()
+            if ordering:
+                pipeline.append({"$sort": OrderedDict((name,
+                        DESCENDING if descending else ASCENDING) for \
+                        name, descending in ordering)})
+            if query.nb_offset:
+                pipeline.append({"$skip": query.nb_offset})
+            if query.nb_limit is not None:
+                if query.nb_limit == 0:
+                    return self.empty_aggregate(query, function)
+
+                pipeline.append({"$limit": query.nb_limit})
+
+        if field_name is None:
+            accumulator = {"$sum": 1}
+        elif function == "count":
+            accumulator = {"$sum": {"$cond": [{"$eq": [{"$ifNull": [
+                    "$" + field_name, None]}, None]}, 0, 1]}}
+        else:
+            accumulator = {"$" + function: "$" + field_name}
+
+        group = dict((name, "$" + name) for name in query.grouping)
+        pipeline.append({"$group": {"_id": group or None,
+                "result": accumulator}})
+        documents = collection.aggregate(pipeline)
+        if isinstance(documents, dict):
+            # Older versions of pymongo return the whole answer
+            documents = documents["result"]
+
+        results = {}
+        for document in documents:
+            group = tuple(document["_id"][name] for name in query.grouping)
+            if len(group) == 1:
+                group = group[0]
+
+            results[group] = document["result"]
+
+        if query.grouping:
+            return results
+        elif not results:
+            return self.empty_aggregate(query, function)
+
+        return results[()]
+
+    @staticmethod
+    def empty_aggregate(query, function):
+        """Return the result of an aggregate without any document."""
+        if query.grouping:
+            return {}
+
+        return 0 if function == "count" else None
+
+    def get_query_expression(self, query):
+        """Return the expression of the filters and the keyset."""
         expression = self.get_expression(query)
-        return list(self.driver.datas[plural_name].find(expression))
+        keyset = self.get_keyset(query)
+        if keyset:
+            keyset = self.get_expression_from_keyset(keyset)
+            if expression:
+                expression = {"$and": [expression, keyset]}
+            else:
+                expression = keyset
+
+        return expression
 
     def get_expression(self, query):
         """Return the list containing the MongoDB expression."""
@@ -73,6 +213,22 @@ class MongoQueryManager(QueryManager):
 
         return expression
 
+    def get_expression_from_keyset(self, keyset):
+        """Return the expression selecting the documents after the keyset.
+
+        The keyset is a list of (field_name, descending, value) (see
+        QueryManager.get_keyset).
+
+        """
+        clauses = []
+        for i, (name, descending, value) in enumerate(keyset):
+            clause = dict((previous, previous_value) for previous, \
+                    previous_descending, previous_value in keyset[:i])
+            clause[name] = {"$lt" if descending else "$gt": value}
+            clauses.append(clause)
+
+        return {"$or": clauses}
+
     def get_expression_from_filter(self, filter):
         """Return a simple expression (dictionary) from a filter."""
         operator = filter.operator.name
@@ -80,6 +236,13 @@ class MongoQueryManager(QueryManager):
             "!=": self.notequal,
             "<": self.lowerthan,
             "<=": self.lowerequal,
+            ">": self.greaterthan,
+            ">=": self.greaterequal,
+            "between": self.between,
+            "in": self.in_values,
+            "is null": self.isnull,
+            "startswith": self.startswith,
+            "like": self.like,
         }
         if operator == "=":
             return {filter.field: filter.parameters[0]}
@@ -99,3 +262,40 @@ class MongoQueryManager(QueryManager):
     def lowerequal(self, filter, *parameters):
         """Return the corresponding dictionary for the <= operator."""
         return {"$lte": parameters[0]}
+
+    def greaterthan(self, filter, *parameters):
+        """Return the corresponding dictionary for the > operator."""
+        return {"$gt": parameters[0]}
+
+    def greaterequal(self, filter, *parameters):
+        """Return the corresponding dictionary for the >= operator."""
+        return {"$gte": parameters[0]}
+
+    def between(self, filter, *parameters):
+        """Return the corresponding dictionary for the between operator."""
+        return {"$gte": parameters[0], "$lte": parameters[1]}
+
+    def in_values(self, filter, *parameters):
+        """Return the corresponding dictionary for the in operator."""
+        return {"$in": list(parameters[0])}
+
+    def isnull(self, filter, *parameters):
+        """Return the corresponding expression for the is null operator.
+
+        The documents without this field are selected too.
+
+        """
+        return None
+
+    def startswith(self, filter, *parameters):
+        """Return the corresponding dictionary for the startswith operator.
+
+        The regular expression is anchored, so an index can be used.
+
+        """
+        return {"$regex": "^" + re.escape(parameters[0])}
+
+    def like(self, filter, *parameters):
+        """Return the corresponding dictionary for the like operator."""
+        return {"$regex": LikeOperator.to_regular_expression(parameters[0]),
+                "$options": "s"}
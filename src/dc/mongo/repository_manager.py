@@ -45,10 +45,11 @@ class MongoRepositoryManager(RepositoryManager):
         """Add the new model."""
         table = self.build_table(model)
         self.driver.add_table(table)
+        self.build_indexes(model)
 
     def save(self):
-        """Force the repository to save, do nothing."""
-        pass
+        """Force the repository to save (write the dirty objects)."""
+        self.flush()
 
     def add_object(self, model_object):
         """Save the object, issued from a model."""
@@ -45,5 +45,9 @@ class PostgreSQLConfiguration(Configuration):
                     default=""),
             "dbname": Data("the database name",
                     default="aboard"),
+            "statement_cache_size": Data("the number of prepared " \
+                    "statements kept in cache", default=100, type=int),
+            "pool": Data("the connection pool (min_size, max_size, " \
+                    "timeout, health_check)", default={}, type=dict),
     })
     default_file = "dc/postgresql/parameters.yml"
@@ -57,9 +57,14 @@ class PostgreSQLDriver(SQLDriver):
         "string": "text",
     }
 
+    # Number of lines inserted by a single statement in 'add_lines'
+    INSERT_CHUNK = 1000
+
     def __init__(self):
         SQLDriver.__init__(self)
         self.format = "${}"
+        self.uri = None
+        self.transaction = None
 
     def can_run(self):
         """Return whether the postgresql driver can run."""
@@ -72,16 +77,28 @@ class PostgreSQLDriver(SQLDriver):
         dbuser = configuration["dbuser"]
         dbpass = configuration["dbpass"]
         dbname = configuration["dbname"]
-        self.connection = postgresql.open(
-                "pq://{user}:{password}@{host}:{port}/{database}".format(
+        self.uri = "pq://{user}:{password}@{host}:{port}/{database}".format(
                 user=dbuser, password=dbpass, host=host, port=port,
-                database=dbname))
+                database=dbname)
         SQLDriver.open(self, configuration)
 
+    def connect(self):
+        """Open and return a new connection."""
+        return postgresql.open(self.uri)
+
+    def check_connection(self, connection):
+        """Return whether the connection can still be used."""
+        try:
+            connection.prepare("SELECT 1")()
+        except Exception:
+            return False
+
+        return True
+
     def destroy(self):
         """Erase EVERY stored data."""
         self.clear()
-        self.connection.close()
+        self.close_connections()
 
     def check_existing_tables(self):
         """Get the created tables."""
@@ -102,8 +119,18 @@ class PostgreSQLDriver(SQLDriver):
         return instruction
 
     def execute_query(self, statement, *args, many=True):
-        """Execute a query and return the answer, if any."""
-        preparation = self.connection.prepare(statement)
+        """Execute a query and return the answer, if any.
+
+        The prepared statements are kept in cache, except the DDL
+        statements, which clear the cache.
+
+        """
+        if self.is_ddl(statement):
+            self.clear_statements()
+            preparation = self.connection.prepare(statement)
+        else:
+            preparation = self.get_statement(statement)
+
         if many:
             return preparation(*args)
         else:
@@ -113,6 +140,96 @@ class PostgreSQLDriver(SQLDriver):
 
             return None
 
+    def iter_query(self, statement, *args, batch_size):
+        """Execute a query and iterate over the returned rows.
+
+        A cursor is declared on the prepared statement and the rows
+        are read by batches of 'batch_size' rows.
+
+        """
+        preparation = self.get_statement(statement)
+        cursor = preparation.declare(*args)
+        try:
+            rows = cursor.read(batch_size)
+            while rows:
+                yield from rows
+                rows = cursor.read(batch_size)
+        finally:
+            cursor.close()
+
+    def execute_many(self, statement, rows):
+        """Execute the statement with several rows of arguments."""
+        preparation = self.get_statement(statement)
+        preparation.load_rows(rows)
+
+    def add_line(self, table_name, line):
+        """Add a new line (see 'add_lines')."""
+        return self.add_lines(table_name, [line])[0]
+
+    def add_lines(self, table_name, lines):
+        """Add several lines, returning the auto increment fields.
+
+        The lines are inserted by chunks, with a single multi-row
+        INSERT statement for each chunk.  The auto increment fields are
+        returned by the statement itself (RETURNING).
+
+        """
+        query, names, auto_increments = self.build_insert(table_name)
+        if not auto_increments:
+            return SQLDriver.add_lines(self, table_name, lines)
+
+        rets = []
+        size = type(self).INSERT_CHUNK
+        for start in range(0, len(lines), size):
+            chunk = lines[start:start + size]
+            formats = self.generate_formats(len(names) * len(chunk))
+            values = []
+            params = []
+            for i, line in enumerate(chunk):
+                line_formats = formats[i * len(names):(i + 1) * len(names)]
+                values.append("(" + ", ".join(line_formats) + ")")
+                params.extend(line.get(name) for name in names)
+
+            query = "INSERT INTO {} ({}) VALUES {} RETURNING {}".format(
+                    table_name, ", ".join(names), ", ".join(values),
+                    ", ".join(auto_increments))
+            for row in self.execute_query(query, *params):
+                rets.append(dict(zip(auto_increments, row)))
+
+        self.save()
+        return rets
+
+    def prepare(self, statement):
+        """Prepare the statement on the server."""
+        return self.connection.prepare(statement)
+
+    def release_statement(self, prepared):
+        """Close the prepared statement."""
+        prepared.close()
+
+    def begin(self):
+        """Begin a transaction.
+
+        Outside of a transaction, each statement is committed
+        separately by the server.
+
+        """
+        SQLDriver.begin(self)
+        self.transaction = self.connection.xact()
+        self.transaction.start()
+
+    def commit(self):
+        """Commit the transaction."""
+        SQLDriver.commit(self)
+        self.transaction.commit()
+        self.transaction = None
+
+    def rollback(self):
+        """Roll back the transaction."""
+        SQLDriver.rollback(self)
+        self.transaction.rollback()
+        self.transaction = None
+
     def save(self):
         """Force the database saving."""
         pass
@@ -31,6 +31,7 @@
 from abc import *
 
 from model.functions import *
+from model.types import BaseType
 
 class QueryManager(metaclass=ABCMeta):
 
@@ -61,6 +62,7 @@ class QueryManager(metaclass=ABCMeta):
         that only relies on the cache, for instance).
 
         """
+        self.repository_manager.flush()
         lines = self.query(query)
         objects = []
         name = get_name(query.first_model)
@@ -71,6 +73,146 @@ class QueryManager(metaclass=ABCMeta):
 
         return objects
 
+    def iter_objects(self, query, batch_size, cache=True):
+        """Iterate over the model objects filtered by the query.
+
+        The lines are read by batches of 'batch_size' lines (see the
+        'iter_query' method) and the objects are built lazily.  If
+        'cache' is False, the built objects are not stored in the
+        cache.
+
+        """
+        self.repository_manager.flush()
+        name = get_name(query.first_model)
+        for line in self.iter_query(query, batch_size):
+            yield self.repository_manager.get_or_build_object(name, line,
+                    cache=cache)
+
+    def values(self, query):
+        """Return the list of the projected values (see Query.only).
+
+        Each element is a tuple containing the values of the query's
+        projection.  The model objects are not built, unless the
+        'query_values' method isn't redefined.
+
+        """
+        self.repository_manager.flush()
+        return list(self.query_values(query))
+
+    def iter_values(self, query, batch_size):
+        """Iterate over the projected values, read by batches."""
+        self.repository_manager.flush()
+        yield from self.query_values(query, batch_size)
+
+    def query_values(self, query, batch_size=None):
+        """Iterate over the tuples of projected values.
+
+        By default, the values are read from the selected objects.
+        The data connectors which can select only some fields should
+        redefine this method.  If 'batch_size' is None, every line
+        can be read at once.
+
+        """
+        names = query.projection
+        for model_object in self.query_objects(query):
+            yield tuple(getattr(model_object, name) for name in names)
+
+    def get_converters(self, model, field_names):
+        """Return the converters of the specified fields.
+
+        The returned list contains, for each field, the converter
+        used by the driver (see dc.converters) or None.
+
+        """
+        table = self.driver.tables[get_plural_name(model)]
+        converters = type(self.driver).converters
+        return [converters.get(table.fields[name].name_type) for name in \
+                field_names]
+
+    def aggregate(self, query, function, field_name=None):
+        """Return the result of an aggregate over the query.
+
+        The function is one of Query.AGGREGATES.  If the query is
+        grouped, a dictionary {group: result} is returned.  This method
+        flushes the modified objects and calls 'query_aggregate',
+        which should be redefined in subclasses.
+
+        """
+        self.repository_manager.flush()
+        return self.query_aggregate(query, function, field_name)
+
+    def exists(self, query):
+        """Return whether the query selects at least one object."""
+        self.repository_manager.flush()
+        return self.query_exists(query)
+
+    def query_aggregate(self, query, function, field_name):
+        """Compute the aggregate in a single pass over the objects.
+
+        The data connectors which can aggregate the datas themselves
+        should redefine this method.
+
+        """
+        groups = {}
+        grouping = query.grouping
+        for model_object in self.query_objects(query):
+            if len(grouping) == 1:
+                group = getattr(model_object, grouping[0])
+            else:
+                group = tuple(getattr(model_object, name) for name in \
+                        grouping)
+
+            # Each state is [count, total, minimum, maximum]
+            state = groups.get(group)
+            if state is None:
+                state = groups[group] = [0, None, None, None]
+
+            if field_name is None:
+                state[0] += 1
+                continue
+
+            value = getattr(model_object, field_name)
+            if value is None or isinstance(value, BaseType):
+                continue
+
+            state[0] += 1
+            if function in ("sum", "avg"):
+                state[1] = value if state[1] is None else state[1] + value
+            elif function == "min":
+                if state[2] is None or value < state[2]:
+                    state[2] = value
+            elif function == "max":
+                if state[3] is None or value > state[3]:
+                    state[3] = value
+
+        results = {}
+        for group, (count, total, minimum, maximum) in groups.items():
+            if function == "count":
+                result = count
+            elif function == "sum":
+                result = total
+            elif function == "avg":
+                result = None if count == 0 else total / count
+            elif function == "min":
+                result = minimum
+            else:
+                result = maximum
+
+            results[group] = result
+
+        if grouping:
+            return results
+
+        return results.get((), 0 if function == "count" else None)
+
+    def query_exists(self, query):
+        """Return whether the query selects at least one object.
+
+        By default, the selected objects are counted.
+
+        """
+        return self.query_aggregate(query, "count", None) > 0
+
     def query(self, query):
         """Query for the specified query.
 
@@ -81,18 +223,58 @@ class QueryManager(metaclass=ABCMeta):
         """
         pass
 
+    def iter_query(self, query, batch_size):
+        """Iterate over the lines matching the specified query.
+
+        The lines should be read by batches of 'batch_size' lines.  By
+        default, the lines returned by the 'query' method are iterated
+        over.
+
+        """
+        return iter(self.query(query))
+
     def get_parameters_for_filter(self, filter):
         """Get the parameters for the specified filters.
 
         The filter's parameter should be converted before being
-        tested in the table.
+        tested in the table.  If the operator expects sequences of
+        values, each value is converted and a tuple is returned
+        for each parameter.
 
         """
         plural_name = get_plural_name(filter.query.first_model)
         field = filter.field
+        multiple = filter.operator.multiple
         converted = []
         for parameter in filter.parameters:
-            converted.append(self.driver.value_to_storage(
-                    plural_name, field, parameter))
+            if multiple:
+                converted.append(tuple(self.driver.value_to_storage(
+                        plural_name, field, value) for value in parameter))
+            else:
+                converted.append(self.driver.value_to_storage(
+                        plural_name, field, parameter))
 
         return tuple(converted)
+
+    def get_keyset(self, query):
+        """Return the keyset of the query's 'after' object.
+
+        The keyset is a list of (field_name, descending, value)
+        containing the query's ordering (see Query.get_ordering) and
+        the converted values of the 'after' object.  The selected
+        objects are placed after these values.  If the query has no
+        'after' object, an empty list is returned.
+
+        """
+        model_object = query.after_object
+        if model_object is None:
+            return []
+
+        plural_name = get_plural_name(query.first_model)
+        keyset = []
+        for name, descending in query.get_ordering():
+            value = self.driver.value_to_storage(plural_name, name,
+                    getattr(model_object, name))
+            keyset.append((name, descending, value))
+
+        return keyset
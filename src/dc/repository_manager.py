@@ -29,12 +29,25 @@
 """This file contains the RepositoryManager class, described below."""
 
 from abc import *
+from threading import RLock, local
 
+from dc.cache import create_cache
+from dc.indexes import INDEXES
 from dc.table import Table
 from model import exceptions as mod_exceptions
 from model.functions import *
 from model.types import *
 
+class TransactionState(local):
+
+    """The transaction state of a thread (see RepositoryManager)."""
+
+    def __init__(self):
+        self.depth = 0
+        self.undo_log = []
+        self.dirty_objects = {}
+        self.in_request = False
+
 class RepositoryManager(metaclass=ABCMeta):
 
     """Class representing a data connector repository manager.
@@ -42,19 +55,92 @@ class RepositoryManager(metaclass=ABCMeta):
     This class uses the Model objects to communicate with the drivers.  It
     is also responsible of the cache.
 
+    The cached objects can be indexed on some fields (see the dc.indexes
+    module).  The indexes are stored in the 'indexes' dictionary
+    ({model_name: {field_name: index}}) and are maintained when an
+    object is cached, uncached or updated.
+
+    The cache of each model ('objects_tree[model_name]') follows a
+    cache policy (see the dc.cache module), set by the
+    'set_cache_policies' method.  An object is not evicted from its
+    cache if the 'is_dirty' method returns True.
+
+    The changes can be grouped in a transaction (see the 'begin',
+    'commit' and 'rollback' methods).  During a transaction, each
+    change is recorded in the 'undo_log', used to restore the objects
+    if the transaction is rolled back.  The transactions, like the
+    dirty objects, are kept for each thread (see TransactionState).
+
+    Outside of a transaction, an updated object is written
+    immediately, unless the thread is in a request (see
+    'begin_request'):  the object is then dirty until 'flush' is
+    called (before querying the driver, before an insertion or a
+    deletion, when a transaction begins, when saving and at the end
+    of the request), and its dirty fields are written with a single
+    update.  The requests are only opened by the server (a request
+    always ends):  the updates made by the other threads (the
+    console, the scripts...) are not deferred.
+
+    If the driver can read concurrently (see
+    'Driver.concurrent_reads'), several threads can read at the same
+    time:  the caches and the indexes are then protected by the
+    'c_lock', whereas the writes hold the driver's 'u_lock'.
+
     """
 
     def __init__(self, driver):
         self.driver = driver
         self.objects_tree = {}
+        self.cache_policies = {}
+        self.indexes = {}
         self.models = {}
         self.deleted_objects = []
+        self.c_lock = RLock()
+        self.transactions = TransactionState()
+
+    @property
+    def transaction_depth(self):
+        """Return the transaction depth of the current thread."""
+        return self.transactions.depth
+
+    @transaction_depth.setter
+    def transaction_depth(self, depth):
+        self.transactions.depth = depth
+
+    @property
+    def undo_log(self):
+        """Return the undo log of the current thread."""
+        return self.transactions.undo_log
+
+    @undo_log.setter
+    def undo_log(self, undo_log):
+        self.transactions.undo_log = undo_log
+
+    @property
+    def dirty_objects(self):
+        """Return the dirty objects of the current thread."""
+        return self.transactions.dirty_objects
+
+    @dirty_objects.setter
+    def dirty_objects(self, dirty_objects):
+        self.transactions.dirty_objects = dirty_objects
+
+    @property
+    def in_request(self):
+        """Return whether the current thread is in a request."""
+        return self.transactions.in_request
+
+    @in_request.setter
+    def in_request(self, in_request):
+        self.transactions.in_request = in_request
 
     def clear(self):
         """Clear the stored datas and the cache."""
         self.driver.clear()
         self.objects_tree = {}
         self.record_models(list(self.models.values()))
+        for model in self.models.values():
+            self.build_indexes(model)
 
     def record_models(self, models):
         """Record the given models.
@@ -71,50 +157,325 @@ class RepositoryManager(metaclass=ABCMeta):
         """Record the given model, a subclass of model.Model."""
         name = get_name(model)
         self.models[name] = model
-        self.objects_tree[name] = {}
+        self.objects_tree[name] = self.build_cache(name)
+        self.indexes[name] = {}
+
+    def set_cache_policies(self, policies):
+        """Set the cache policies of the models.
+
+        The policies are given as a dictionary {model_name: policy}
+        (the 'default' policy is used for models without specific
+        policy).  Each policy is itself a dictionary (see the
+        'create_cache' function in dc.cache).  The caches of the
+        already recorded models are rebuilt.
+
+        """
+        self.cache_policies = dict(policies or {})
+        for name, cache in list(self.objects_tree.items()):
+            new_cache = self.build_cache(name)
+            new_cache.update(cache)
+            self.objects_tree[name] = new_cache
+
+    def build_cache(self, model_name):
+        """Build and return the cache of the specified model."""
+        policy = dict(self.cache_policies.get("default") or {})
+        policy.update(self.cache_policies.get(model_name) or {})
+        return create_cache(policy, can_evict=self.can_evict,
+                on_evict=self.unindex_object)
+
+    def can_evict(self, model_object):
+        """Return whether the object can be evicted from the cache."""
+        return not self.is_dirty(model_object)
+
+    def is_dirty(self, model_object):
+        """Return whether the object has modifications not saved yet.
+
+        The modifications are sent to the driver immediately or, in
+        a request, by 'flush'.  During a transaction, the objects
+        modified in the transaction are dirty until it's committed.
+
+        """
+        return id(model_object) in self.dirty_objects or \
+                bool(model_object._dirty)
+
+    def begin_request(self):
+        """Begin a request for the current thread.
+
+        Until 'end_request' is called, the updates made outside of a
+        transaction are not written immediately:  the updated
+        objects are written by 'flush', so that several fields of an
+        object modified in a request are written at once.
+
+        """
+        self.in_request = True
+
+    def end_request(self):
+        """End the request of the current thread, writing its updates."""
+        try:
+            self.flush()
+        finally:
+            self.in_request = False
+
+    def begin(self):
+        """Begin a transaction.
+
+        The transactions can be nested, but only the outermost one
+        is sent to the driver.
+
+        """
+        if self.transaction_depth == 0:
+            self.flush()
+
+        self.transaction_depth += 1
+        if self.transaction_depth == 1:
+            self.undo_log = []
+            self.dirty_objects = {}
+            self.driver.begin()
+
+    def commit(self):
+        """Commit the transaction and save."""
+        if self.transaction_depth == 0:
+            return
+
+        self.transaction_depth -= 1
+        if self.transaction_depth == 0:
+            self.flush()
+            self.undo_log = []
+            self.dirty_objects = {}
+            self.driver.commit()
+            self.save()
+
+    def rollback(self):
+        """Roll back the transaction, restoring the modified objects.
+
+        A nested transaction can't be rolled back alone:  the whole
+        transaction is cancelled.
+
+        """
+        if self.transaction_depth == 0:
+            return
+
+        self.transaction_depth = 0
+        undo_log = self.undo_log
+        self.undo_log = []
+        for model_object in self.dirty_objects.values():
+            model_object._dirty.clear()
+
+        self.dirty_objects = {}
+        self.driver.rollback()
+        for change in reversed(undo_log):
+            operation, model_object = change[:2]
+            if operation == "add":
+                self.uncache_object(model_object)
+                self.invalidate_relations(model_object)
+            elif operation == "update":
+                attribute, old_value = change[2:]
+                field = getattr(type(model_object), attribute)
+                value = getattr(model_object, attribute)
+                object.__setattr__(model_object, attribute, old_value)
+                self.update_cache(model_object, field, value)
+            elif operation == "remove":
+                name, values = change[2:]
+                if (name, values) in self.deleted_objects:
+                    self.deleted_objects.remove((name, values))
+                self.cache_object(model_object)
+                self.invalidate_relations(model_object)
+
+    def flush(self):
+        """Write the dirty fields of the modified objects.
+
+        This method is called before the driver is queried, so that
+        the data storage is up to date.  It's also called when the
+        repository manager saves, when a transaction begins or is
+        committed, and at the end of each request (see
+        'end_request').  Only the objects modified by the current
+        thread are written, with a single call to the driver (see
+        'Driver.update_lines').
+
+        """
+        if not self.dirty_objects and not self.transaction_depth:
+            return
+
+        with self.driver.u_lock:
+            model_objects = [model_object for model_object in \
+                    self.dirty_objects.values() if model_object._dirty]
+            self.driver.update_lines([self.get_update(model_object) for \
+                    model_object in model_objects])
+            for model_object in model_objects:
+                model_object._dirty.clear()
+
+            if self.transaction_depth:
+                self.driver.send_pending()
+            else:
+                self.dirty_objects = {}
+
+    def flush_object(self, model_object):
+        """Write the dirty fields of the object with a single update."""
+        if not model_object._dirty:
+            return
+
+        self.driver.update_fields(*self.get_update(model_object))
+        model_object._dirty.clear()
+
+    def get_update(self, model_object):
+        """Return the update of the dirty fields of the object.
+
+        The returned tuple contains the table name, the identifiers
+        (the primary keys, as they are stored) and the dictionary of
+        the dirty fields with their new value.
+
+        """
+        dirty = model_object._dirty
+        identifiers = {}
+        for pkey_name in get_pkey_names(type(model_object)):
+            identifiers[pkey_name] = dirty.get(pkey_name,
+                    getattr(model_object, pkey_name))
+
+        values = dict((attribute, getattr(model_object, attribute)) for \
+                attribute in dirty)
+        return (get_plural_name(type(model_object)), identifiers, values)
+
+    def log_change(self, operation, model_object, *args):
+        """Record a change made during a transaction.
+
+        Outside of a transaction, the objects updated in a request
+        are only marked as dirty, to be written by 'flush'.
+
+        """
+        if self.transaction_depth:
+            self.undo_log.append((operation, model_object) + args)
+            self.dirty_objects[id(model_object)] = model_object
+        elif operation == "update" and self.in_request:
+            self.dirty_objects[id(model_object)] = model_object
+
+    def get_cache_statistics(self):
+        """Return the statistics of the caches.
 
-    def get_or_build_object(self, model_name, line):
+        The returned dictionary contains {model_name: statistics}
+        (see the 'statistics' method of dc.cache.ObjectCache).
+
+        """
+        return dict((name, cache.statistics()) for name, cache in \
+                self.objects_tree.items())
+
+    def build_indexes(self, model):
+        """Build the indexes of the model's indexed fields.
+
+        This method should be called when the model is added (its
+        fields have been extended).  The already cached objects
+        are indexed.
+
+        """
+        name = get_name(model)
+        indexes = {}
+        for field in get_fields(model, register=True):
+            if field.index:
+                indexes[field.field_name] = INDEXES[field.index](
+                        field.field_name)
+
+        self.indexes[name] = indexes
+        for model_object in self.objects_tree.get(name, {}).values():
+            self.index_object(model_object)
+
+    def get_index(self, model, field_name):
+        """Return the index of this field or None if not indexed."""
+        return self.indexes.get(get_name(model), {}).get(field_name)
+
+    def index_object(self, model_object):
+        """Add the model object in the indexes of its model."""
+        indexes = self.indexes.get(get_name(type(model_object)), {})
+        for index in indexes.values():
+            index.add(model_object, index.get_value(model_object))
+
+    def unindex_object(self, model_object):
+        """Remove the model object from the indexes of its model."""
+        indexes = self.indexes.get(get_name(type(model_object)), {})
+        for index in indexes.values():
+            index.remove(model_object, index.get_value(model_object))
+
+    def get_or_build_object(self, model_name, line, cache=True):
         """Get or build the corresponding models based on the line.
 
         The line is a dictionary of parameters.  If the object is in the
         cache, then return it.  Otherwise, return a newly created (and
-        cached) model object.
+        cached, if 'cache' is True) model object.
 
         """
         model = self.models[model_name]
-        cached = self.get_from_cache(model, line)
-        if cached:
-            return cached
+        with self.c_lock:
+            cached = self.get_from_cache(model, line)
+            if cached:
+                return cached
+
+            model_object = model(**line)
+            if cache:
+                self.cache_object(model_object)
 
-        model_object = model(**line)
-        self.cache_object(model_object)
         return model_object
 
     def save(self):
-        """Force the data connector to save."""
-        pass
+        """Force the data connector to save.
+
+        The repository managers should call 'flush' first.
+
+        """
+        self.flush()
 
     def get_all_objects(self, model):
-        """Return all the model's object in a list."""
+        """Return all the model's object in a list.
+
+        The objects which are not in the cache (they could have been
+        evicted) are built and cached.
+
+        """
         name = get_name(model)
         plural_name = get_plural_name(model)
         names = get_pkey_names(model)
+        self.flush()
         lines = self.driver.query_for_lines(plural_name)
         objects = []
         for line in lines:
             pkey_attrs = dict((name, line[name]) for name in names)
-            model_object = self.get_from_cache(model, pkey_attrs)
-            if model_object is not None:
-                objects.append(model_object)
-            else:
-                objects.append(self.storage_to_object(name, line))
+            with self.c_lock:
+                model_object = self.get_from_cache(model, pkey_attrs)
+                if model_object is None:
+                    model_object = self.storage_to_object(name, line)
+                    self.cache_object(model_object)
+
+            objects.append(model_object)
 
         return objects
 
+    def iter_objects(self, model, batch_size, cache=True):
+        """Iterate over the model's objects.
+
+        The lines are read by the driver by batches of 'batch_size'
+        lines and the objects are built lazily.  If 'cache' is False,
+        the built objects are not stored in the cache (the cached
+        objects are still returned, though).
+
+        """
+        name = get_name(model)
+        plural_name = get_plural_name(model)
+        names = get_pkey_names(model)
+        self.flush()
+        for line in self.driver.iter_lines(plural_name, batch_size):
+            pkey_attrs = dict((name, line[name]) for name in names)
+            with self.c_lock:
+                model_object = self.get_from_cache(model, pkey_attrs)
+                if model_object is None:
+                    model_object = self.storage_to_object(name, line)
+                    if cache:
+                        self.cache_object(model_object)
+
+            yield model_object
+
     def find_object(self, model, pkey_values):
         """Return, if found, the selected object.
 
-        Raise a model.exceptions.ObjectNotFound if not found.
+        Raise a model.exceptions.ObjectNotFound if not found.  The
+        object read from the driver is cached, so that the next call
+        returns the same object.
 
         """
         # First we try go get the object from cache
@@ -125,11 +486,18 @@ class RepositoryManager(metaclass=ABCMeta):
         # Then we try to query from the driver
         name = get_name(model)
         plural_name = get_plural_name(model)
+        self.flush()
         line = self.driver.query_for_line(plural_name, pkey_values)
         if line is None:
             raise mod_exceptions.ObjectNotFound(model, pkey_values)
 
-        return self.storage_to_object(name, line)
+        with self.c_lock:
+            model_object = self.get_from_cache(model, pkey_values)
+            if model_object is None:
+                model_object = self.storage_to_object(name, line)
+                self.cache_object(model_object)
+
+        return model_object
 
     def find_matching_objects(self, field, value):
         """Return the matching models.
@@ -146,6 +514,7 @@ class RepositoryManager(metaclass=ABCMeta):
             field_name: self.driver.value_to_storage(
                     plural_name, field_name, value),
         }
+        self.flush()
         lines = self.driver.find_matching_lines(plural_name, matches)
         objects = []
         for line in lines:
@@ -154,6 +523,78 @@ class RepositoryManager(metaclass=ABCMeta):
 
         return objects
 
+    def find_objects_in(self, field, values):
+        """Return the objects whose field's value is one of 'values'.
+
+        The objects are selected by the driver at once (see
+        Driver.find_lines_in).
+
+        """
+        model = field.model
+        name = get_name(model)
+        plural_name = get_plural_name(model)
+        field_name = field.field_name
+        values = [self.driver.value_to_storage(plural_name, field_name,
+                value) for value in values]
+        self.flush()
+        lines = self.driver.find_lines_in(plural_name, field_name, values)
+        return [self.get_or_build_object(name, line) for line in lines]
+
+    def prefetch(self, model_objects, field_name):
+        """Load the related objects of several model objects at once.
+
+        The field should be a HasMany or HasOne field of the objects'
+        model.  The related objects are selected with a single query
+        (see 'find_objects_in'):  for a HasMany field, the list of
+        each object is filled and won't be queried again, for a HasOne
+        field, the related objects are cached.
+
+        """
+        if not model_objects:
+            return
+
+        field = getattr(type(model_objects[0]), field_name)
+        if isinstance(field, HasMany):
+            related_field = field.relation.inverse.related_field
+            related_name = related_field.field_name
+            groups = {}
+            for model_object in model_objects:
+                value = get_pkey_values(model_object)
+                groups[value[0] if len(value) == 1 else value] = []
+
+            for related in self.find_objects_in(related_field, groups):
+                group = groups.get(getattr(related, related_name))
+                if group is not None:
+                    group.append(related)
+
+            for model_object in model_objects:
+                value = get_pkey_values(model_object)
+                value = value[0] if len(value) == 1 else value
+                mirror = field.get_cache(model_object).mirror
+                mirror.elements[:] = groups[value]
+                mirror.loaded = True
+        elif isinstance(field, HasOne):
+            foreign_model = field.foreign_model
+            pkey_names = get_pkey_names(foreign_model)
+            if len(pkey_names) != 1:
+                raise ValueError("cannot prefetch a relation to a model " \
+                        "with several primary keys")
+
+            pkey_field = getattr(foreign_model, pkey_names[0])
+            values = set()
+            for model_object in model_objects:
+                value = field.get_related(model_object)
+                if value is not None and not isinstance(value, BaseType):
+                    values.add(value)
+
+            missing = [value for value in values if self.get_from_cache(
+                    foreign_model, {pkey_names[0]: value}) is None]
+            if missing:
+                self.find_objects_in(pkey_field, missing)
+        else:
+            raise ValueError("the field {} is not a HasMany or HasOne " \
+                    "field".format(repr(field_name)))
+
     @abstractmethod
     def add_object(self, model_object):
         """Save the object, issued from a model.
@@ -163,6 +604,9 @@ class RepositoryManager(metaclass=ABCMeta):
         -   Cache the object.
 
         """
+        if not self.transaction_depth:
+            self.flush()
+
         plural_name = get_plural_name(type(model_object))
         to_store = self.object_to_storage(model_object)
         name = get_plural_name(type(model_object))
@@ -170,33 +614,76 @@ class RepositoryManager(metaclass=ABCMeta):
         for field_name, value in other_fields.items():
             object.__setattr__(model_object, field_name, value)
 
+        self.log_change("add", model_object)
         self.cache_object(model_object)
+        self.invalidate_relations(model_object)
+
+    def add_objects(self, model_objects):
+        """Save several objects of the same model at once.
+
+        The objects are sent to the driver in a single call (see
+        'Driver.add_lines') and then cached.
+
+        """
+        if not model_objects:
+            return
+
+        if not self.transaction_depth:
+            self.flush()
+
+        plural_name = get_plural_name(type(model_objects[0]))
+        lines = [self.object_to_storage(model_object) for model_object in \
+                model_objects]
+        rets = self.driver.add_lines(plural_name, lines)
+        for model_object, other_fields in zip(model_objects, rets):
+            for field_name, value in other_fields.items():
+                object.__setattr__(model_object, field_name, value)
+
+            self.log_change("add", model_object)
+            self.cache_object(model_object)
+            self.invalidate_relations(model_object)
 
     @abstractmethod
     def update_object(self, model_object, attribute, old_value):
-        """Update an object."""
-        self.check_update(model_object)
-        field = getattr(type(model_object), attribute)
-        value = getattr(model_object, attribute)
-        identifiers = {}
-        for pkey_name in get_pkey_names(type(model_object)):
-            identifiers[pkey_name] = getattr(model_object, pkey_name)
-        if attribute in identifiers:
-            identifiers[attribute] = old_value
+        """Update an object.
 
-        name = get_plural_name(type(model_object))
+        The field is marked as dirty in the object.  Outside of a
+        transaction or a request, the object is written immediately.
+        Otherwise, it's written by 'flush', with its other dirty
+        fields (the dirty objects are not evicted from the cache).
+        If the object had been evicted from the cache, it's cached
+        again.
 
-        self.driver.update_line(name, identifiers, attribute, value)
+        """
+        self.check_update(model_object)
+        field = getattr(type(model_object), attribute)
+        model_object._dirty.setdefault(attribute, old_value)
         self.update_cache(model_object, field, old_value)
+        self.log_change("update", model_object, attribute, old_value)
+        self.cache_object(model_object)
+        if not self.transaction_depth and not self.in_request:
+            self.flush_object(model_object)
 
     def remove_object(self, model_object):
         """Delete object from cache."""
+        if self.transaction_depth:
+            self.flush_object(model_object)
+        else:
+            self.flush()
+
         name = get_plural_name(type(model_object))
         identifiers = {}
         for pkey_name in get_pkey_names(type(model_object)):
             identifiers[pkey_name] = getattr(model_object, pkey_name)
         self.driver.remove_line(name, identifiers)
         self.uncache_object(model_object)
+        self.invalidate_relations(model_object)
+        values = tuple(identifiers.values())
+        if len(values) == 1:
+            values = values[0]
+
+        self.log_change("remove", model_object, get_name(type(model_object)),
+                values)
 
     def get_from_cache(self, model, attributes):
         """Return, if found, the cached object.
@@ -208,12 +695,16 @@ class RepositoryManager(metaclass=ABCMeta):
         """
         name = get_name(model)
         pkey_names = get_pkey_names(model)
-        cache = self.objects_tree.get(name, {})
+        cache = self.objects_tree.get(name)
+        if cache is None:
+            return None
+
         values = tuple(attributes.get(name) for name in pkey_names)
         if len(values) == 1:
             values = values[0]
 
-        return cache.get(values)
+        with self.c_lock:
+            return cache.fetch(values)
 
     def cache_object(self, object):
         """Save the object in cache."""
@@ -221,7 +712,17 @@ class RepositoryManager(metaclass=ABCMeta):
         if len(pkey) == 1:
             pkey = pkey[0]
 
-        self.objects_tree[get_name(type(object))][pkey] = object
+        cache = self.objects_tree[get_name(type(object))]
+        with self.c_lock:
+            cached = cache.get(pkey)
+            if cached is object:
+                return
+
+            if cached is not None:
+                self.unindex_object(cached)
+
+            self.index_object(object)
+            cache[pkey] = object
 
     def uncache_object(self, object):
         """Remove the object from cache."""
@@ -231,18 +732,29 @@ class RepositoryManager(metaclass=ABCMeta):
             values = values[0]
 
         cache = self.objects_tree.get(name, {})
-        if values in cache.keys():
-            del cache[values]
-            self.deleted_objects.append((name, values))
+        with self.c_lock:
+            if values in cache.keys():
+                del cache[values]
+                self.unindex_object(object)
+                self.deleted_objects.append((name, values))
 
     def update_cache(self, object, field, old_value):
         """This method is called to update the cache for an object.
 
         If the field is one of the primary keys, then it should be
-        updated in the cache too.
+        updated in the cache too.  If the field is indexed, the
+        index is updated.
 
         """
         attr = field.field_name
+        index = self.get_index(type(object), attr)
+        with self.c_lock:
+            if index and index.remove(object, old_value):
+                index.add(object, index.get_value(object))
+
+        if field.many_field is not None:
+            self.invalidate_relations(object, field, old_value)
+
         if old_value is None:
             return
 
@@ -258,13 +770,49 @@ class RepositoryManager(metaclass=ABCMeta):
 
         name = get_name(type(object))
         tree = self.objects_tree[name]
-        if old_pkey in tree:
-            del tree[old_pkey]
-        tree[pkey] = object
+        with self.c_lock:
+            if old_pkey in tree:
+                del tree[old_pkey]
+            tree[pkey] = object
+
+    def invalidate_relations(self, object, field=None, old_value=None):
+        """Invalidate the HasMany lists which could contain the object.
+
+        If a field is specified, it's a foreign key whose value has
+        changed:  the lists of the old and new related objects are
+        invalidated.  Otherwise, every foreign key of the object is
+        browsed (the object has been added or removed).
+
+        """
+        if field is None:
+            fields = get_registry(type(object)).foreign_keys
+        else:
+            fields = [field]
+
+        for field in fields:
+            many_field = field.many_field
+            owner_model = many_field.model
+            pkey_name = get_pkey_names(owner_model)[0]
+            values = [getattr(object, field.field_name)]
+            if old_value is not None:
+                values.append(old_value)
+
+            for value in values:
+                if value is None or isinstance(value, BaseType):
+                    continue
+
+                owner = self.get_from_cache(owner_model, {pkey_name: value})
+                if owner is not None:
+                    many_field.invalidate(owner)
 
     def clear_cache(self):
         """Clear the cache."""
-        self.objects_tree = {}
+        for cache in self.objects_tree.values():
+            cache.clear()
+
+        for indexes in self.indexes.values():
+            for index in indexes.values():
+                index.clear()
 
     def check_update(self, model_object):
         """Raise a ValueError if the object was deleted."""
@@ -302,11 +850,30 @@ class RepositoryManager(metaclass=ABCMeta):
         return model_object
 
     def build_table(self, model):
-        """Build a table on a model object."""
+        """Build a table on a model object.
+
+        The indexed (or unique) fields and the indexes declared on the
+        model are added to the table.  The primary keys are not,
+        the data storage should index them itself.
+
+        """
         name = get_plural_name(model)
         table = Table(name)
         fields = get_fields(model, register=True)
         for field in fields:
             table.add_field(field.field_name, field.constraint)
 
+        for field in fields:
+            if field.has_constraint("pkey"):
+                continue
+
+            if field.index or field.unique:
+                table.add_index([field.field_name], unique=field.unique)
+
+        for field_names in model.indexes:
+            table.add_index(field_names)
+
+        for field_names in model.unique_indexes:
+            table.add_index(field_names, unique=True)
+
         return table
@@ -37,5 +37,9 @@ class Sqlite3Configuration(Configuration):
     schema = Schema("sqlite3", definition={
             "location": Data("the database's location, a file",
                     default="~/aboard/sqlite.db"),
+            "statement_cache_size": Data("the number of prepared " \
+                    "statements kept in cache", default=100, type=int),
+            "pool": Data("the connection pool (min_size, max_size, " \
+                    "timeout, health_check)", default={}, type=dict),
     })
     default_file = "dc/yaml/parameters.yml"
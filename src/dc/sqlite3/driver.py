@@ -88,13 +88,43 @@ class Sqlite3Driver(SQLDriver):
                     "cannot write in {}".format(parent))
 
         self.location = location
-        self.connection = sqlite3.connect(self.location)
         SQLDriver.open(self, configuration)
 
+    def connect(self):
+        """Open and return a new connection.
+
+        With a connection pool, the connections can be used by
+        different threads and the database uses the WAL journal
+        mode, so that the readers don't block the writer.  The
+        LIKE operator is case-sensitive, like in other databases
+        (this also allows Sqlite3 to use an index to answer it).
+
+        """
+        pooled = self.pool is not None
+        connection = sqlite3.connect(self.location,
+                cached_statements=self.statement_cache_size,
+                check_same_thread=not pooled)
+        connection.execute("PRAGMA case_sensitive_like=ON")
+        if pooled:
+            connection.execute("PRAGMA journal_mode=WAL")
+
+        return connection
+
+    def check_connection(self, connection):
+        """Return whether the connection can still be used."""
+        try:
+            connection.execute("SELECT 1")
+        except sqlite3.Error:
+            return False
+
+        return True
+
     def destroy(self):
         """Erase EVERY stored data."""
-        self.connection.close()
-        os.remove(self.location)
+        self.close_connections()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.location + suffix):
+                os.remove(self.location + suffix)
 
     def check_existing_tables(self):
         """Get the created tables."""
@@ -107,16 +137,89 @@ class Sqlite3Driver(SQLDriver):
     def execute_query(self, statement, *args, many=True):
         """Execute a query and return the answer, if any.
 
-        This method uses the sqlite cursors.
+        This method uses the sqlite cursors.  A cursor is kept for
+        each statement in the statement cache (sqlite3 itself keeps
+        the compiled statements of the connection).
 
         """
-        cursor = self.connection.cursor()
+        if self.is_ddl(statement):
+            self.clear_statements()
+            cursor = self.connection.cursor()
+        else:
+            cursor = self.get_statement(statement)
+
         cursor.execute(statement, tuple(args))
         if many:
             return cursor.fetchall()
         else:
             return cursor.fetchone()
 
+    def iter_query(self, statement, *args, batch_size):
+        """Execute a query and iterate over the returned rows.
+
+        A new cursor is used (the cached one could be executed again
+        before the end of the iteration) and the rows are fetched with
+        'fetchmany'.
+
+        """
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(statement, tuple(args))
+            rows = cursor.fetchmany(batch_size)
+            while rows:
+                yield from rows
+                rows = cursor.fetchmany(batch_size)
+        finally:
+            cursor.close()
+
+    def execute_many(self, statement, rows):
+        """Execute the statement with several rows of arguments."""
+        cursor = self.get_statement(statement)
+        cursor.executemany(statement, rows)
+
+    def prepare(self, statement):
+        """Return a new cursor, used to execute the statement."""
+        return self.connection.cursor()
+
+    def release_statement(self, cursor):
+        """Close the cursor."""
+        cursor.close()
+
+    def insert_line(self, table_name, statement, values, auto_increments):
+        """Execute the INSERT statement and return the auto increments.
+
+        In sqlite, an auto increment field is always the row ID,
+        read from the cursor which inserted the line.
+
+        """
+        cursor = self.get_statement(statement)
+        cursor.execute(statement, tuple(values))
+        return dict((field, cursor.lastrowid) for field in auto_increments)
+
+    def last_auto_increment(self, table_name, field):
+        """Return the last inserted row ID.
+
+        In sqlite, an auto increment field is always the row ID.
+
+        """
+        row = self.execute_query("SELECT last_insert_rowid()", many=False)
+        return row[0]
+
     def save(self):
-        """Force the database saving."""
+        """Force the database saving.
+
+        During a transaction, the changes are committed by 'commit'.
+
+        """
+        if not self.in_transaction:
+            self.connection.commit()
+
+    def commit(self):
+        """Commit the transaction."""
+        SQLDriver.commit(self)
         self.connection.commit()
+
+    def rollback(self):
+        """Roll back the transaction."""
+        SQLDriver.rollback(self)
+        self.connection.rollback()
@@ -38,4 +38,4 @@ class Sqlite3QueryManager(SQLQueryManager):
 
     """
 
-    pass
+    NO_LIMIT = -1
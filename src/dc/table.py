@@ -51,15 +51,17 @@ class Table:
     It contains:
         name -- the table's name
         fields -- the table's fields as a ordered dictionary.
+        indexes -- the list of indexes to create in the data storage
 
     The keys and values of this dictionary are the field's name and a
-    constraint type.
+    constraint type.  Each index is a tuple (name, field_names, unique).
 
     """
 
     def __init__(self, name):
         self.name = name
         self.fields = OrderedDict()
+        self.indexes = []
 
     def __repr__(self):
         ret = "<table {} (".format(self.name)
@@ -86,3 +88,21 @@ class Table:
 
         """
         self.fields[name] = constraint
+
+    def add_index(self, field_names, unique=False):
+        """Add an index on one or more fields.
+
+        Expected arguments:
+            field_names -- the sequence of field names
+            unique -- should the index forbid duplicate values?
+
+        """
+        field_names = tuple(field_names)
+        for field_name in field_names:
+            if field_name not in self.fields:
+                raise ValueError("the table {} has no field {}".format(
+                        self.name, repr(field_name)))
+
+        name = "_".join((self.name, ) + field_names)
+        name += "_key" if unique else "_idx"
+        self.indexes.append((name, field_names, unique))
@@ -37,5 +37,12 @@ class YAMLConfiguration(Configuration):
     schema = Schema("yaml", definition={
             "location": Data("the database's location, a directory",
                     default="~/aboard/yaml"),
+            "snapshots": Data("should the tables be snapshot to be " \
+                    "read faster", default=True, type=bool),
+            "flush_interval": Data("the interval (in seconds) during " \
+                    "which the tables are written in background (0 to " \
+                    "write them immediately)", default=0, type=float),
+            "shards": Data("the number of files per table", default=1,
+                    type=int),
     })
     default_file = "dc/yaml/parameters.yml"
@@ -28,18 +28,37 @@
 
 """Module defining the YAMLDriver class."""
 
+import atexit
+from concurrent.futures import ProcessPoolExecutor
 import os
+import pickle
+import re
+import tempfile
+from threading import Event, Lock, Thread
+from zlib import crc32
 
 driver = True
 
 try:
     import yaml
+    Loader = getattr(yaml, "CLoader", yaml.Loader)
+    Dumper = getattr(yaml, "CDumper", yaml.Dumper)
 except ImportError:
     driver = False
 
 from dc.driver import Driver
 from dc import exceptions
 
+def parse_file(path):
+    """Parse and return the content of a YAML file.
+
+    This function is used by the processes reading the shards.
+
+    """
+    with open(path, "r") as file:
+        return yaml.load(file.read(), Loader=Loader)
+
+
 class YAMLDriver(Driver):
 
     """Driver for YAML.
@@ -48,6 +67,37 @@ class YAMLDriver(Driver):
     between the Python Aboard's data layer (not the model's one) and
     the data storage (several YAML files, here).
 
+    The YAML files are parsed with the C loader of PyYAML, if available.
+    Parsing a large YAML file is slow nonetheless, therefore a snapshot
+    of each table is written alongside its YAML file (the
+    {table}.pickle file).  The snapshot contains the size and
+    modification time of the YAML file it was built from.  It's
+    only used if the YAML file didn't change since:  the YAML
+    file remains the reference.  The snapshots can be disabled with
+    the 'snapshots' configuration entry.
+
+    The files are never written in place:  the content is written in
+    a temporary file, synchronized on the disk and then renamed, so
+    that a crash can't leave a truncated table.  If the 'flush_interval'
+    configuration entry is set (in seconds), the tables are written by
+    a background thread:  the tables saved during this interval are
+    only written once, with their last content.  The 'flush' method
+    writes the waiting tables immediately.  If the background writer
+    can't write a table, the table is kept waiting and the error is
+    stored in the 'write_error' attribute.
+
+    A table can be split in several files (shards), by setting the
+    'shards' configuration entry.  The lines are distributed among
+    the shards by a hash of their primary key and the {table}.{i}.yml
+    files are written instead of {table}.yml.  Only the modified
+    shards are written when the table is saved, and the shards are
+    read concurrently by a pool of processes.  If the number of shards
+    changes (or if a table becomes sharded or is no longer sharded),
+    the whole table is written again:  it's first written in the
+    {table}.yml file, which is read instead of the shards as long as
+    it exists, so that a crash during the change can't lose the
+    last saved datas.
+
     """
 
     def __init__(self):
@@ -55,6 +105,19 @@ class YAMLDriver(Driver):
         self.location = None
         self.auto_increments = {}
         self.to_update = set()
+        self.snapshots = True
+        self.flush_interval = 0
+        self.pending = {}
+        self.pending_lock = Lock()
+        self.flush_lock = Lock()
+        self.writer = None
+        self.wake = Event()
+        self.stopped = Event()
+        self.write_error = None
+        self.shards = 1
+        self.pkey_names = {}
+        self.dirty_shards = {}
+        self.obsolete = {}
 
     def can_run(self):
         """Return whether the YAML driver can run."""
@@ -84,9 +147,14 @@ class YAMLDriver(Driver):
 
         self.location = location
         self.files = {}
+        self.snapshots = configuration.get("snapshots", True)
+        self.flush_interval = float(configuration.get("flush_interval", 0))
+        self.shards = max(1, int(configuration.get("shards", 1)))
 
     def close(self):
-        """Close the data connector (nothing to be done)."""
+        """Close the data connector, writing the waiting tables."""
+        self.stop_writer()
+        self.flush()
         Driver.close(self)
 
     def clear(self):
@@ -95,70 +163,412 @@ class YAMLDriver(Driver):
 
     def destroy(self):
         """Erase EVERY stored data."""
+        self.stop_writer()
+        with self.pending_lock:
+            self.pending = {}
+
+        self.dirty_shards = {}
+        self.obsolete = {}
         for file in os.listdir(self.location):
             os.remove(self.location + "/" + file)
 
     def add_table(self, table):
-        """Add the new table if it doesn't exist."""
-        Driver.add_table(self, table)
-        name = table.name
-        filename = self.location + "/" + name + ".yml"
-        self.files[name] = filename
-        if os.path.exists(filename):
-            with open(filename, "r") as file:
-                return self.read_table(name, file)
+        """Add the new table if it doesn't exist.
 
-        return []
+        The lines of the table are read and returned.
 
-    def read_table(self, name, file):
-        """Read a whole table contained in a file.
+        """
+        Driver.add_table(self, table)
+        name = table.name
+        self.files[name] = self.location + "/" + name + ".yml"
+        self.pkey_names[name] = [field_name for field_name, constraint in \
+                table.fields.items() if constraint and constraint.has("pkey")]
+        self.auto_increments.pop(name, None)
+        return self.read_shards(name)
+
+    def read_shards(self, name):
+        """Read and return the lines of a table (sharded or not).
+
+        If the {table}.yml file exists, it's the reference and the
+        shards, if any, are ignored:  when the layout of a table
+        changes, this file is written first and only removed once
+        every new shard is written (see 'write_files').  If the
+        files on the disk don't match the configured number of
+        shards (a table stored in a single file while it should be
+        sharded, or the reverse), the whole table is marked as
+        modified and the layout will change when the table is
+        written.
 
-        This file is supposed to be formatted as a YAML file.  Furthermore,
-        the 'yaml.load' function should return a list of dictionaries.
+        """
+        expression = re.compile("^" + re.escape(name) + r"\.(\d+)\.yml$")
+        indexes = []
+        for filename in os.listdir(self.location):
+            match = expression.search(filename)
+            if match:
+                indexes.append(int(match.group(1)))
+
+        indexes.sort()
+        shards = [self.get_stem(name, i) for i in indexes]
+        if os.path.exists(self.files[name]):
+            stems = [name]
+        elif shards:
+            stems = shards
+        else:
+            return []
+
+        if self.shards == 1:
+            targets = [name]
+        else:
+            targets = [self.get_stem(name, i) for i in range(self.shards)]
+
+        headers = []
+        lines = self.read_files(name, stems, headers)
+        on_disk = [stem for stem in stems if stem == name] + shards
+        if on_disk != targets or any(header.get("shards", 1) != \
+                self.shards for header in headers):
+            self.obsolete[name] = shards
+            if self.shards > 1:
+                self.dirty_shards[name] = set(range(self.shards))
+
+            self.to_update.add(name)
+
+        return lines
+
+    def read_files(self, name, stems, headers=None):
+        """Read the files of a table and return their lines.
+
+        The 'stems' are the names of the files, without extension.
+        The fresh snapshots are used, the other files are parsed
+        (by a pool of processes if there are several files).  If
+        'headers' is specified, the header of each file is appended
+        to it.
 
-        The first dictionary describes some table informations, as
+        """
+        contents = [self.read_snapshot(stem) for stem in stems]
+        to_parse = [stem for stem, datas in zip(stems, contents) if \
+                datas is None]
+        paths = [self.location + "/" + stem + ".yml" for stem in to_parse]
+        if len(paths) > 1:
+            workers = min(len(paths), os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                parsed = list(executor.map(parse_file, paths))
+        else:
+            parsed = [parse_file(path) for path in paths]
+
+        parsed = dict(zip(to_parse, parsed))
+        lines = []
+        for stem, datas in zip(stems, contents):
+            if datas is None:
+                datas = parsed[stem]
+                self.check_datas(stem, datas)
+                self.write_snapshot(stem, datas)
+
+            self.read_table_header(name, datas[0])
+            if headers is not None:
+                headers.append(datas[0])
+
+            lines.extend(datas[1:])
+
+        return lines
+
+    def check_datas(self, stem, datas):
+        """Check the datas read from a YAML file.
+
+        The file is supposed to contain a list of dictionaries.  The
+        first dictionary describes some table informations, as
         the status of the autoincrement fields.  Each following dictionary
         is a line of data which sould describe a model object.
 
         """
-        content = file.read()
-        datas = yaml.load(content)
+        filename = self.location + "/" + stem + ".yml"
         if not isinstance(datas, list):
             raise exceptions.DataFormattingError(
                     "the file {} must contain a YAML formatted list".format(
-                    self.files[name]))
+                    filename))
 
-        table_datas = datas[0]
-        if not isinstance(table_datas, dict):
+        if not datas or not isinstance(datas[0], dict):
             raise exceptions.DataFormattingError(
                     "the table informations are not stored in a YAML " \
-                    "dictionary in the file {}".format(self.files[name]))
-
-        self.read_table_header(name, table_datas)
-        return datas[1:]
+                    "dictionary in the file {}".format(filename))
 
     def read_table_header(self, name, datas):
         """Read the table header.
 
         This header should describe some informations concerning the
-        table (as the autoincrement fields).
+        table (as the autoincrement fields).  The headers of the
+        shards are merged:  the greatest autoincrement values are kept.
 
         """
-        auto_increments = datas.get("auto_increments", {})
-        self.auto_increments[name] = auto_increments
+        auto_increments = self.auto_increments.setdefault(name, {})
+        for field_name, value in datas.get("auto_increments", {}).items():
+            auto_increments[field_name] = max(value, auto_increments.get(
+                    field_name, value))
 
-    def write_table(self, name, lines):
-        """Write the table in a file."""
-        # First, we get the header
+    def get_table_header(self, name):
+        """Return the table header (see 'read_table_header')."""
         header = {}
         if name in self.auto_increments:
             header["auto_increments"] = self.auto_increments[name]
 
-        # Then save the lines
-        lines.insert(0, header)
-        content = yaml.dump(lines, default_flow_style=False)
-        with open(self.location + "/" + name + ".yml", "w") as file:
-            file.write(content)
+        if self.shards > 1:
+            header["shards"] = self.shards
+
+        return header
+
+    @staticmethod
+    def get_stem(name, shard=None):
+        """Return the name of the file (without extension) of a shard."""
+        if shard is None:
+            return name
+
+        return "{}.{}".format(name, shard)
+
+    def get_shard(self, name, identifiers):
+        """Return the shard containing the line.
+
+        The identifiers are the converted values of the primary keys
+        (a dictionary).  The hash used to select the shard doesn't
+        change between two processes.
+
+        """
+        values = tuple(identifiers.get(field_name) for field_name in \
+                self.pkey_names[name])
+        return crc32(repr(values).encode("utf-8")) % self.shards
+
+    def mark_dirty(self, name, *lines):
+        """Mark the table (and the shards of the lines) as modified.
+
+        The lines are dictionaries containing (at least) the converted
+        primary keys.
+
+        """
+        self.to_update.add(name)
+        if self.shards > 1:
+            shards = self.dirty_shards.setdefault(name, set())
+            for line in lines:
+                shards.add(self.get_shard(name, line))
+
+    def write_table(self, name, lines):
+        """Write the table in a file (and its snapshot).
+
+        If a flush interval is set, the lines are given to the
+        background writer and the table will be written later.
+
+        """
+        self.write_shards(name, {None: lines})
+
+    def write_shards(self, name, shards):
+        """Write some shards of the table.
+
+        The 'shards' argument is a dictionary {shard: lines} (the shard
+        is None for a table which is not sharded).  The shards are
+        written in the background if a flush interval is set.
+
+        """
+        header = self.get_table_header(name)
+        files = dict((shard, [header] + lines) for shard, lines in \
+                shards.items())
+        if self.flush_interval <= 0:
+            self.write_files(name, files)
+            return
+
+        with self.pending_lock:
+            self.pending.setdefault(name, {}).update(files)
+
+        self.start_writer()
+        self.wake.set()
+
+    def write_files(self, name, files):
+        """Write the files {shard: datas} of the table.
+
+        If the layout of the table changes (see 'read_shards'), every
+        shard is given and the files are written so that a crash
+        can't roll the table back:  the whole table is first written
+        in the {table}.yml file (the reference), then the old shards
+        are removed and the new ones written.  The {table}.yml file
+        is only removed once every new shard is written.
+
+        """
+        obsolete = self.obsolete.pop(name, None)
+        if obsolete is None:
+            for shard, datas in files.items():
+                self.dump_table(self.get_stem(name, shard), datas)
+
+            return
+
+        if None in files:
+            self.dump_table(name, files[None])
+        else:
+            header = next(iter(files.values()))[0]
+            self.dump_table(name, [header] + [line for datas in \
+                    files.values() for line in datas[1:]])
+
+        for stem in obsolete:
+            self.remove_files(stem)
+
+        if None not in files:
+            for shard, datas in files.items():
+                self.dump_table(self.get_stem(name, shard), datas)
+
+            self.remove_files(name)
+
+    def remove_files(self, stem):
+        """Remove a YAML file and its snapshot, if they exist."""
+        for extension in (".yml", ".pickle"):
+            path = self.location + "/" + stem + extension
+            if os.path.exists(path):
+                os.remove(path)
+
+    def dump_table(self, stem, datas):
+        """Write the datas (header and lines) in a YAML file."""
+        content = yaml.dump(datas, default_flow_style=False, Dumper=Dumper)
+        self.write_file(self.location + "/" + stem + ".yml", content)
+        self.write_snapshot(stem, datas)
+
+    def flush(self):
+        """Write the tables waiting for the background writer.
+
+        If a table can't be written, it's kept waiting (with the
+        tables that were not written yet) and the error is raised.
+
+        """
+        with self.flush_lock:
+            with self.pending_lock:
+                pending = self.pending
+                self.pending = {}
+
+            names = list(pending.keys())
+            try:
+                while names:
+                    self.write_files(names[0], pending[names[0]])
+                    del names[0]
+            finally:
+                if names:
+                    # Put the tables back, unless they were saved again
+                    with self.pending_lock:
+                        for name in names:
+                            files = pending[name]
+                            files.update(self.pending.get(name, {}))
+                            self.pending[name] = files
+
+    def start_writer(self):
+        """Start the background writer, if it isn't running."""
+        if self.writer is not None:
+            return
+
+        self.stopped.clear()
+        self.writer = Thread(target=self.run_writer, daemon=True,
+                name="YAML writer")
+        self.writer.start()
+        atexit.register(self.flush)
+
+    def stop_writer(self):
+        """Stop the background writer (the tables are not written)."""
+        writer = self.writer
+        if writer is None:
+            return
+
+        self.stopped.set()
+        self.wake.set()
+        writer.join()
+        self.writer = None
+        atexit.unregister(self.flush)
+
+    def run_writer(self):
+        """Write the saved tables, in the background writer thread.
+
+        The writer waits for the flush interval after a table is
+        saved, so that the tables saved during this interval are
+        written once.
+
+        """
+        while not self.stopped.is_set():
+            self.wake.wait()
+            self.stopped.wait(self.flush_interval)
+            self.wake.clear()
+            if self.stopped.is_set():
+                break
+
+            try:
+                self.flush()
+            except Exception as error:
+                self.write_error = error
+            else:
+                self.write_error = None
+
+    def write_file(self, path, content):
+        """Replace the file atomically.
+
+        The content (a string or bytes) is written in a temporary
+        file of the same directory, synchronized on the disk, then
+        the temporary file replaces the file.
+
+        """
+        directory, filename = os.path.split(path)
+        descriptor, temporary = tempfile.mkstemp(prefix="." + filename,
+                suffix=".tmp", dir=directory)
+        mode = "wb" if isinstance(content, bytes) else "w"
+        try:
+            with os.fdopen(descriptor, mode) as file:
+                file.write(content)
+                file.flush()
+                os.fsync(file.fileno())
+
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+        if hasattr(os, "O_DIRECTORY"):
+            descriptor = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(descriptor)
+            finally:
+                os.close(descriptor)
+
+    def get_file_signature(self, stem):
+        """Return the (size, modification time) of a YAML file."""
+        status = os.stat(self.location + "/" + stem + ".yml")
+        return (status.st_size, status.st_mtime_ns)
+
+    def read_snapshot(self, stem):
+        """Return the datas read from the snapshot of a file or None.
+
+        None is returned if the snapshot doesn't exist, can't be read
+        or is older than the YAML file.  Otherwise, the datas (the
+        header and the lines) are returned.
+
+        """
+        if not self.snapshots:
+            return None
+
+        path = self.location + "/" + stem + ".pickle"
+        try:
+            with open(path, "rb") as file:
+                signature, datas = pickle.load(file)
+        except Exception:
+            return None
+
+        if signature != self.get_file_signature(stem):
+            return None
+
+        return datas
+
+    def write_snapshot(self, stem, datas):
+        """Write the snapshot of a file.
+
+        The datas are the content of the YAML file (the header,
+        followed by the lines).  The snapshot is bound to the current
+        YAML file.
+
+        """
+        if not self.snapshots:
+            return
+
+        signature = self.get_file_signature(stem)
+        self.write_file(self.location + "/" + stem + ".pickle",
+                pickle.dumps((signature, datas), pickle.HIGHEST_PROTOCOL))
 
     def query_for_lines(self, table_name):
         """Return all the table's line.
@@ -204,13 +614,30 @@ class YAMLDriver(Driver):
             ret[field_name] = value
             self.auto_increments[table_name][field_name] = value + 1
 
-        self.to_update.add(table_name)
+        identifiers = dict((field_name, line.get(field_name)) for \
+                field_name in self.pkey_names[table_name])
+        identifiers.update(ret)
+        self.mark_dirty(table_name, identifiers)
         return ret
 
     def update_line(self, table_name, identifiers, element, value):
         """Update a line (does nothing)."""
-        self.to_update.add(table_name)
+        self.update_fields(table_name, identifiers, {element: value})
+
+    def update_fields(self, table_name, identifiers, values):
+        """Update several fields of a line (does nothing).
+
+        If a primary key is modified, the line may move to another
+        shard.
+
+        """
+        updated = dict(identifiers)
+        updated.update((field_name, value) for field_name, value in \
+                values.items() if field_name in updated)
+        self.mark_dirty(table_name, self.line_to_storage(table_name,
+                identifiers), self.line_to_storage(table_name, updated))
 
     def remove_line(self, table_name, identifiers):
         """Delete the line (do nothing)."""
-        self.to_update.add(table_name)
+        self.mark_dirty(table_name, self.line_to_storage(table_name,
+                identifiers))
@@ -28,8 +28,39 @@
 
 """Module defining the YAMLQueryManager class, defined below."""
 
+from bisect import bisect_left, bisect_right
+import heapq
+import re
+
+from dc.indexes import SortedIndex
 from dc.query_manager import QueryManager
 from model.functions import *
+from model.types import BaseType
+from query.operators import LikeOperator
+
+class Descending:
+
+    """Wrapper of a value, inverting the comparisons.
+
+    It's used in the sort keys for the fields sorted in descending
+    order.
+
+    """
+
+    __slots__ = ("value", )
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __gt__(self, other):
+        return other.value > self.value
+
 
 class YAMLQueryManager(QueryManager):
 
@@ -50,7 +81,15 @@ class YAMLQueryManager(QueryManager):
     without problems.  But as the number of data increases, another
     connector should be prefered, primarily (but not only) because
     the query manager of this connector has to browse EVERY SINGLE
-    object to get a result.
+    object to get a result.  If one of the filtered fields is
+    indexed (see the dc.indexes module), though, the index is used
+    to select the objects to browse.
+
+    When the result is ordered and limited, only the selected objects
+    are sorted (using heapq).  If the query has no filter and the
+    first ordering field has a sorted index, the objects are read
+    from this index, in order, and the reading stops as soon as
+    enough objects have been selected.
 
     """
 
@@ -74,6 +113,43 @@ class YAMLQueryManager(QueryManager):
         """Simply return the lower equal comparison."""
         return field <= value
 
+    @staticmethod
+    def greaterthan(field, value):
+        """Return the greater than comparison (False for None)."""
+        return field is not None and field > value
+
+    @staticmethod
+    def greaterequal(field, value):
+        """Return the greater equal comparison (False for None)."""
+        return field is not None and field >= value
+
+    @staticmethod
+    def between(field, start, end):
+        """Return whether the field is between both values."""
+        return field is not None and start <= field <= end
+
+    @staticmethod
+    def in_values(field, values):
+        """Return whether the field is one of the values."""
+        return field in values
+
+    @staticmethod
+    def isnull(field):
+        """Return whether the field has no value."""
+        return field is None or isinstance(field, BaseType)
+
+    @staticmethod
+    def startswith(field, prefix):
+        """Return whether the field begins with the prefix."""
+        return isinstance(field, str) and field.startswith(prefix)
+
+    @staticmethod
+    def like(field, pattern):
+        """Return whether the field matches the pattern."""
+        return isinstance(field, str) and re.match(
+                LikeOperator.to_regular_expression(pattern), field,
+                re.DOTALL) is not None
+
     def find_operator(self, operator):
         """Return a function used to compare datas."""
         operators = {
@@ -81,6 +157,13 @@ class YAMLQueryManager(QueryManager):
             "!=": self.notequal,
             "<": self.lowerthan,
             "<=": self.lowerequal,
+            ">": self.greaterthan,
+            ">=": self.greaterequal,
+            "between": self.between,
+            "in": self.in_values,
+            "is null": self.isnull,
+            "startswith": self.startswith,
+            "like": self.like,
         }
 
         return operators[operator]
@@ -88,9 +171,22 @@ class YAMLQueryManager(QueryManager):
     def query_objects(self, query):
         """Look for the specified objects."""
         model = query.first_model
-        name = get_name(model)
-        objects = list(self.repository_manager.objects_tree.get(
-                name, {}).values())
+        ordering = query.get_ordering()
+        key = self.get_sort_key(ordering)
+        start = query.nb_offset
+        end = None
+        if query.nb_limit is not None:
+            end = start + query.nb_limit
+
+        objects = self.find_sorted_objects(query, ordering, key, end)
+        if objects is not None:
+            return objects[start:end]
+
+        objects = self.find_indexed_objects(query)
+        if objects is None:
+            name = get_name(model)
+            objects = list(self.repository_manager.objects_tree.get(
+                    name, {}).values())
 
         # Add simple filters
         for filter in query.filters:
@@ -100,4 +196,121 @@ class YAMLQueryManager(QueryManager):
             objects = [model_object for model_object in objects if \
                     function(getattr(model_object, field), *parameters)]
 
-        return objects
+        if query.after_object is not None:
+            last = key(query.after_object)
+            objects = [model_object for model_object in objects if \
+                    key(model_object) > last]
+
+        if ordering:
+            if end is None:
+                objects = sorted(objects, key=key)
+            else:
+                objects = heapq.nsmallest(end, objects, key=key)
+
+        return objects[start:end]
+
+    @staticmethod
+    def get_sort_key(ordering):
+        """Return the function giving the sort key of an object.
+
+        The ordering is a list of (field_name, descending) (see
+        Query.get_ordering).  The objects whose value is None (or
+        not set) are placed first.
+
+        """
+        def key(model_object):
+            values = []
+            for name, descending in ordering:
+                value = getattr(model_object, name)
+                if isinstance(value, BaseType):
+                    value = None
+
+                value = (value is not None, value)
+                if descending:
+                    value = Descending(value)
+
+                values.append(value)
+
+            return tuple(values)
+
+        return key
+
+    def find_sorted_objects(self, query, ordering, key, end=None):
+        """Return the objects read from a sorted index, or None.
+
+        If the query has no filter and the first ordering field has a
+        sorted index (without None values), the objects are read from
+        the index in order.  The 'after' object is found by bisection
+        and, if 'end' is specified, the reading stops after the
+        'end' first objects (and the objects equal to the last one on
+        the indexed field).  The returned list is sorted.  Otherwise,
+        None is returned.
+
+        """
+        if query.filters or not ordering:
+            return None
+
+        name, descending = ordering[0]
+        index = self.repository_manager.get_index(query.first_model, name)
+        if not isinstance(index, SortedIndex) or index.nulls:
+            return None
+
+        keys = index.keys
+        objects = index.objects
+        last = None
+        if descending:
+            stop = len(keys)
+            if query.after_object is not None:
+                last = key(query.after_object)
+                stop = bisect_right(keys, getattr(query.after_object, name))
+            positions = range(stop - 1, -1, -1)
+        else:
+            start = 0
+            if query.after_object is not None:
+                last = key(query.after_object)
+                start = bisect_left(keys, getattr(query.after_object, name))
+            positions = range(start, len(keys))
+
+        selected = []
+        previous = None
+        for i in positions:
+            value = keys[i]
+            if end is not None and len(selected) >= end and \
+                    value != previous:
+                break
+
+            model_object = objects[i]
+            if last is None or key(model_object) > last:
+                selected.append(model_object)
+                previous = value
+
+        selected.sort(key=key)
+        return selected
+
+    def iter_objects(self, query, batch_size, cache=True):
+        """Iterate over the objects (they are all cached)."""
+        return iter(self.query_objects(query))
+
+    def find_indexed_objects(self, query):
+        """Return the objects selected by an index or None.
+
+        If one of the query's filters can be answered by an index,
+        the smallest list of objects returned by the indexes is
+        returned.  The filters still have to be applied to this list.
+        If no filter can use an index, return None.
+
+        """
+        model = query.first_model
+        selected = None
+        for filter in query.filters:
+            operator = filter.operator.name
+            index = self.repository_manager.get_index(model, filter.field)
+            if index is None or not index.can_lookup(operator):
+                continue
+
+            parameters = self.get_parameters_for_filter(filter)
+            objects = index.lookup(operator, *parameters)
+            if selected is None or len(objects) < len(selected):
+                selected = objects
+
+        return selected
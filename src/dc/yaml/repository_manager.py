@@ -42,51 +42,112 @@ class YAMLRepositoryManager(RepositoryManager):
         """Record the given model."""
         RepositoryManager.record_model(self, model)
 
+    def set_cache_policies(self, policies):
+        """Ignore the cache policies.
+
+        The YAML repository manager needs all the objects in cache
+        (the YAML files are written from the cache), therefore the
+        caches remain unbounded.
+
+        """
+        pass
+
     def add_model(self, model):
         """Add the new model."""
         name = get_name(model)
         table = self.build_table(model)
         lines = self.driver.add_table(table)
+        self.build_indexes(model)
         for line in lines:
             model_object = self.storage_to_object(name, line)
             self.cache_object(model_object)
 
     def save(self):
-        """Write the YAML files."""
+        """Write the YAML files.
+
+        If the tables are sharded, only the modified shards are
+        written:  the other objects are not even converted.
+
+        """
+        self.flush()
         names = {}
         for name, model in self.models.items():
             plural_name = get_plural_name(model)
             names[plural_name] = name
 
-        for table in self.driver.to_update:
+        driver = self.driver
+        for table in driver.to_update:
             name = names[table]
-            lines = []
+            if driver.shards == 1:
+                lines = []
+                for object in self.objects_tree[name].values():
+                    lines.append(self.object_to_storage(object))
+
+                driver.write_table(table, lines)
+                continue
+
+            shards = dict((shard, []) for shard in driver.dirty_shards.pop(
+                    table, ()))
+            pkey_names = get_pkey_names(self.models[name])
             for object in self.objects_tree[name].values():
-                lines.append(self.object_to_storage(object))
+                identifiers = driver.line_to_storage(table, dict(zip(
+                        pkey_names, get_pkey_values(object))))
+                lines = shards.get(driver.get_shard(table, identifiers))
+                if lines is not None:
+                    lines.append(self.object_to_storage(object))
 
-            self.driver.write_table(table, lines)
+            driver.write_shards(table, shards)
 
-        self.driver.to_update.clear()
+        driver.to_update.clear()
 
     def get_all_objects(self, model):
         """Return all the model's object in a list."""
         name = get_name(model)
         return list(self.objects_tree.get(name, {}).values())
 
+    def iter_objects(self, model, batch_size, cache=True):
+        """Iterate over the model's objects (they are all cached)."""
+        return iter(self.get_all_objects(model))
+
     def find_matching_objects(self, field, value):
         """Return the matching models.
 
         This method is used to retrieve the matching models of a
-        related field.
+        related field.  If the field is indexed, the index is used.
 
         """
         model = field.model
         name = get_name(model)
         field_name = field.field_name
+        index = self.get_index(model, field_name)
+        if index:
+            return index.lookup("=", value)
+
         objects = [model_object for model_object in self.objects_tree[ \
                 name].values() if getattr(model_object, field_name) == value]
         return objects
 
+    def find_objects_in(self, field, values):
+        """Return the objects whose field's value is one of 'values'.
+
+        If the field is indexed, the index is used for each value.
+
+        """
+        model = field.model
+        field_name = field.field_name
+        index = self.get_index(model, field_name)
+        if index:
+            objects = []
+            for value in values:
+                objects.extend(index.lookup("=", value))
+
+            return objects
+
+        values = set(values)
+        return [model_object for model_object in self.objects_tree[ \
+                get_name(model)].values() if getattr(model_object,
+                field_name) in values]
+
     def add_object(self, model_object):
         """Save the object, issued from a model."""
         RepositoryManager.add_object(self, model_object)
@@ -0,0 +1,167 @@
+# Copyright (c) 2013 LE GOFF Vincent
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the names of its contributors
+#   may be used to endorse or promote products derived from this software
+#   without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT
+# OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""This module contains the compact storage of model objects.
+
+A model can set the 'compact' class attribute to True:
+>>> class User(Model):
+...     compact = True
+...     username = String()
+...
+
+The MetaModel then generates a '__slots__' layout for this model:  each
+registered field (and each foreign key added by a relation) gets a
+slot, named with the SLOT_PREFIX.  The field itself remains a class
+attribute, but its class is replaced by a subclass which also inherits
+from SlotField:  it becomes a data descriptor storing the value in the
+slot.  Reading a slot which has not been set returns the field (a
+BaseType), as it does for an usual model.
+
+The objects of a compact model don't have a per-instance dictionary
+(the Model class doesn't declare one in its slots, only its
+non-compact subclasses get it), therefore an attribute which doesn't
+have a slot can't be set on them.  A compact model should inherit
+from Model or from another compact model:  the subclass of a
+non-compact model inherits its dictionary and doesn't save much.
+
+The memory saved depends on the Python version:  since Python 3.11,
+the attributes of a plain object are stored inline and its
+dictionary is only created when needed, so a plain object is already
+smaller.  Run the benchmark (tests/model/benchmark.py) to measure it.
+
+"""
+
+from types import MemberDescriptorType
+
+from model.types import BaseType
+
+SLOT_PREFIX = "_f_"
+
+class SlotField:
+
+    """Mixin class for a field stored in a slot.
+
+    The 'slot' attribute contains the member descriptor created by
+    '__slots__' (see the 'bind_slot' function).  The 'plain_type' class
+    attribute contains the original field type.
+
+    """
+
+    slot = None
+    plain_type = None
+
+    def __get__(self, obj, typeobj):
+        """Return the value of the slot or the field if not set."""
+        if obj is None:
+            return self
+
+        try:
+            return self.slot.__get__(obj, typeobj)
+        except AttributeError:
+            return self
+
+    def __set__(self, obj, value):
+        """Write the value in the slot."""
+        self.slot.__set__(obj, value)
+
+    def __delete__(self, obj):
+        """Remove the value from the slot."""
+        self.slot.__delete__(obj)
+
+# Dictionary {field_type: slot_field_type}
+slot_types = {}
+
+def get_slot_type(field_type):
+    """Return the SlotField type for the given field type."""
+    slot_type = slot_types.get(field_type)
+    if slot_type is None:
+        slot_type = type("Slot" + field_type.__name__,
+                (SlotField, field_type), {"plain_type": field_type})
+        slot_types[field_type] = slot_type
+
+    return slot_type
+
+def can_slot(field):
+    """Return whether this field can be stored in a slot.
+
+    The fields which define their own descriptor (like the relations or
+    the lists) keep it.
+
+    """
+    field_type = type(field)
+    if isinstance(field, SlotField):
+        field_type = field_type.plain_type
+
+    return field.register and not hasattr(field_type, "__get__")
+
+def get_slot_names(parents, attributes):
+    """Return the slot names of a compact model.
+
+    The parents and attributes are the arguments given to the
+    metaclass.  The names of the slots already defined in a parent
+    are not returned.
+
+    """
+    fields = {}
+    for parent in reversed(parents):
+        fields.update((name, getattr(parent, name)) for name in dir(parent))
+
+    fields.update(attributes)
+    names = set()
+    for name, field in fields.items():
+        if not isinstance(field, BaseType):
+            continue
+
+        field.field_name = name
+        if can_slot(field):
+            names.add(name)
+        elif hasattr(type(field), "attribute_name"):
+            # The relation will add its foreign key field
+            names.add(field.attribute_name)
+
+    names = [name for name in names if not any(hasattr(parent,
+            SLOT_PREFIX + name) for parent in parents)]
+    return tuple(SLOT_PREFIX + name for name in sorted(names))
+
+def bind_slot(model, field):
+    """Bind the field to its slot in the model, if any.
+
+    If the model has a slot for this field, the field's class is
+    replaced by a SlotField type.  Otherwise, if the field has been
+    created from a SlotField (a copied field, a foreign key field created
+    from a compact model's primary key), its plain type is restored.
+
+    """
+    member = getattr(model, SLOT_PREFIX + field.field_name, None)
+    if isinstance(member, MemberDescriptorType) and can_slot(field):
+        if not isinstance(field, SlotField):
+            field.__class__ = get_slot_type(type(field))
+        field.slot = member
+    elif isinstance(field, SlotField):
+        field.__class__ = type(field).plain_type
+        field.__dict__.pop("slot", None)
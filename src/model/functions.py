@@ -29,6 +29,7 @@
 """This module contains different useful functions for manipulating models.
 
 Functions defined here:
+    get_registry(class) -- return the class's field registry
     get_fields(class) -- return the class's field
     get_name(class) -- return the model's name
     get_plural_name(class) -- return the plural class name
@@ -39,8 +40,24 @@ Functions defined here:
 
 """
 
+from model.registry import FieldRegistry
 from model.types import BaseType
 
+def get_registry(model):
+    """Return the field registry of this model.
+
+    The registry (see model.registry.FieldRegistry) is built the first
+    time it's needed and stored in the model, until the model is
+    modified (see MetaModel.invalidate_registry).
+
+    """
+    registry = model.__dict__.get("_field_registry")
+    if registry is None:
+        registry = FieldRegistry(model)
+        type.__setattr__(model, "_field_registry", registry)
+
+    return registry
+
 def get_fields(model, register=False):
     """Return a list of the defined fields in this model.
 
@@ -48,13 +65,11 @@ def get_fields(model, register=False):
     the relations).
 
     """
-    fields = [getattr(model, name) for name in dir(model)]
-    fields = [field for field in fields if isinstance(field, BaseType)]
-    fields = sorted(fields, key=lambda field: field.nid)
+    registry = get_registry(model)
     if register:
-        fields = [field for field in fields if field.register]
+        return list(registry.registered)
 
-    return fields
+    return list(registry.fields)
 
 def get_fields_values(object, register=False):
     """Return a dictionary containing the object's fields and values.
@@ -117,10 +132,7 @@ def get_plural_name(model):
 
 def get_pkey_names(model):
     """Return a list of field names (those defined as primary key)."""
-    fields = get_fields(model)
-    p_fields = [field.field_name for field in fields if \
-            field.has_constraint("pkey")]
-    return p_fields
+    return list(get_registry(model).pkey_names)
 
 def get_pkey_values(object, replacement=None):
     """Return a tuple of datas (those defined as primary key).
@@ -133,12 +145,11 @@ def get_pkey_values(object, replacement=None):
     Model class.
 
     """
-    if replacement is None:
-        replacement = {}
+    registry = get_registry(type(object))
+    if not replacement:
+        return registry.get_pkey_values(object)
 
-    fields = get_fields(type(object))
-    p_fields = [field.field_name for field in fields if \
-            field.has_constraint("pkey")]
+    p_fields = registry.pkey_names
     values = []
     for attr in p_fields:
         if attr in replacement:
@@ -171,7 +182,8 @@ def is_built(model_object):
     An object is built if its field attributes are not BaseType.
 
     """
-    fields = get_fields(type(model_object), register=True)
-    values = [getattr(model_object, field.field_name) for field in fields]
-    bases = [isinstance(field, BaseType) for field in values]
-    return not any(bases)
+    for field in get_registry(type(model_object)).registered:
+        if isinstance(getattr(model_object, field.field_name), BaseType):
+            return False
+
+    return True
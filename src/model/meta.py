@@ -28,6 +28,7 @@
 
 """This module contains the MetaModel metaclass."""
 
+from model.compact import bind_slot, get_slot_names
 from model.functions import *
 
 class MetaModel(type):
@@ -38,8 +39,23 @@ class MetaModel(type):
     -   Check that every field inherited from another class is copied
     -   Check that the field NIDs are properly set.
 
+    It also invalidates the model's field registry (see
+    model.registry) when a field is added, replaced or removed.
+
+    If the model (or one of its parents) has a true 'compact' class
+    attribute, its fields are stored in slots (see model.compact).
+
     """
 
+    def __new__(metacls, name, parents, attributes):
+        compact = attributes.get("compact", any(getattr(parent,
+                "compact", False) for parent in parents))
+        if compact:
+            attributes = dict(attributes)
+            attributes["__slots__"] = get_slot_names(parents, attributes)
+
+        return type.__new__(metacls, name, parents, attributes)
+
     def __init__(cls, name, parents, attributes):
         type.__init__(cls, name, parents, attributes)
         fields = get_fields(cls)
@@ -68,13 +84,44 @@ class MetaModel(type):
             field = clean_fields[i]
             field.nid = nid
             field.model = cls
+            bind_slot(cls, field)
+
+        cls.invalidate_registry()
 
     def __repr__(self):
         """Return the model's name."""
         return get_name(self, bundle=True)
 
+    def __setattr__(cls, name, value):
+        """Set the attribute, invalidating the registry for a field."""
+        old_value = cls.__dict__.get(name)
+        if isinstance(value, BaseType):
+            value.field_name = name
+            bind_slot(cls, value)
+
+        type.__setattr__(cls, name, value)
+        if isinstance(value, BaseType) or isinstance(old_value, BaseType):
+            cls.invalidate_registry()
+
+    def __delattr__(cls, name):
+        """Delete the attribute, invalidating the registry for a field."""
+        old_value = cls.__dict__.get(name)
+        type.__delattr__(cls, name)
+        if isinstance(old_value, BaseType):
+            cls.invalidate_registry()
+
     def extend(cls):
         """Extend all the fields."""
         fields = get_fields(cls)
         for field in fields:
             field.extend()
+
+        cls.invalidate_registry()
+
+    def invalidate_registry(cls):
+        """Forget the field registry of the model and its subclasses."""
+        if "_field_registry" in cls.__dict__:
+            type.__delattr__(cls, "_field_registry")
+
+        for subclass in cls.__subclasses__():
+            subclass.invalidate_registry()
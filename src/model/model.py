@@ -54,9 +54,30 @@ class Model(metaclass=MetaModel):
     ...     creation_date = Datetime()
     ...
 
+    The modified fields, not yet written in the data connector, are
+    kept in the '_dirty' dictionary ({field_name: stored_value}).  The
+    repository manager uses it to write every modified field of an
+    object with a single update (see RepositoryManager.flush_object).
+
+    A model can store its fields in slots, instead of a per-instance
+    dictionary, by setting the 'compact' class attribute to True (see
+    model.compact).  It saves memory when a lot of objects are created.
+
+    The indexes on several fields are declared with the 'indexes' and
+    'unique_indexes' class attributes, containing tuples of field names:
+    >>> class Post(Model):
+    ...     author = String()
+    ...     published_at = DateTime()
+    ...     indexes = [("author", "published_at")]
+    ...
+
     """
 
+    __slots__ = ("__weakref__", "_cache", "_dirty")
     _repository = None
+    compact = False
+    indexes = ()
+    unique_indexes = ()
     bundle = None
 
     # Default fields
@@ -70,18 +91,12 @@ class Model(metaclass=MetaModel):
         omited, if they have default values.
 
         """
-        self._cache = {}
-        fields = get_fields(type(self))
-        fields = dict((field.field_name, field) for field in fields)
         for name, value in kwargs.items():
             object.__setattr__(self, name, value)
 
         # Get the default values
-        for name, field in fields.items():
-            if field.constraint and hasattr(field.constraint,
-                    "auto_increment") and field.constraint.auto_increment:
-                continue
-
+        for field in get_registry(type(self)).defaults:
+            name = field.field_name
             if not name in kwargs and field.set_default:
                 default = field.default
                 if default is None:
@@ -93,6 +108,21 @@ class Model(metaclass=MetaModel):
 
                 object.__setattr__(self, name, default)
 
+    def __getattr__(self, attr):
+        """Create the '_cache' and '_dirty' dictionaries when needed.
+
+        Most objects are never modified and never have cached relations,
+        so these dictionaries are only created when first accessed.
+
+        """
+        if attr in ("_cache", "_dirty"):
+            value = {}
+            object.__setattr__(self, attr, value)
+            return value
+
+        raise AttributeError("{} object has no attribute {}".format(
+                repr(type(self).__name__), repr(attr)))
+
     def __repr__(self):
         pkeys = get_pkey_values(self)
         pkeys = [repr(field) for field in pkeys]
@@ -101,9 +131,8 @@ class Model(metaclass=MetaModel):
 
     def __setattr__(self, attr, value):
         """Set the value to the field."""
-        try:
-            field = getattr(type(self), attr)
-        except AttributeError:
+        field = getattr(type(self), attr, None)
+        if not isinstance(field, BaseType):
             object.__setattr__(self, attr, value)
             return
 
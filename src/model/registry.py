@@ -0,0 +1,80 @@
+# Copyright (c) 2013 LE GOFF Vincent
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the names of its contributors
+#   may be used to endorse or promote products derived from this software
+#   without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT
+# OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""This module contains the FieldRegistry class, described below."""
+
+from operator import attrgetter
+
+from model.types import BaseType
+
+class FieldRegistry:
+
+    """The field metadata of a model, computed once.
+
+    Browsing the model's attributes to find its fields is slow,
+    therefore each model keeps a registry (see the 'get_registry'
+    function in model.functions).  It contains:
+        fields -- the list of fields, sorted by NID
+        registered -- the list of fields to be registered
+        by_name -- a dictionary {field_name: field}
+        pkey_names -- the list of the primary key field names
+        defaults -- the fields whose default value may be set when
+                an object is created (not the auto increment fields)
+        foreign_keys -- the fields created by a HasMany relation
+
+    The registry is invalidated (and built again when needed) when the
+    model is modified by MetaModel.
+
+    """
+
+    def __init__(self, model):
+        fields = [getattr(model, name) for name in dir(model)]
+        fields = [field for field in fields if isinstance(field, BaseType)]
+        self.fields = sorted(fields, key=lambda field: field.nid)
+        self.registered = [field for field in self.fields if \
+                field.register]
+        self.by_name = dict((field.field_name, field) for field in \
+                self.fields)
+        self.pkey_names = [field.field_name for field in self.fields if \
+                field.has_constraint("pkey")]
+        self.defaults = [field for field in self.fields if not \
+                field.has_constraint("auto_increment")]
+        self.foreign_keys = [field for field in self.fields if \
+                field.many_field is not None]
+        if len(self.pkey_names) == 1:
+            getter = attrgetter(self.pkey_names[0])
+            self.get_pkey_values = lambda model_object: (
+                    getter(model_object), )
+        elif self.pkey_names:
+            self.get_pkey_values = attrgetter(*self.pkey_names)
+        else:
+            self.get_pkey_values = lambda model_object: ()
+
+    def __repr__(self):
+        return "<FieldRegistry ({})>".format(", ".join(
+                field.field_name for field in self.fields))
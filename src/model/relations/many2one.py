@@ -59,9 +59,14 @@ class Many2OneRelation(Relation):
         if new_values is not None and not isinstance(new_values, list):
             new_values = [new_values]
 
+        # The list has already been updated, writing the foreign keys
+        # shouldn't invalidate it
+        mirror = self.owner.get_cache(model_object).mirror
+        loaded = mirror.loaded
         if mod_type == Relation.TYPE_DELETE:
             for old_object in old_values:
                 self.inverse.set_related(old_object, None)
+            mirror.loaded = loaded
             return
 
         if mod_type == Relation.TYPE_MODIFY:
@@ -73,6 +78,8 @@ class Many2OneRelation(Relation):
             for new_object in new_values:
                 self.inverse.set_related(new_object, model_object)
 
+        mirror.loaded = loaded
+
     def retrieve_objects(self, model_object):
         """Retrieve the objects of the many part.
 
@@ -87,8 +94,10 @@ class Many2OneRelation(Relation):
 
         field = self.inverse.related_field
         repository = self.inverse.model._repository
-        repository_manager = repository.data_connector.repository_manager
-        return repository_manager.find_matching_objects(field, value)
+        data_connector = repository.data_connector
+        with data_connector.r_lock:
+            return data_connector.repository_manager.find_matching_objects(
+                    field, value)
 
     def extend(self):
         """Extend if necessary one of the model."""
@@ -105,9 +114,10 @@ class Many2OneRelation(Relation):
             raise ValueError("the type of field {} can't be used in " \
                     "a relation".format(field_type))
 
-        related = field_type(default=lambda o: None)
+        related = field_type(default=lambda o: None, index=True)
         related.field_name = attribute_name
         related.model = self.inverse.model
+        related.many_field = self.owner
         if self.inverse_relation: #  didirectional
             related.set_default = False
         setattr(self.inverse.model, attribute_name, related)
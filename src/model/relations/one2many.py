@@ -48,7 +48,8 @@ class One2ManyRelation(Relation):
         apply this change to the inverse's side.  This is a One2Many
         relation, therefore the owning's side is a single object.
         The inverse's side is a list (the many's part) so we delete
-        the old owner, if it exists, and add the new one.
+        the old owner, if it exists, and add the new one.  If the new
+        list hasn't been loaded yet, it will be retrieved when needed.
 
         """
         old_mirror = old_value is not None and self.inverse.get_cache(
@@ -58,5 +59,6 @@ class One2ManyRelation(Relation):
         if old_mirror and model_object in old_mirror:
             old_mirror.remove(model_object)
 
-        if new_mirror is not None:
+        if new_mirror is not None and new_mirror.loaded and \
+                model_object not in new_mirror:
             new_mirror.append(model_object)
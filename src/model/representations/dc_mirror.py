@@ -38,11 +38,17 @@ class DCMirror(collections.MutableSequence):
     as a a standard list though (adding new model objects, remove them or
     updating them).
 
+    The 'loaded' attribute is True if the elements have already been
+    loaded (see HasMany and RepositoryManager.prefetch) and don't have
+    to be retrieved again.  It is set back to False when the list
+    is invalidated.
+
     """
 
     def __init__(self, field):
         self.elements = []
         self.field = field
+        self.loaded = False
 
     def __len__(self):
         return len(self.elements)
@@ -41,6 +41,20 @@ class BaseType:
     in which it is defined.  This identifier is used to order the fields
     for an object.
 
+    A field can be indexed by specifying the 'index' keyword argument:
+        True or "hash" -- the cached objects are indexed by value
+        "sorted" -- the cached objects are sorted by value
+    The indexes are described in the dc.indexes module.  An indexed
+    field is also indexed in the data storage (a CREATE INDEX in SQL,
+    for instance).  The 'unique' keyword argument creates a unique
+    index in the data storage, which forbids two objects with the
+    same value.
+
+    The 'many_field' attribute is only set on foreign keys created by
+    a HasMany relation:  it contains the HasMany field of the related
+    model, whose cached lists should be invalidated when the foreign
+    key changes.
+
     """
 
     current_nid = 1
@@ -53,7 +67,7 @@ class BaseType:
 
     type_name = "undefined"
     can_relate = False
-    def __init__(self, default=None, **kwargs):
+    def __init__(self, default=None, index=None, unique=False, **kwargs):
         """The basetype field constructor."""
         self.nid = self.next_nid()
         self.model = None
@@ -61,6 +75,12 @@ class BaseType:
         self.default = default
         self.register = True
         self.set_default = True
+        self.many_field = None
+        if index is True:
+            index = "hash"
+
+        self.index = index or None
+        self.unique = unique
         constraint = CONSTRAINTS.get(type(self).type_name)
         if constraint:
             constraint = constraint(self, **kwargs)
@@ -74,7 +74,9 @@ class HasMany(Related):
             return self
 
         list4many = self.get_cache(obj)
-        list4many.mirror.elements[:] = self.relation.retrieve_objects(obj)
+        if not list4many.mirror.loaded:
+            self.load(obj)
+
         return list4many
 
     def __set__(self, obj, new_obj):
@@ -96,3 +98,19 @@ class HasMany(Related):
         elements = List4Many(mirror, obj)
         obj._cache[field] = elements
         return elements
+
+    def load(self, obj):
+        """Retrieve the related objects and keep them in the list."""
+        mirror = self.get_cache(obj).mirror
+        mirror.elements[:] = self.relation.retrieve_objects(obj)
+        mirror.loaded = True
+
+    def invalidate(self, obj):
+        """Invalidate the cached list, if any.
+
+        The related objects will be retrieved again on the next access.
+
+        """
+        elements = obj._cache.get(self.field_name)
+        if elements is not None:
+            elements.mirror.loaded = False
@@ -69,3 +69,7 @@ class List4Many(DCMirror):
         DCMirror.insert(self, i, value)
         relation.affect(model_object, i, None, value,
                 Relation.TYPE_ADD)
+
+    def refresh(self):
+        """Retrieve the related objects again, ignoring the cache."""
+        self.field.load(self.model_object)
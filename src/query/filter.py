@@ -28,8 +28,26 @@
 
 """Module containing the Filter class, described below."""
 
+from functools import lru_cache
+
 from query.operators import OPERATORS
 
+@lru_cache(maxsize=1024)
+def parse_expression(expression):
+    """Return a tuple (field, operator class) parsed from the expression.
+
+    The parsed expressions are kept in cache, since the same
+    expressions are often used again.  If the expression isn't
+    valid, a ValueError is raised.
+
+    """
+    for regular_expression, cls_operator in OPERATORS.items():
+        match = regular_expression.search(expression)
+        if match:
+            return match.groups()[0], cls_operator
+
+    raise ValueError("incorrect syntax: {}".format(repr(expression)))
+
 class Filter:
 
     """Class representing a very simple filter.
@@ -50,19 +68,10 @@ class Filter:
 
     def __init__(self, expression, *parameters):
         self.query = None
-        for regular_expression, cls_operator in OPERATORS.items():
-            match = regular_expression.search(expression)
-            if match:
-                field = match.groups()[0]
-                operator = cls_operator(field, *parameters)
-                self.field = field
-                self.operator = operator
-                self.parameters = parameters
-                break
-
-        if not match:
-            raise ValueError("incorrect syntax: {}".format(
-                    repr(expression)))
+        field, cls_operator = parse_expression(expression)
+        self.field = field
+        self.operator = cls_operator(field, *parameters)
+        self.parameters = parameters
 
     def __repr__(self):
         return "<query.filter.Filter with {}>".format(str(self.operator))
@@ -32,18 +32,32 @@ Each operator should be a class inherited from query.operator.base.Operator.
 
 """
 
+from query.operators.between import BetweenOperator
 from query.operators.equal import EqualOperator
+from query.operators.greaterequal import GreaterEqualOperator
+from query.operators.greaterthan import GreaterThanOperator
+from query.operators.inlist import InOperator
+from query.operators.isnull import IsNullOperator
+from query.operators.like import LikeOperator
 from query.operators.lowerequal import LowerEqualOperator
 from query.operators.lowerthan import LowerThanOperator
 from query.operators.notequal import NotEqualOperator
+from query.operators.startswith import StartsWithOperator
 
 OPERATORS = {}
 
 CLASS_OPERATORS = [
+     BetweenOperator,
      EqualOperator,
+     GreaterEqualOperator,
+     GreaterThanOperator,
+     InOperator,
+     IsNullOperator,
+     LikeOperator,
      LowerEqualOperator,
      LowerThanOperator,
      NotEqualOperator,
+     StartsWithOperator,
 ]
 
 for operator in CLASS_OPERATORS:
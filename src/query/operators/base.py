@@ -43,11 +43,15 @@ class Operator:
     operator used by a selected data connector is contained in the
     data connector itself.
 
+    If the 'multiple' class attribute is True, each parameter is a
+    sequence of values (like for the 'in' operator).
+
     """
 
     name = None
     expression = ""
     nb_parameters = 1
+    multiple = False
 
     @classmethod
     def compile_regular_expression(cls):
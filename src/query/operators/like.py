@@ -0,0 +1,68 @@
+# Copyright (c) 2013 LE GOFF Vincent
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the names of its contributors
+#   may be used to endorse or promote products derived from this software
+#   without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT
+# OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Module containing the LikeOperator class, defined below."""
+
+from functools import lru_cache
+import re
+
+from query.operators.base import Operator
+
+class LikeOperator(Operator):
+
+    """Generic query operator to match a string with a pattern.
+
+    The pattern uses the SQL syntax:  '%' matches any number of
+    characters and '_' matches a single character.  The comparison
+    is case-sensitive:
+        filter("title like ?", "%snow%")
+
+    """
+
+    name = "like"
+    expression = "{field} {operator} {}"
+
+    @staticmethod
+    def get_prefix(pattern):
+        """Return the beginning of the pattern, before any wildcard."""
+        return re.split("[%_]", pattern, maxsplit=1)[0]
+
+    @staticmethod
+    @lru_cache(maxsize=128)
+    def to_regular_expression(pattern):
+        """Convert the pattern into a regular expression (a string)."""
+        expression = ""
+        for character in pattern:
+            if character == "%":
+                expression += ".*"
+            elif character == "_":
+                expression += "."
+            else:
+                expression += re.escape(character)
+
+        return "^" + expression + "$"
@@ -28,9 +28,15 @@
 
 """Module containing the Query class, described below."""
 
+from collections import namedtuple
+
 from model.functions import *
+from model.types import HasMany, HasOne
 from query.filter import Filter
 
+# Dictionary {(model, fields): row_type} (see Query.get_row_type)
+row_types = {}
+
 class Query:
 
     """Class representing a generic query with filters and specifications.
@@ -40,13 +46,49 @@ class Query:
     connector.  When a query is executed, the whole query is sent to
     the data connector that should answer by a generic result, as well.
 
+    The result can be ordered and paginated:
+    >>> query = repository.query()
+    >>> query.filter("published_at <= ?", today)
+    >>> query.order_by("-published_at").limit(10)
+    >>> page = query.execute()
+    The next page can be selected with an offset or, more efficiently
+    (the skipped objects don't have to be read), by specifying the
+    last object of the current page:
+    >>> query.after(page[-1])
+
+    The query can also be used to count or aggregate the selected
+    objects, without building them:
+    >>> query.count()
+    >>> query.group_by("author_id").sum("price")
+    The aggregates are listed in the AGGREGATES class attribute.
+
+    Finally, the query can return some fields only, without building
+    the model objects:
+    >>> query.only("id", "title").execute()
+    [PostRow(id=1, title='First post'), ...]
+    >>> query.values("id", "title")
+    [(1, 'First post'), ...]
+
+    The related objects of the selected objects can be loaded at once,
+    instead of one query per object:
+    >>> query.prefetch("comments").execute()
+
     """
 
+    AGGREGATES = ("count", "sum", "min", "max", "avg")
+
     def __init__(self, data_connector, first_model=None):
         self.data_connector = data_connector
         self.first_model = first_model
         self.filters = []
         self.connectors = []
+        self.ordering = []
+        self.nb_limit = None
+        self.nb_offset = 0
+        self.after_object = None
+        self.grouping = []
+        self.projection = []
+        self.prefetched = []
 
     def __str__(self):
         query = "select {}".format(get_name(self.first_model, bundle=True))
@@ -58,6 +100,19 @@ class Query:
                 query += " " + connector
                 query += " " + str(filter)
 
+        if self.grouping:
+            query += " group by " + ", ".join(self.grouping)
+        if self.ordering:
+            query += " order by " + ", ".join(name + (" desc" if \
+                    descending else "") for name, descending in \
+                    self.ordering)
+        if self.after_object is not None:
+            query += " after " + repr(self.after_object)
+        if self.nb_limit is not None:
+            query += " limit {}".format(self.nb_limit)
+        if self.nb_offset:
+            query += " offset {}".format(self.nb_offset)
+
         return query
 
     def filter(self, expression, *parameters, connector="and"):
@@ -83,9 +138,220 @@ class Query:
 
         self.connectors.append(connector)
 
+    def order_by(self, *fields):
+        """Order the result by the specified fields.
+
+        Each field is the name of a field of the model, prefixed by a
+        minus sign ('-') to sort in descending order:
+            order_by("-published_at", "title")
+
+        """
+        for name in fields:
+            descending = name.startswith("-")
+            name = name.lstrip("-")
+            self.check_field(name)
+            self.ordering.append((name, descending))
+
+        return self
+
+    def check_field(self, name):
+        """Raise a ValueError if 'name' isn't a registered field."""
+        registered = get_registry(self.first_model).registered
+        if name not in [field.field_name for field in registered]:
+            raise ValueError("the model {} has no field {} that can be " \
+                    "used in a query".format(get_name(self.first_model),
+                    repr(name)))
+
+    def limit(self, number):
+        """Only return the first 'number' objects."""
+        number = int(number)
+        if number < 0:
+            raise ValueError("the limit cannot be negative")
+
+        self.nb_limit = number
+        return self
+
+    def offset(self, number):
+        """Skip the first 'number' objects."""
+        number = int(number)
+        if number < 0:
+            raise ValueError("the offset cannot be negative")
+
+        self.nb_offset = number
+        return self
+
+    def after(self, last_object):
+        """Only return the objects placed after 'last_object'.
+
+        The objects are compared with the query's order (see
+        'get_ordering').  This pagination, also called keyset
+        pagination, is more efficient than an offset, which has to
+        read every skipped object.
+
+        """
+        self.after_object = last_object
+        return self
+
+    def get_ordering(self):
+        """Return the list of (field_name, descending) to sort the result.
+
+        If the query is ordered (or if 'after' has been called), the
+        primary key fields are added to the order, so that two objects
+        are never equal and the pages are always the same.
+
+        """
+        ordering = list(self.ordering)
+        if ordering or self.after_object is not None:
+            names = [name for name, descending in ordering]
+            for name in get_pkey_names(self.first_model):
+                if name not in names:
+                    ordering.append((name, False))
+
+        return ordering
+
+    def only(self, *fields):
+        """Only select the specified fields.
+
+        The query doesn't return model objects any longer, but rows
+        (named tuples, see 'get_row_type') containing the fields'
+        values.  These rows are not cached.
+
+        """
+        for name in fields:
+            self.check_field(name)
+
+        self.projection = list(fields)
+        return self
+
+    def values(self, *fields):
+        """Return a list of tuples containing the fields' values.
+
+        The fields are selected as with 'only' (if no field is
+        specified, the query's projection is used).
+
+        """
+        if fields:
+            self.only(*fields)
+
+        if not self.projection:
+            raise ValueError("no field to select")
+
+        with self.data_connector.r_lock:
+            return self.data_connector.query_manager.values(self)
+
+    def prefetch(self, *fields):
+        """Load the related objects when the query is executed.
+
+        The fields should be HasMany or HasOne fields of the model.
+        The related objects of every selected object are loaded with
+        a single query for each field (see
+        RepositoryManager.prefetch).
+
+        """
+        for name in fields:
+            field = getattr(self.first_model, name, None)
+            if not isinstance(field, (HasMany, HasOne)):
+                raise ValueError("the model {} has no relation {}".format(
+                        get_name(self.first_model), repr(name)))
+
+            self.prefetched.append(name)
+
+        return self
+
+    def get_row_type(self):
+        """Return the named tuple type of the rows."""
+        key = (self.first_model, tuple(self.projection))
+        row_type = row_types.get(key)
+        if row_type is None:
+            row_type = namedtuple(self.first_model.__name__ + "Row",
+                    self.projection)
+            row_types[key] = row_type
+
+        return row_type
+
+    def group_by(self, *fields):
+        """Group the aggregates by the specified fields.
+
+        An aggregate on a grouped query returns a dictionary
+        {group: result}, the group being the field's value (or a tuple
+        of values if several fields are specified):
+        >>> query.group_by("title").count()
+        {"first": 2, "second": 1}
+
+        """
+        for name in fields:
+            self.check_field(name)
+            self.grouping.append(name)
+
+        return self
+
+    def count(self):
+        """Return the number of selected objects."""
+        return self.aggregate("count")
+
+    def exists(self):
+        """Return whether at least one object is selected."""
+        with self.data_connector.r_lock:
+            return self.data_connector.query_manager.exists(self)
+
+    def sum(self, field_name):
+        """Return the sum of the field's values."""
+        return self.aggregate("sum", field_name)
+
+    def min(self, field_name):
+        """Return the minimum value of the field."""
+        return self.aggregate("min", field_name)
+
+    def max(self, field_name):
+        """Return the maximum value of the field."""
+        return self.aggregate("max", field_name)
+
+    def avg(self, field_name):
+        """Return the average value of the field."""
+        return self.aggregate("avg", field_name)
+
+    def aggregate(self, function, field_name=None):
+        """Return the result of the aggregate function.
+
+        The function should be one of the AGGREGATES.  The field name
+        can only be omitted to count the selected objects.  The values
+        set to None are ignored (like in SQL).  Without any value, the
+        count is 0 and the other aggregates return None.
+
+        """
+        if function not in type(self).AGGREGATES:
+            raise ValueError("unknown aggregate {}".format(repr(function)))
+
+        if field_name is None:
+            if function != "count":
+                raise ValueError("the {} aggregate expects a field " \
+                        "name".format(function))
+        else:
+            self.check_field(field_name)
+
+        with self.data_connector.r_lock:
+            return self.data_connector.query_manager.aggregate(self,
+                    function, field_name)
+
     def execute(self, many=True):
-        """Execute the query."""
-        result = self.data_connector.query_manager.query_objects(self)
+        """Execute the query.
+
+        The data connector is locked while the query is executed (see
+        'dc.connector.DataConnector.r_lock').
+
+        """
+        query_manager = self.data_connector.query_manager
+        repository_manager = self.data_connector.repository_manager
+        with self.data_connector.r_lock:
+            if self.projection:
+                row_type = self.get_row_type()
+                result = [row_type._make(row) for row in \
+                        query_manager.values(self)]
+            else:
+                result = query_manager.query_objects(self)
+                for name in self.prefetched:
+                    repository_manager.prefetch(result, name)
+
         if many:
             return result
 
@@ -93,3 +359,21 @@ class Query:
             return result[0]
 
         return None
+
+    def iterate(self, batch_size=1000, cache=True):
+        """Iterate over the query's result.
+
+        The objects are read by batches of 'batch_size' objects and
+        built when needed.  If 'cache' is False, the built objects
+        are not kept in the cache (see Repository.iter_all).  If the
+        query has a projection (see 'only'), the rows are returned.
+
+        """
+        query_manager = self.data_connector.query_manager
+        if self.projection:
+            rows = query_manager.iter_values(self, batch_size)
+            return map(self.get_row_type()._make,
+                    self.data_connector.stream(rows))
+
+        return self.data_connector.stream(query_manager.iter_objects(
+                self, batch_size, cache=cache))
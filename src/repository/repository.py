@@ -75,10 +75,38 @@ class Repository:
 
     def get_all(self):
         """Return all model objects."""
-        with self.data_connector.u_lock:
+        with self.data_connector.r_lock:
             return self.data_connector.repository_manager.get_all_objects(
                     self.model)
 
+    def iter_all(self, batch_size=1000, cache=True):
+        """Iterate over all model objects.
+
+        Unlike 'get_all', the objects are read from the data connector
+        by batches of 'batch_size' objects and built when needed, so
+        that a large table doesn't have to be in memory at once.  If
+        'cache' is False, the objects are not kept in the cache:
+        >>> for user in repository.iter_all(cache=False):
+        ...     export(user)
+
+        """
+        repository_manager = self.data_connector.repository_manager
+        return self.data_connector.stream(repository_manager.iter_objects(
+                self.model, batch_size, cache=cache))
+
+    def prefetch(self, model_objects, *fields):
+        """Load the related objects of several model objects at once.
+
+        The fields are HasMany or HasOne fields of the model:
+        >>> posts = repository.get_all()
+        >>> repository.prefetch(posts, "comments")
+
+        """
+        with self.data_connector.r_lock:
+            for name in fields:
+                self.data_connector.repository_manager.prefetch(
+                        model_objects, name)
+
     def find(self, pkey=None, **kwargs):
         """Find and return (if found) an object identified by its keys.
 
@@ -125,7 +153,7 @@ class Repository:
                         model_name, ", ".join(repr_pkey_names)))
 
         object = None
-        with self.data_connector.u_lock:
+        with self.data_connector.r_lock:
             object = self.data_connector.repository_manager.find_object(
                     self.model, pkey_values)
 
@@ -144,6 +172,38 @@ class Repository:
 
         return model_object
 
+    def create_many(self, iterable, batch_size=1000):
+        """Create and save several model objects.
+
+        The iterable should yield dictionaries of keyword arguments
+        (as expected by 'create').  The objects are saved by batches
+        of 'batch_size' objects, each batch being sent to the data
+        connector at once.  The created objects are returned in a list.
+
+        >>> users = repository.create_many(
+        ...         {"username": name} for name in names)
+
+        """
+        created = []
+        batch = []
+        for kwargs in iterable:
+            batch.append(self.model(**kwargs))
+            if len(batch) >= batch_size:
+                self.add_batch(batch)
+                created.extend(batch)
+                batch = []
+
+        if batch:
+            self.add_batch(batch)
+            created.extend(batch)
+
+        return created
+
+    def add_batch(self, model_objects):
+        """Save a batch of model objects in the data connector."""
+        with self.data_connector.u_lock:
+            self.data_connector.repository_manager.add_objects(model_objects)
+
     def update(self, model_object, attr, old_value):
         """Update the object in the data connector."""
         with self.data_connector.u_lock:
@@ -29,10 +29,11 @@
 """This module contains the AboardDispatcher class, defined below."""
 
 import os
-from threading import RLock
 
 import cherrypy
 
+from router.index import RouteIndex
+from router.lock import ReadWriteLock
 from router.route import Route
 
 class AboardDispatcher:
@@ -59,9 +60,24 @@ class AboardDispatcher:
           images/32
           ...
 
+    By default, the requests are dispatched concurrently:  each
+    CherryPy thread matches the route and calls the controller
+    without waiting for the other requests.  The 'req_lock' is a
+    reader/writer lock:  the requests hold it in read mode whereas
+    the autoloader holds it in write mode when it reloads a module
+    (the routes and controllers are then replaced).  The access to
+    the data connector is still protected by its own locks (see
+    'dc.connector.DataConnector.r_lock').  If the 'concurrent'
+    attribute is set to False, the requests hold the lock in write
+    mode and are therefore served one at a time.
+
+    To find the matching route, the dispatcher uses a route index
+    (see 'router.index.RouteIndex') built when the bundles are
+    loaded and rebuilt when the routes are modified.
+
     """
 
-    def __init__(self):
+    def __init__(self, concurrent=True):
         """Construct the dispatcher for Python Aboard.
 
         Note that the translator used on the default dispatcher is
@@ -69,12 +85,19 @@ class AboardDispatcher:
 
         """
         self.routes = {}
-        self.req_lock = RLock()
+        self.index = None
+        self.req_lock = ReadWriteLock()
+        self.concurrent = concurrent
 
     @cherrypy.expose
     def default(self, *args, **kwargs):
         """Return the appropriate page handler, plus any virtual path."""
-        with self.req_lock:
+        if self.concurrent:
+            lock = self.req_lock.read()
+        else:
+            lock = self.req_lock.write()
+
+        with lock:
             request = cherrypy.request
             path = "/" + "/".join(args)
 
@@ -89,23 +112,29 @@ class AboardDispatcher:
                 format = ""
                 without_format = path
 
-            for route in self.routes.values():
-                if route.format_dependent:
-                    to_test = path
-                else:
-                    to_test = without_format
+            index = self.index
+            if index is None:
+                index = self.build_index()
 
-                match = route.match(request, to_test)
-                if not isinstance(match, bool):
-                    return route(*match, **kwargs)
+            found = index.match(request.method, path, without_format)
+            if found:
+                route, match = found
+                return route(*match, **kwargs)
 
         raise cherrypy.NotFound()
 
+    def build_index(self):
+        """Build and return the route index."""
+        index = RouteIndex(self.routes.values())
+        self.index = index
+        return index
+
     def add_route(self, name, pattern, controller, callable,
             methods=None):
         """Add a route."""
         route = Route(pattern, controller, callable, methods)
         self.routes[name] = route
+        self.index = None
         return route
 
     def delete_routes_for_controller(self, controller):
@@ -117,3 +146,4 @@ class AboardDispatcher:
         for name, route in tuple(self.routes.items()):
             if isinstance(route.controller, controller):
                 del self.routes[name]
+                self.index = None
@@ -0,0 +1,135 @@
+# Copyright (c) 2013 LE GOFF Vincent
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the names of its contributors
+#   may be used to endorse or promote products derived from this software
+#   without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT
+# OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""This module contains the RouteIndex class, defined below."""
+
+import re
+
+class RouteIndex:
+
+    """Index of the routes used by the dispatcher to find a matching route.
+
+    Instead of testing each route's regular expression one after the
+    other, the index combines them in a single regular expression:
+        ^(?:(route1)|(route2)|...)$
+    The regular expressions of the routes are tested in the same order
+    as before (Python's alternation returns the first matching branch),
+    but the whole scan is performed by the 're' module.
+
+    A combined regular expression is built for each HTTP method
+    used by a route (the routes accepting all the methods are present
+    in each of them).  Plus, as some routes can be dependent on the
+    format (the extension of the URI) while others are not, the routes
+    are split in consecutive runs sharing the same 'format_dependent'
+    value.  Each run has its own combined regular expression.
+
+    The index is read-only:  when the routes are modified, a new
+    index should be built.
+
+    """
+
+    def __init__(self, routes):
+        """Build the index from an ordered sequence of routes."""
+        routes = list(routes)
+        methods = set()
+        for route in routes:
+            if route.methods:
+                methods.update(route.methods)
+
+        self.runs = {}
+        for method in methods:
+            self.runs[method] = self.build_runs([route for route in routes \
+                    if not route.methods or method in route.methods])
+
+        self.default_runs = self.build_runs([route for route in routes if \
+                not route.methods])
+
+    @staticmethod
+    def build_runs(routes):
+        """Return the list of runs for the specified routes.
+
+        Each run is a tuple (format_dependent, regex, groups) where
+        'groups' is a dictionary {group number: (route, nb_groups)}.
+        The group number is the one of the group wrapping the route's
+        regular expression in the combined one.
+
+        """
+        runs = []
+        current = []
+        for route in routes:
+            if current and current[-1].format_dependent != \
+                    route.format_dependent:
+                runs.append(RouteIndex.build_run(current))
+                current = []
+
+            current.append(route)
+
+        if current:
+            runs.append(RouteIndex.build_run(current))
+
+        return runs
+
+    @staticmethod
+    def build_run(routes):
+        """Build a single run (see 'build_runs')."""
+        branches = []
+        groups = {}
+        number = 1
+        for route in routes:
+            # Remove the '^' and '$' anchors of the route's pattern
+            pattern = route.re_pattern.pattern[1:-1]
+            branches.append("(" + pattern + ")")
+            groups[number] = (route, route.re_pattern.groups)
+            number += 1 + route.re_pattern.groups
+
+        regex = re.compile("^(?:" + "|".join(branches) + ")$")
+        return (routes[0].format_dependent, regex, groups)
+
+    def match(self, method, path, without_format):
+        """Return the first matching route and its groups or None.
+
+        The expected arguments are:
+            method -- the HTTP method of the request
+            path -- the full path of the request
+            without_format -- the path without the format (extension)
+
+        If a route matches, return a tuple (route, groups) where
+        groups is the tuple that would have been returned by
+        'Route.match'.
+
+        """
+        runs = self.runs.get(method.upper(), self.default_runs)
+        for format_dependent, regex, groups in runs:
+            to_test = path if format_dependent else without_format
+            match = regex.search(to_test)
+            if match:
+                number = match.lastindex
+                route, nb_groups = groups[number]
+                return route, match.groups()[number:number + nb_groups]
+
+        return None
@@ -0,0 +1,132 @@
+# Copyright (c) 2013 LE GOFF Vincent
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the names of its contributors
+#   may be used to endorse or promote products derived from this software
+#   without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT
+# OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""This module contains the ReadWriteLock class, defined below."""
+
+from contextlib import contextmanager
+from threading import Condition, Lock, get_ident
+
+class ReadWriteLock:
+
+    """A reader/writer lock used to protect the dispatcher.
+
+    Several threads can hold the lock in read mode at the same time (this
+    is what the dispatcher does for each request), but only one thread
+    can hold it in write mode, and no reader can hold it in the
+    meantime (this is what the autoloader does when it reloads a
+    module, since routes and controllers are replaced).
+
+    The write mode is reentrant and the writers have priority:  when a
+    writer waits for the lock, new readers wait until it has released it.
+    A thread holding the lock in write mode can also acquire it in
+    read mode (a reloaded controller could be called, for instance).
+
+    The 'read' and 'write' methods should be used as context managers:
+    >>> lock = ReadWriteLock()
+    >>> with lock.read():
+    ...     # Several threads can be here
+    ...     pass
+    >>> with lock.write():
+    ...     # Only one thread can be here
+    ...     pass
+
+    """
+
+    def __init__(self):
+        self.condition = Condition(Lock())
+        self.readers = 0
+        self.writer = None
+        self.writer_depth = 0
+        self.waiting_writers = 0
+
+    def acquire_read(self):
+        """Acquire the lock in read mode."""
+        with self.condition:
+            if self.writer == get_ident():
+                self.writer_depth += 1
+                return
+
+            while self.writer is not None or self.waiting_writers:
+                self.condition.wait()
+
+            self.readers += 1
+
+    def release_read(self):
+        """Release the lock previously acquired in read mode."""
+        with self.condition:
+            if self.writer == get_ident():
+                self.writer_depth -= 1
+                return
+
+            self.readers -= 1
+            if self.readers == 0:
+                self.condition.notify_all()
+
+    def acquire_write(self):
+        """Acquire the lock in write mode."""
+        with self.condition:
+            thread = get_ident()
+            if self.writer == thread:
+                self.writer_depth += 1
+                return
+
+            self.waiting_writers += 1
+            try:
+                while self.writer is not None or self.readers:
+                    self.condition.wait()
+            finally:
+                self.waiting_writers -= 1
+
+            self.writer = thread
+            self.writer_depth = 1
+
+    def release_write(self):
+        """Release the lock previously acquired in write mode."""
+        with self.condition:
+            self.writer_depth -= 1
+            if self.writer_depth == 0:
+                self.writer = None
+                self.condition.notify_all()
+
+    @contextmanager
+    def read(self):
+        """Context manager to hold the lock in read mode."""
+        self.acquire_read()
+        try:
+            yield self
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        """Context manager to hold the lock in write mode."""
+        self.acquire_write()
+        try:
+            yield self
+        finally:
+            self.release_write()
@@ -144,6 +144,8 @@ class Server:
                 self.hostname = server["hostname"]
             if "forwarding_port" in server:
                 self.forwarding_port = server["forwarding_port"]
+            if "concurrent_dispatch" in server:
+                self.dispatcher.concurrent = server["concurrent_dispatch"]
 
         # DataConnector configuration
         dc_conf = self.configurations["data_connector"].datas
@@ -160,6 +162,8 @@ class Server:
         config_path = os.path.join(self.user_directory, "config",
                 "data_connector.yml")
         dc.setup(config_path)
+        cherrypy.engine.subscribe("before_request", dc.begin_request)
+        cherrypy.engine.subscribe("after_request", dc.release_connection)
         Model.data_connector = dc
         self.services.services["data_connector"].data_connector = dc
 
@@ -195,6 +199,8 @@ class Server:
         for bundle in self.bundles.values():
             bundle.setup(self, self.loader)
 
+        self.dispatcher.build_index()
+
         for model in self.models:
             type(model).extend(model)
         for model in self.models:
@@ -26,15 +26,159 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 
-"""Test for the sqlite3 data connector."""
+"""Test for the MongoDB data connector."""
 
 from unittest import TestCase
 
+from model.functions import get_plural_name
 from tests.dc.test import AbstractDCTest
 from tests.dc.query_manager import AbstractQMTest
+from tests.model import *
 from dc.mongo.connector import MongoDBConnector
 
 class DCTest(AbstractDCTest, AbstractQMTest, TestCase):
 
+    """Test the MongoDB data connector.
+
+    Testing methods:
+        test_increment_block -- reserve a block of IDs
+        test_increment_resume -- reserve a new block after reopening
+        test_duplicate_counters -- merge the duplicate counters
+        test_unset -- remove the fields set to None
+        test_bulk_flush -- send the writes of a transaction in bulk
+        test_bulk_request -- send the updates of a request in bulk
+
+    """
+
     name = "mongo"
     connector = MongoDBConnector
+
+    def get_document(self, model, uid):
+        """Return the document stored in MongoDB (or None)."""
+        collection = self.dc.driver.datas[get_plural_name(model)]
+        return collection.find_one({"id": uid})
+
+    def get_counter(self, model, field_name="id"):
+        """Return the next value of the auto increment field."""
+        increments = self.dc.driver.increments[get_plural_name(model)]
+        return increments.find_one({"name": field_name})["current"]
+
+    def test_increment_block(self):
+        """Reserve a block of IDs and use it without querying."""
+        self.teardown_data_connector()
+        self.setup_data_connector(increment_block=10)
+        repository = User._repository
+        first = repository.create(username="Block0").id
+        self.assertEqual(self.get_counter(User), first + 10)
+        uids = [first] + [repository.create(username="Block" + str(i)).id \
+                for i in range(1, 5)]
+        self.assertEqual(uids, list(range(first, first + 5)))
+
+        # The block is still used:  the counter didn't change
+        self.assertEqual(self.get_counter(User), first + 10)
+
+        # A batch larger than the block reserves its own values
+        users = repository.create_many({"username": "Batch" + str(i)} for \
+                i in range(15))
+        uids = [user.id for user in users]
+        self.assertEqual(uids, list(range(uids[0], uids[0] + 15)))
+        self.assertGreaterEqual(uids[0], first + 5)
+
+    def test_increment_resume(self):
+        """Reserve a new block after reopening the data connector."""
+        self.teardown_data_connector()
+        self.setup_data_connector(increment_block=10)
+        first = User._repository.create(username="First").id
+        self.teardown_data_connector()
+        self.setup_data_connector(increment_block=10)
+
+        # The unused values of the first block are lost
+        second = User._repository.create(username="Second").id
+        self.assertEqual(second, first + 10)
+        self.assertEqual(self.get_counter(User), first + 20)
+        self.assertEqual(User._repository.find(first).username, "First")
+
+    def test_duplicate_counters(self):
+        """Merge the duplicate counters left by the previous versions."""
+        uid = User._repository.create(username="Before").id
+        increments = self.dc.driver.increments[get_plural_name(User)]
+        increments.drop_index("name_key")
+        increments.insert({"name": "id", "current": uid + 50})
+        increments.insert({"name": "id", "current": uid + 20})
+        self.teardown_data_connector()
+        self.setup_data_connector()
+        increments = self.dc.driver.increments[get_plural_name(User)]
+        self.assertEqual(increments.find({"name": "id"}).count(), 1)
+        self.assertEqual(self.get_counter(User), uid + 50)
+        self.assertEqual(User._repository.create(username="After").id,
+                uid + 50)
+
+    def test_unset(self):
+        """Remove the fields set to None from the document."""
+        driver = self.dc.driver
+        self.assertEqual(driver.get_update_document({"username": "Name",
+                "password": None}), {"$set": {"username": "Name"},
+                "$unset": {"password": ""}})
+
+        user = User._repository.create(username="Unset", password="secret")
+        user.password = None
+        self.dc.release_connection()
+        document = self.get_document(User, user.id)
+        self.assertEqual(document["username"], "Unset")
+        self.assertNotIn("password", document)
+
+        # The unset field is read as None
+        uid = user.id
+        self.teardown_data_connector()
+        self.setup_data_connector()
+        self.assertIsNone(User._repository.find(uid).password)
+
+    def test_bulk_flush(self):
+        """Send the inserts, updates and deletions of a transaction."""
+        repository = User._repository
+        updated = repository.create(username="Updated")
+        removed = repository.create(username="Removed")
+        with self.dc.transaction():
+            added = repository.create(username="Added")
+            temporary = repository.create(username="Temporary")
+            updated.username = "Modified"
+            updated.password = None
+            repository.delete(removed)
+            repository.delete(temporary)
+
+            # Nothing is sent before the commit (or a query)
+            self.assertIsNone(self.get_document(User, added.id))
+            self.assertIsNotNone(self.get_document(User, removed.id))
+            self.assertEqual(self.get_document(User, updated.id)[
+                    "username"], "Updated")
+
+        self.assertEqual(self.dc.driver.pending, [])
+        self.assertEqual(self.get_document(User, added.id)["username"],
+                "Added")
+        self.assertIsNone(self.get_document(User, temporary.id))
+        self.assertIsNone(self.get_document(User, removed.id))
+        document = self.get_document(User, updated.id)
+        self.assertEqual(document["username"], "Modified")
+        self.assertNotIn("password", document)
+
+    def test_bulk_request(self):
+        """Send the updates of a request in bulk."""
+        repository = User._repository
+        users = [repository.create(username="User" + str(i),
+                password="secret") for i in range(3)]
+        self.dc.begin_request()
+        for user in users:
+            user.username += "!"
+            user.password = None
+
+        # The updates don't go through 'update_fields'
+        driver = self.dc.driver
+        calls = []
+        driver.update_fields = lambda *args: calls.append(args)
+        self.dc.release_connection()
+        self.assertEqual(calls, [])
+        self.assertEqual(driver.pending, [])
+        for user in users:
+            document = self.get_document(User, user.id)
+            self.assertEqual(document["username"], user.username)
+            self.assertNotIn("password", document)
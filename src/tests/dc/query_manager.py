@@ -40,7 +40,9 @@ inherit your class from AbstractQMTest as well as from AbstractDCTest.
 
 from datetime import datetime
 
+from model import Model, String
 from model.functions import *
+from query.query import Query
 from tests.model import *
 
 class AbstractQMTest:
@@ -56,6 +58,20 @@ class AbstractQMTest:
 
     Testing methods (some could be added, NOT MODIFIED):
         test_op_equal -- test the equal (=) operator
+        test_transaction_reads -- query the writes of a transaction
+        test_op_greaterthan -- test the > and >= operators
+        test_op_between -- test the between operator
+        test_op_in -- test the in operator
+        test_op_startswith -- test the startswith and like operators
+        test_op_isnull -- test the is null operator
+        test_iterate -- iterate over the result by batches
+        test_iterate_stream -- unlock the data connector while iterating
+        test_order_limit -- order and paginate the result
+        test_after -- paginate the result after an object
+        test_aggregates -- count and aggregate the selected objects
+        test_only -- select some fields only
+        test_same_shape -- execute queries with the same shape
+        test_reloaded_model -- execute a query on a reloaded model
 
     """
 
@@ -80,6 +96,60 @@ class AbstractQMTest:
         self.assertEqual(user.username, result.username)
         self.assertIs(result, user)
 
+    def test_op_equal_after_update(self):
+        """Test the = operator on an updated field."""
+        repository = User._repository
+        user = repository.create(username="Nemo", password="nothing")
+        user.username = "Nobody"
+        query = repository.query()
+        query.filter("username = ?", "Nemo")
+        self.assertEqual(query.execute(), [])
+        query = repository.query()
+        query.filter("username = ?", "Nobody")
+        result = query.execute(many=False)
+        self.assertIs(result, user)
+
+    def test_op_equal_in_transaction(self):
+        """Query an object updated in the current transaction."""
+        repository = User._repository
+        user = repository.create(username="Anna", password="unchanged")
+        with self.dc.transaction():
+            user.username = "Hanna"
+            query = repository.query()
+            query.filter("username = ?", "Hanna")
+            result = query.execute(many=False)
+
+        self.assertIs(result, user)
+
+    def test_transaction_reads(self):
+        """Query the writes of a transaction, then roll it back."""
+        repository = User._repository
+        kept = repository.create(username="Kept")
+        deleted = repository.create(username="Gone")
+        names = ["Kept", "Renamed", "Created", "Gone"]
+        try:
+            with self.dc.transaction():
+                kept.username = "Renamed"
+                created = repository.create(username="Created")
+                repository.delete(deleted)
+                query = repository.query()
+                query.filter("username in ?", names)
+                results = query.execute()
+                self.assertEqual(len(results), 2)
+                self.assertIn(kept, results)
+                self.assertIn(created, results)
+                query = repository.query()
+                query.filter("username in ?", names)
+                self.assertEqual(query.count(), 2)
+                raise RuntimeError("abort the transaction")
+        except RuntimeError:
+            pass
+
+        query = repository.query()
+        query.filter("username in ?", names)
+        self.assertEqual(sorted(user.username for user in query.execute()),
+                ["Gone", "Kept"])
+
     def test_op_notequal(self):
         """Test that the query manager correctly interpret the != operator."""
         repository = User._repository
@@ -114,6 +184,71 @@ class AbstractQMTest:
         self.assertIn(post_2, results)
         self.assertNotIn(post_3, results)
 
+    def test_op_greaterthan(self):
+        """Test the > and >= operators."""
+        repository = Post._repository
+        post_1, post_2, post_3 = self.create_posts()
+        query = repository.query()
+        query.filter("published_at > ?", post_2.published_at)
+        self.assertEqual(query.execute(), [post_3])
+        query = repository.query()
+        query.filter("published_at >= ?", post_2.published_at)
+        query.order_by("published_at")
+        self.assertEqual(query.execute(), [post_2, post_3])
+
+    def test_op_between(self):
+        """Test the between operator (both bounds are included)."""
+        repository = Post._repository
+        post_1, post_2, post_3 = self.create_posts()
+        query = repository.query()
+        query.filter("published_at between ? and ?", post_1.published_at,
+                datetime.strptime("2008", "%Y"))
+        query.order_by("published_at")
+        self.assertEqual(query.execute(), [post_1, post_2])
+
+    def test_op_in(self):
+        """Test the in operator."""
+        repository = User._repository
+        kyra = repository.create(username="Kyra", password="just guess")
+        carla = repository.create(username="Carla", password="***")
+        nemo = repository.create(username="Nemo", password="nothing")
+        query = repository.query()
+        query.filter("username in ?", ["Kyra", "Nemo", "Sam"])
+        results = query.execute()
+        self.assertEqual(len(results), 2)
+        self.assertIn(kyra, results)
+        self.assertIn(nemo, results)
+        query = repository.query()
+        query.filter("username in ?", [])
+        self.assertEqual(query.execute(), [])
+
+    def test_op_startswith(self):
+        """Test the startswith and like operators."""
+        repository = User._repository
+        kyra = repository.create(username="Kyra", password="just guess")
+        kim = repository.create(username="Kim_2", password="***")
+        repository.create(username="kirk", password="nothing")
+        query = repository.query()
+        query.filter("username startswith ?", "K")
+        query.order_by("username")
+        self.assertEqual(query.execute(), [kim, kyra])
+        query = repository.query()
+        query.filter("username startswith ?", "Kim_")
+        self.assertEqual(query.execute(), [kim])
+        query = repository.query()
+        query.filter("username like ?", "K_r%")
+        self.assertEqual(query.execute(), [kyra])
+
+    def test_op_isnull(self):
+        """Test the is null operator."""
+        post = Post._repository.create(title="post", content="")
+        repository = Comment._repository
+        comment_1 = repository.create(post=post, content="about the post")
+        comment_2 = repository.create(content="about nothing")
+        query = repository.query()
+        query.filter("post_id is null")
+        self.assertEqual(query.execute(), [comment_2])
+
     def test_connector_and(self):
         """Test that the 'and' connector works for the query manager."""
         repository = User._repository
@@ -123,3 +258,145 @@ class AbstractQMTest:
         query.filter("password = ?", "asis")
         result = query.execute(many=False)
         self.assertIs(result, user)
+
+    def test_iterate(self):
+        """Iterate over the result of a query by batches."""
+        post_1, post_2, post_3 = self.create_posts()
+        repository = Post._repository
+        query = repository.query()
+        query.filter("published_at <= ?", post_2.published_at)
+        result = list(query.iterate(batch_size=1))
+        self.assertEqual(len(result), 2)
+        self.assertIn(post_1, result)
+        self.assertIn(post_2, result)
+
+    def test_iterate_stream(self):
+        """Iterate over a query, unlocking the data connector.
+
+        The data connector is not locked while the objects (or the
+        rows) are processed.
+
+        """
+        posts = self.create_posts()
+        repository = Post._repository
+        result = []
+        for post in repository.query().iterate(batch_size=2):
+            self.assertFalse(self.is_locked())
+            result.append(post)
+
+        for post in posts:
+            self.assertIn(post, result)
+
+        query = repository.query().only("title")
+        titles = []
+        for row in query.iterate(batch_size=1):
+            self.assertFalse(self.is_locked())
+            titles.append(row.title)
+
+        self.assertEqual(sorted(titles), ["post1", "post2", "post3"])
+
+    def test_order_limit(self):
+        """Order the result and select a page with limit and offset."""
+        post_1, post_2, post_3 = self.create_posts()
+        repository = Post._repository
+        query = repository.query()
+        query.order_by("-published_at").limit(2)
+        self.assertEqual(query.execute(), [post_3, post_2])
+        query.offset(1)
+        self.assertEqual(query.execute(), [post_2, post_1])
+        query = repository.query()
+        query.filter("published_at <= ?", post_2.published_at)
+        query.order_by("title").offset(1)
+        self.assertEqual(query.execute(), [post_2])
+
+    def test_after(self):
+        """Select the pages of an ordered result after an object."""
+        post_1, post_2, post_3 = self.create_posts()
+        repository = Post._repository
+        query = repository.query()
+        query.order_by("published_at").limit(2)
+        page = query.execute()
+        self.assertEqual(page, [post_1, post_2])
+        query.after(page[-1])
+        self.assertEqual(query.execute(), [post_3])
+        query = repository.query()
+        query.order_by("-published_at").after(post_3)
+        self.assertEqual(query.execute(), [post_2, post_1])
+
+    def test_aggregates(self):
+        """Count and aggregate the selected objects."""
+        post_1, post_2, post_3 = self.create_posts()
+        repository = Post._repository
+        query = repository.query()
+        self.assertEqual(query.count(), 3)
+        self.assertTrue(query.exists())
+        self.assertEqual(query.max("published_at"), post_3.published_at)
+        ids = [post_1.id, post_2.id, post_3.id]
+        self.assertEqual(query.sum("id"), sum(ids))
+        self.assertEqual(query.avg("id"), sum(ids) / 3)
+        self.assertEqual(query.group_by("title").count(), {"post1": 1,
+                "post2": 1, "post3": 1})
+        query = repository.query()
+        query.filter("published_at < ?", post_1.published_at)
+        self.assertEqual(query.count(), 0)
+        self.assertFalse(query.exists())
+        self.assertIsNone(query.min("published_at"))
+        query = repository.query()
+        query.order_by("-published_at").limit(2)
+        self.assertEqual(query.count(), 2)
+        self.assertEqual(query.min("published_at"), post_2.published_at)
+
+    def test_only(self):
+        """Select some fields only, without building the objects."""
+        post_1, post_2, post_3 = self.create_posts()
+        repository = Post._repository
+        query = repository.query()
+        query.filter("published_at <= ?", post_2.published_at)
+        query.order_by("published_at").only("title", "published_at")
+        rows = query.execute()
+        self.assertEqual([row.title for row in rows], ["post1", "post2"])
+        self.assertEqual(rows[1].published_at, post_2.published_at)
+        self.assertEqual(list(query.iterate(batch_size=1)), rows)
+        query = repository.query()
+        query.order_by("-published_at")
+        self.assertEqual(query.values("id"), [(post_3.id, ), (post_2.id, ),
+                (post_1.id, )])
+
+    def test_same_shape(self):
+        """Execute the same query with different parameters."""
+        post_1, post_2, post_3 = self.create_posts()
+        repository = Post._repository
+        results = []
+        for post in (post_1, post_2, post_3):
+            query = repository.query()
+            query.filter("published_at <= ?", post.published_at)
+            query.filter("title != ?", "post1")
+            query.order_by("published_at").limit(1)
+            results.append(query.execute())
+
+        self.assertEqual(results, [[], [post_2], [post_2]])
+        plans = getattr(self.dc.query_manager, "plans", None)
+        if plans is not None:
+            self.assertGreaterEqual(plans.statistics()["hits"], 2)
+
+    def test_reloaded_model(self):
+        """Execute a query on a model replaced by another class.
+
+        The statements built for the previous class shouldn't be
+        used (see SQLQueryManager.build_select).
+
+        """
+        post_1, post_2, post_3 = self.create_posts()
+        query = Post._repository.query()
+        query.filter("title = ?", "post2")
+        self.assertEqual(query.execute(), [post_2])
+        plans = getattr(self.dc.query_manager, "plans", None)
+        if plans is not None:
+            misses = plans.statistics()["misses"]
+
+        reloaded = type(Post)("Post", (Model, ), {"title": String()})
+        query = Query(self.dc, reloaded)
+        query.filter("title = ?", "post2")
+        self.assertEqual(query.execute(), [post_2])
+        if plans is not None:
+            self.assertEqual(plans.statistics()["misses"], misses + 1)
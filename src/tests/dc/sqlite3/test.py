@@ -28,13 +28,56 @@
 
 """Test for the sqlite3 data connector."""
 
+from threading import Thread
 from unittest import TestCase
 
 from tests.dc.test import AbstractDCTest
 from tests.dc.query_manager import AbstractQMTest
+from tests.model import *
 from dc.sqlite3.connector import Sqlite3Connector
 
 class DCTest(AbstractDCTest, AbstractQMTest, TestCase):
 
     name = "sqlite3"
     connector = Sqlite3Connector
+
+class PooledDCTest(DCTest):
+
+    """Test the sqlite3 data connector with a pool of connections.
+
+    Testing methods:
+        test_concurrent_reads -- read while a transaction is running
+
+    """
+
+    options = {"pool": {"min_size": 1, "max_size": 4}}
+
+    def test_concurrent_reads(self):
+        """Read in a thread while another thread is in a transaction.
+
+        The reading thread uses its own connection:  it's not blocked
+        by the transaction and doesn't read its changes.
+
+        """
+        repository = User._repository
+        user = repository.create(username="Reader")
+        counts = []
+
+        def read():
+            query = repository.query()
+            query.filter("username = ?", "Reader")
+            counts.append(query.count())
+            self.dc.release_connection()
+
+        with self.dc.transaction():
+            user.username = "Writer"
+            query = repository.query()
+            query.filter("username = ?", "Writer")
+            self.assertEqual(query.count(), 1)
+            thread = Thread(target=read)
+            thread.start()
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+
+        self.assertEqual(counts, [1])
+        self.assertEqual(query.count(), 1)
@@ -50,12 +50,14 @@ class DCTest(AbstractDCTest, TestCase):
 
 import os
 from datetime import datetime
+from threading import Thread
 
 import yaml
 
 from model import exceptions as mod_exceptions
 from model.functions import *
-from model import Model
+from model import Model, String
+from model.compact import SlotField
 from repository import Repository
 from tests.model import *
 
@@ -75,22 +77,44 @@ class AbstractDCTest:
 
     Testing methods (some could be added, NOT MODIFIED):
         test_create -- try to create an object from a model
+        test_create_many -- try to create several objects at once
         test_update -- try to update an object
         test_save -- try to save and retrieve stored datas
         test_delete -- try to delete an object
+        test_transaction_commit -- commit changes made in a transaction
+        test_transaction_rollback -- roll back a transaction
+        test_transaction_update_fields -- update several fields at once
+        test_update_fields -- update several fields in a request
+        test_update_immediately -- write an update outside a request
         test_primary_keys -- test that the primary keys are unique
         test_auto_increment -- test the behavior of an autoincrement field
         test_auto_increment_delete -- check that old keys are not re-used
         test_default -- test the default value of a field
         test_find -- try to a retrieve a single object
         test_get_all -- try to retrieve all the created objects
+        test_iter_all -- iterate over the created objects by batches
+        test_stream -- unlock the data connector while streaming
+        test_bounded_cache -- retrieve objects evicted from the cache
+        test_prefetch -- load the related objects of several objects
+        test_relation_cache -- check that the related objects are cached
+        test_indexes -- check the indexes of the tables
+        test_field_registry -- add and remove fields of a model
+        test_compact -- store the fields of a compact model in slots
+        test_compact_inheritance -- inherit from a compact model
+        test_compact_update -- update the fields of a compact object
 
     Other methods:
         setUp -- set up the test case
         tearDown -- tear down the test case
+        is_locked -- return whether the data connector is locked
+
+    The 'options' class attribute can contain configuration entries
+    replacing the ones of the configuration file.
 
     """
 
+    options = {}
+
     def setUp(self):
         """Set up the data connector."""
         self.setup_data_connector()
@@ -100,17 +124,18 @@ class AbstractDCTest:
         """Destroy the data connector and tear it down."""
         self.teardown_data_connector(destroy=True)
 
-    def setup_data_connector(self):
+    def setup_data_connector(self, **options):
         """Setup the data_connector.
 
         If available, read the configuration file found in
         test/config/dc/{data_connector_name}.yml.  Otherwise, the
         file is created with the default configuration found in
-        dc/{data_connector_name}/parameters.yml.
+        dc/{data_connector_name}/parameters.yml.  The options replace
+        the configuration entries (as the 'options' class attribute).
 
         """
         self.dc = type(self).connector()
-        self.dc.setup_test()
+        self.dc.setup_test(**dict(type(self).options, **options))
         self.dc.repository_manager.record_models(models)
         for model in models:
             model._repository.data_connector = self.dc
@@ -127,6 +152,25 @@ class AbstractDCTest:
 
         self.dc = None
 
+    def is_locked(self):
+        """Return whether the data connector is locked.
+
+        The data connector is locked if another thread can't acquire
+        its 'u_lock'.
+
+        """
+        acquired = []
+
+        def acquire():
+            acquired.append(self.dc.u_lock.acquire(timeout=0.2))
+            if acquired[0]:
+                self.dc.u_lock.release()
+
+        thread = Thread(target=acquire)
+        thread.start()
+        thread.join()
+        return not acquired[0]
+
     def test_create(self):
         """Create a simple user."""
         repository = User._repository
@@ -134,6 +178,25 @@ class AbstractDCTest:
         self.assertEqual(user.username, "Kredh")
         self.assertEqual(user.password, "fore123")
 
+    def test_create_many(self):
+        """Create several users at once and retrieve them."""
+        repository = User._repository
+        names = ["Batch" + str(i) for i in range(5)]
+        users = repository.create_many(({"username": name} for name in \
+                names), batch_size=2)
+        self.assertEqual([user.username for user in users], names)
+        uids = [user.id for user in users]
+        self.assertEqual(len(set(uids)), len(uids))
+        self.assertEqual(uids, sorted(uids))
+        for user in users:
+            self.assertIs(repository.find(user.id), user)
+
+        # Each ID should be the one of the stored line
+        self.teardown_data_connector()
+        self.setup_data_connector()
+        for uid, name in zip(uids, names):
+            self.assertEqual(repository.find(uid).username, name)
+
     def test_update(self):
         """Create and update a simple user."""
         repository = User._repository
@@ -174,6 +237,96 @@ class AbstractDCTest:
         self.assertRaises(mod_exceptions.UpdateDeletedObject, setattr,
                 user, "username", "no")
 
+    def test_transaction_commit(self):
+        """Create and update users in a committed transaction."""
+        repository = User._repository
+        with self.dc.transaction():
+            user = repository.create(username="Tristan")
+            user.username = "Iseult"
+            other = repository.create(username="Mark")
+            repository.delete(other)
+
+        uid = user.id
+        self.teardown_data_connector()
+        self.setup_data_connector()
+        self.assertEqual(repository.find(uid).username, "Iseult")
+        self.assertRaises(mod_exceptions.ObjectNotFound, repository.find,
+                other.id)
+
+    def test_transaction_rollback(self):
+        """Update and create users in a transaction rolled back."""
+        repository = User._repository
+        user = repository.create(username="Before")
+        deleted = repository.create(username="Deleted")
+        try:
+            with self.dc.transaction():
+                user.username = "After"
+                created = repository.create(username="Never")
+                repository.delete(deleted)
+                raise RuntimeError("abort the transaction")
+        except RuntimeError:
+            pass
+
+        self.assertEqual(user.username, "Before")
+        self.assertIs(repository.find(deleted.id), deleted)
+        self.assertRaises(mod_exceptions.ObjectNotFound, repository.find,
+                created.id)
+        uid = user.id
+        self.teardown_data_connector()
+        self.setup_data_connector()
+        self.assertEqual(repository.find(uid).username, "Before")
+        self.assertEqual(repository.find(deleted.id).username, "Deleted")
+
+    def test_transaction_update_fields(self):
+        """Update several fields, including the primary key, at once."""
+        repository = Product._repository
+        product = repository.create(name="a bike", price=200, quantity=1)
+        with self.dc.transaction():
+            product.name = "a red bike"
+            product.price = 250
+            product.quantity = 2
+            self.assertTrue(product._dirty)
+
+        self.assertFalse(product._dirty)
+        self.teardown_data_connector()
+        self.setup_data_connector()
+        product = repository.find("a red bike")
+        self.assertEqual(product.price, 250)
+        self.assertEqual(product.quantity, 2)
+        self.assertRaises(mod_exceptions.ObjectNotFound, repository.find,
+                "a bike")
+
+    def test_update_fields(self):
+        """Update several fields in a request, outside of a transaction."""
+        repository = Product._repository
+        product = repository.create(name="a car", price=900, quantity=1)
+        self.dc.begin_request()
+        product.name = "a blue car"
+        product.price = 950
+        product.quantity = 3
+        self.assertEqual(product._dirty, {"name": "a car", "price": 900,
+                "quantity": 1})
+        self.dc.release_connection()
+        self.assertFalse(product._dirty)
+        self.teardown_data_connector()
+        self.setup_data_connector()
+        product = repository.find("a blue car")
+        self.assertEqual(product.price, 950)
+        self.assertEqual(product.quantity, 3)
+        self.assertRaises(mod_exceptions.ObjectNotFound, repository.find,
+                "a car")
+
+    def test_update_immediately(self):
+        """Write an update made outside of a request immediately."""
+        repository = Product._repository
+        product = repository.create(name="a bike", price=100, quantity=2)
+        product.price = 120
+        self.assertFalse(product._dirty)
+        self.assertFalse(self.dc.repository_manager.is_dirty(product))
+        self.teardown_data_connector()
+        self.setup_data_connector()
+        self.assertEqual(repository.find("a bike").price, 120)
+
     def test_primary_keys(self):
         """Test that no created user has the same ID as another."""
         repository = User._repository
@@ -271,6 +424,82 @@ class AbstractDCTest:
         users = repository.get_all()
         self.assertIn(user, users)
 
+    def test_iter_all(self):
+        """Create users and iterate over them by batches."""
+        repository = User._repository
+        users = [repository.create(username="Stream" + str(i)) for i in \
+                range(5)]
+        streamed = list(repository.iter_all(batch_size=2))
+        for user in users:
+            self.assertIn(user, streamed)
+
+        usernames = [user.username for user in repository.iter_all(
+                batch_size=3, cache=False)]
+        self.assertEqual(sorted(usernames), sorted(user.username for \
+                user in users))
+
+    def test_stream(self):
+        """Stream the objects, unlocking the data connector between them.
+
+        The data connector is only locked to get the next element,
+        unless the driver can read concurrently.
+
+        """
+        repository = User._repository
+        users = [repository.create(username="Flow" + str(i)) for i in \
+                range(5)]
+        streamed = []
+        for user in repository.iter_all(batch_size=2):
+            self.assertFalse(self.is_locked())
+            streamed.append(user)
+
+        for user in users:
+            self.assertIn(user, streamed)
+
+        def elements():
+            for i in range(3):
+                yield self.is_locked()
+
+        locked = not self.dc.driver.concurrent_reads
+        self.assertEqual(list(self.dc.stream(elements())), [locked] * 3)
+        self.assertFalse(self.is_locked())
+
+    def test_bounded_cache(self):
+        """Create users with a bounded cache and retrieve them.
+
+        The objects evicted from the cache should still be found
+        (and cached again) by the data connector.
+
+        """
+        repository = User._repository
+        repository_manager = self.dc.repository_manager
+        repository_manager.set_cache_policies({
+                "default": {"policy": "lru", "max_entries": 2}})
+        users = [repository.create(username="Cached" + str(i)) for i in \
+                range(3)]
+        statistics = repository_manager.get_cache_statistics()[
+                get_name(User)]
+        if statistics["policy"] == "lru":
+            self.assertEqual(statistics["size"], 2)
+            self.assertEqual(statistics["evictions"], 1)
+
+        for user in users:
+            found = repository.find(user.id)
+            self.assertEqual(found.username, user.username)
+            self.assertIs(repository.find(user.id), found)
+
+        # The objects modified in a transaction and the created one
+        # are not evicted
+        with self.dc.transaction():
+            first, second = repository.get_all()[:2]
+            first.username = "Dirty1"
+            second.username = "Dirty2"
+            created = repository.create(username="Cached3")
+            self.assertIs(repository.find(created.id), created)
+            self.assertIs(repository.find(first.id), first)
+
+        self.assertIs(repository.find(created.id), created)
+
     def test_datetime(self):
         """Test that a datetime field is well stored."""
         repository = Post._repository
@@ -316,6 +545,155 @@ class AbstractDCTest:
         self.assertIs(comment_2.post, post_2)
         self.assertIn(comment_2, post_2.comments)
 
+    def test_prefetch(self):
+        """Load the comments of several posts at once."""
+        post_repository = Post._repository
+        comment_repository = Comment._repository
+        post_1 = post_repository.create(title="first", content="one")
+        post_2 = post_repository.create(title="second", content="two")
+        post_3 = post_repository.create(title="third", content="three")
+        comment_1 = comment_repository.create(post=post_1, content="a")
+        comment_2 = comment_repository.create(post=post_1, content="b")
+        comment_3 = comment_repository.create(post=post_2, content="c")
+        query = post_repository.query()
+        posts = query.prefetch("comments").execute()
+        self.assertEqual(len(posts), 3)
+        for post in posts:
+            self.assertTrue(Post.comments.get_cache(post).mirror.loaded)
+
+        self.assertEqual(sorted(comment.content for comment in \
+                post_1.comments), ["a", "b"])
+        self.assertEqual(list(post_2.comments), [comment_3])
+        self.assertEqual(list(post_3.comments), [])
+        comments = [comment_1, comment_2, comment_3]
+        comment_repository.prefetch(comments, "post")
+        self.assertIs(comment_3.post, post_2)
+
+    def test_relation_cache(self):
+        """Retrieve the comments of a post only when needed."""
+        post_repository = Post._repository
+        comment_repository = Comment._repository
+        repository_manager = self.dc.repository_manager
+        find_matching_objects = repository_manager.find_matching_objects
+        calls = []
+        def counted(field, value):
+            calls.append(value)
+            return find_matching_objects(field, value)
+
+        repository_manager.find_matching_objects = counted
+        post_1 = post_repository.create(title="first", content="one")
+        post_2 = post_repository.create(title="second", content="two")
+        comment_1 = comment_repository.create(post=post_1, content="a")
+        comment_2 = comment_repository.create(post=post_1, content="b")
+        self.assertEqual(len(post_1.comments), 2)
+        self.assertEqual(len(post_1.comments), 2)
+        self.assertEqual(len(calls), 1)
+
+        # Changing the foreign key invalidates both lists
+        comment_2.post = post_2
+        self.assertEqual(list(post_1.comments), [comment_1])
+        self.assertEqual(list(post_2.comments), [comment_2])
+        self.assertEqual(len(calls), 3)
+
+        # Explicit refresh
+        Post.comments.get_cache(post_1).mirror.elements[:] = []
+        post_1.comments.refresh()
+        self.assertEqual(list(post_1.comments), [comment_1])
+        self.assertEqual(len(calls), 4)
+
+    def test_indexes(self):
+        """Check that the indexed fields and foreign keys are indexed."""
+        repository_manager = self.dc.repository_manager
+        table = repository_manager.build_table(Comment)
+        self.assertIn(("comments_post_id_idx", ("post_id", ), False),
+                table.indexes)
+        table = repository_manager.build_table(Post)
+        self.assertEqual(table.indexes, [("posts_published_at_idx",
+                ("published_at", ), False)])
+        table.add_index(["title", "published_at"], unique=True)
+        self.assertEqual(table.indexes[-1][0],
+                "posts_title_published_at_key")
+        self.assertRaises(ValueError, table.add_index, ["unknown"])
+
+    def test_field_registry(self):
+        """Add and remove a field after the creation of a model.
+
+        The field registries of the model and of its subclasses
+        should be built again.
+
+        """
+        class Note(Model):
+            text = String()
+
+        class Memo(Note):
+            pass
+
+        registry = get_registry(Note)
+        self.assertEqual([field.field_name for field in get_fields(Note)],
+                ["id", "text"])
+        self.assertIs(get_registry(Note), registry)
+        Note.title = String()
+        self.assertIsNot(get_registry(Note), registry)
+        self.assertEqual([field.field_name for field in get_fields(Note,
+                register=True)], ["id", "text", "title"])
+        self.assertIn("title", get_registry(Memo).by_name)
+        del Note.title
+        self.assertNotIn("title", get_registry(Note).by_name)
+        self.assertNotIn("title", get_registry(Memo).by_name)
+        self.assertEqual(get_pkey_names(Memo), ["id"])
+
+    def test_compact(self):
+        """Store the fields of a compact model in slots."""
+        self.assertEqual(Tag.__slots__, ("_f_id", "_f_name", "_f_weight"))
+        self.assertIsInstance(Tag.name, SlotField)
+        self.assertIsInstance(Tag.name, String)
+        repository = Tag._repository
+        tag = repository.create(name="python")
+        self.assertFalse(hasattr(tag, "__dict__"))
+        self.assertEqual(tag.name, "python")
+        self.assertEqual(tag.weight, 1)
+        self.assertIs(repository.find(tag.id), tag)
+
+        # A field which is not set returns the field itself
+        unsaved = Tag(name="yaml")
+        self.assertIs(unsaved.id, Tag.id)
+
+        # Only the fields can be set, the other models keep a dictionary
+        self.assertRaises(AttributeError, setattr, unsaved, "unknown", 1)
+        self.assertTrue(hasattr(User(username="plain"), "__dict__"))
+
+    def test_compact_inheritance(self):
+        """Inherit from a compact model:  only the new fields get slots."""
+        class Label(Tag):
+            color = String()
+
+        self.assertEqual(Label.__slots__, ("_f_color", ))
+        self.assertIsInstance(Label.color, SlotField)
+        self.assertIsInstance(Label.name, SlotField)
+        self.assertIsNot(Label.name, Tag.name)
+        label = Label(name="urgent", color="red")
+        self.assertFalse(hasattr(label, "__dict__"))
+        self.assertEqual((label.name, label.color, label.weight),
+                ("urgent", "red", 1))
+
+    def test_compact_update(self):
+        """Update the fields of a compact object."""
+        repository = Tag._repository
+        tag = repository.create(name="sql", weight=2)
+        update_attr(tag, "weight", 5)
+        self.assertEqual(tag.weight, 5)
+        self.assertFalse(tag._dirty)
+        self.dc.begin_request()
+        tag.name = "SQL"
+        tag.weight = 3
+        self.assertEqual(tag._dirty, {"name": "sql", "weight": 5})
+        self.assertFalse(hasattr(tag, "__dict__"))
+        uid = tag.id
+        self.teardown_data_connector()
+        self.setup_data_connector()
+        tag = repository.find(uid)
+        self.assertEqual((tag.name, tag.weight), ("SQL", 3))
+
     def test_many2one(self):
         """Test the many2one relation between posts and comments."""
         post_repository = Post._repository
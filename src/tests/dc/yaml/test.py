@@ -26,15 +26,251 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 
-"""Test for the sqlite3 data connector."""
+"""Test for the YAML data connector."""
 
+import os
+import pickle
 from unittest import TestCase
 
+from model.functions import get_plural_name
 from tests.dc.test import AbstractDCTest
 from tests.dc.query_manager import AbstractQMTest
+from tests.model import *
 from dc.yaml.connector import YAMLConnector
 
 class DCTest(AbstractDCTest, AbstractQMTest, TestCase):
 
+    """Test the YAML data connector.
+
+    Testing methods:
+        test_snapshot -- read the table from its snapshot
+        test_stale_snapshot -- ignore a snapshot older than its file
+        test_corrupt_snapshot -- ignore a snapshot which can't be read
+        test_background_writer -- write the tables in the background
+        test_write_error -- keep the file if it can't be written
+        test_unshard -- read a sharded table without shards
+        test_unshard_crash -- crash while a table is unsharded
+        test_shard_crash -- crash while a table is sharded
+        test_index_startswith -- startswith on a sorted date index
+
+    """
+
     name = "yaml"
     connector = YAMLConnector
+
+    def get_path(self, model, extension=".yml"):
+        """Return the path of the model's table file."""
+        return self.dc.driver.location + "/" + get_plural_name(model) + \
+                extension
+
+    def get_temporary_files(self, location):
+        """Return the temporary files left in the location."""
+        return [filename for filename in os.listdir(location) if \
+                filename.endswith(".tmp")]
+
+    def crash_after(self, method_name, calls):
+        """Make a method of the driver fail after some calls.
+
+        The data connector is closed without saving when the method
+        fails, as if the process had crashed.
+
+        """
+        driver = self.dc.driver
+        method = getattr(driver, method_name)
+        counter = [0]
+
+        def crash(*args):
+            counter[0] += 1
+            if counter[0] > calls:
+                raise RuntimeError("crash")
+
+            return method(*args)
+
+        setattr(driver, method_name, crash)
+        self.assertRaises(RuntimeError, self.dc.repository_manager.save)
+        driver.close()
+        self.dc = None
+
+    def create_saved_user(self, username):
+        """Create an user, save it and close the data connector.
+
+        The ID of the user is returned.
+
+        """
+        user = User._repository.create(username=username)
+        self.teardown_data_connector()
+        return user.id
+
+    def test_snapshot(self):
+        """Read the table from its snapshot, if the file didn't change."""
+        path = self.get_path(User, ".pickle")
+        uid = self.create_saved_user("Snap")
+        with open(path, "rb") as file:
+            signature, datas = pickle.load(file)
+
+        # Modify the snapshot only:  the file isn't read
+        for line in datas[1:]:
+            if line["id"] == uid:
+                line["username"] = "FromSnapshot"
+
+        with open(path, "wb") as file:
+            pickle.dump((signature, datas), file)
+
+        self.setup_data_connector()
+        self.assertEqual(User._repository.find(uid).username,
+                "FromSnapshot")
+
+    def test_stale_snapshot(self):
+        """Ignore the snapshot if the file was modified since."""
+        path = self.get_path(User)
+        uid = self.create_saved_user("Stale")
+        with open(path, "r") as file:
+            content = file.read()
+
+        with open(path, "w") as file:
+            file.write(content.replace("Stale", "Modified"))
+
+        self.setup_data_connector()
+        self.assertEqual(User._repository.find(uid).username, "Modified")
+
+        # The snapshot has been written again
+        datas = self.dc.driver.read_snapshot(get_plural_name(User))
+        self.assertIn("Modified", [line["username"] for line in datas[1:]])
+
+    def test_corrupt_snapshot(self):
+        """Read the file if its snapshot can't be read."""
+        path = self.get_path(User, ".pickle")
+        uid = self.create_saved_user("Corrupt")
+        with open(path, "wb") as file:
+            file.write(b"not a pickle")
+
+        self.setup_data_connector()
+        self.assertEqual(User._repository.find(uid).username, "Corrupt")
+
+    def test_background_writer(self):
+        """Write the saved tables with the background writer."""
+        self.teardown_data_connector()
+        self.setup_data_connector(flush_interval=60)
+        path = self.get_path(User)
+        location = self.dc.driver.location
+        user = User._repository.create(username="Background")
+        self.dc.repository_manager.save()
+
+        # The table waits for the background writer
+        self.assertIn(get_plural_name(User), self.dc.driver.pending)
+        if os.path.exists(path):
+            with open(path, "r") as file:
+                self.assertNotIn("Background", file.read())
+
+        self.dc.driver.flush()
+        self.assertEqual(self.dc.driver.pending, {})
+        with open(path, "r") as file:
+            self.assertIn("Background", file.read())
+
+        # Closing the data connector writes the waiting tables
+        user.username = "Closed"
+        self.teardown_data_connector()
+        with open(path, "r") as file:
+            self.assertIn("Closed", file.read())
+
+        self.assertEqual(self.get_temporary_files(location), [])
+        self.setup_data_connector()
+        self.assertEqual(User._repository.find(user.id).username, "Closed")
+
+    def test_write_error(self):
+        """Keep the file intact if it can't be written."""
+        User._repository.create(username="Intact")
+        self.dc.repository_manager.save()
+        path = self.get_path(User)
+        with open(path, "r") as file:
+            content = file.read()
+
+        with self.assertRaises(TypeError):
+            self.dc.driver.write_file(path, 42)
+
+        with open(path, "r") as file:
+            self.assertEqual(file.read(), content)
+
+        self.assertEqual(self.get_temporary_files(self.dc.driver.location),
+                [])
+
+    def test_unshard(self):
+        """Read and merge the shards of a table no longer sharded."""
+        self.teardown_data_connector()
+        self.setup_data_connector(shards=4)
+        location = self.dc.driver.location
+        stem = get_plural_name(User)
+        ids = [User._repository.create(username="user{}".format(i)).id \
+                for i in range(10)]
+        self.teardown_data_connector()
+        self.assertTrue(any(filename.startswith(stem + ".") and \
+                filename.endswith(".yml") and filename != stem + ".yml" \
+                for filename in os.listdir(location)))
+
+        self.setup_data_connector()
+        for i, id in enumerate(ids):
+            self.assertEqual(User._repository.find(id).username,
+                    "user{}".format(i))
+
+        user = User._repository.create(username="new")
+        self.assertNotIn(user.id, ids)
+        self.dc.repository_manager.save()
+        filenames = os.listdir(location)
+        self.assertIn(stem + ".yml", filenames)
+        self.assertEqual([filename for filename in filenames if \
+                filename.startswith(stem + ".") and filename.count(".") > 1],
+                [])
+
+    def test_index_startswith(self):
+        """Filter a date field with a sorted index by a prefix."""
+        repository = Post._repository
+        repository.create(title="first", content="")
+        repository.create(title="second", content="")
+        index = self.dc.repository_manager.get_index(Post, "published_at")
+        self.assertEqual(index.starts_with("20"), [])
+        self.assertEqual(index.like("20%"), [])
+        query = repository.query()
+        query.filter("published_at startswith ?", "20")
+        self.assertEqual(query.execute(), [])
+
+    def test_unshard_crash(self):
+        """Crash before the shards of an unsharded table are removed."""
+        self.teardown_data_connector()
+        self.setup_data_connector(shards=4)
+        uids = [User._repository.create(username="user{}".format(i)).id \
+                for i in range(10)]
+        self.teardown_data_connector()
+        self.setup_data_connector()
+        User._repository.find(uids[0]).username = "renamed"
+
+        # The table file is written, the shards are not removed
+        self.crash_after("remove_files", 0)
+        self.setup_data_connector()
+        self.assertEqual(User._repository.find(uids[0]).username,
+                "renamed")
+        self.assertEqual(len(User._repository.get_all()), 10)
+
+    def test_shard_crash(self):
+        """Crash before every shard of a sharded table is written."""
+        location = self.dc.driver.location
+        uids = [User._repository.create(username="user{}".format(i)).id \
+                for i in range(10)]
+        self.teardown_data_connector()
+        self.setup_data_connector(shards=4)
+        User._repository.find(uids[0]).username = "renamed"
+
+        # The table file and a shard are written
+        self.crash_after("dump_table", 2)
+        self.setup_data_connector(shards=4)
+        self.assertEqual(User._repository.find(uids[0]).username,
+                "renamed")
+        self.assertEqual(len(User._repository.get_all()), 10)
+
+        # Once saved, the table is only stored in its shards
+        self.dc.repository_manager.save()
+        filenames = os.listdir(location)
+        stem = get_plural_name(User)
+        self.assertNotIn(stem + ".yml", filenames)
+        self.assertEqual(sorted(filename for filename in filenames if \
+                filename.startswith(stem + ".") and filename.endswith(
+                ".yml")), [stem + ".{}.yml".format(i) for i in range(4)])
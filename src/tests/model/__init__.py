@@ -32,6 +32,7 @@ from tests.model.command import Command
 from tests.model.comment import Comment
 from tests.model.post import Post
 from tests.model.product import Product
+from tests.model.tag import Tag
 from tests.model.user import User
 
-models = [Command, Comment, Post, Product, User]
+models = [Command, Comment, Post, Product, Tag, User]
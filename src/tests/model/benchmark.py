@@ -0,0 +1,137 @@
+# Copyright (c) 2013 LE GOFF Vincent
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the names of its contributors
+#   may be used to endorse or promote products derived from this software
+#   without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT
+# OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Memory benchmark of the compact models (see model.compact).
+
+For each model defined in tests.model, a plain and a compact copy are
+created (models inheriting from Model with the same fields, so that
+the compact copy doesn't inherit the dictionary of a plain model) and
+the memory used by the objects of both copies is measured with
+tracemalloc.  The saving
+depends on the Python version, which is displayed.  Run it from the
+source directory:
+    python -m tests.model.benchmark [number of objects]
+
+The models aren't connected to a data connector, therefore their
+relations aren't extended:  the foreign key slots of the compact models
+(see Comment or Product) are preallocated but not used here.
+
+"""
+
+from datetime import datetime
+import platform
+import sys
+import tracemalloc
+
+from model import *
+from model.functions import get_fields
+from tests.model import models
+
+VALUES = {
+    DateTime: datetime(2013, 1, 1),
+    Integer: 0,
+    String: "value",
+}
+
+def get_values(model, i):
+    """Return the keyword arguments to create an object of this model.
+
+    The values are shared between objects (only the integer primary
+    keys change) so that only the objects themselves are measured.
+
+    """
+    values = {}
+    for field in get_fields(model, register=True):
+        field_type = getattr(type(field), "plain_type", None) or \
+                type(field)
+        value = VALUES[field_type]
+        if field.has_constraint("pkey"):
+            value = i if field_type is Integer else value + str(i)
+
+        values[field.field_name] = value
+
+    return values
+
+def copy_model(model, compact):
+    """Return a plain or compact copy of the model.
+
+    The copy inherits from Model and has a copy of each field of the
+    model (and its other class attributes).
+
+    """
+    attributes = {}
+    ignored = ("__dict__", "__weakref__", "__slots__", "_field_registry") + \
+            tuple(getattr(model, "__slots__", ()))
+    for name, value in vars(model).items():
+        if name in ignored:
+            continue
+
+        if isinstance(value, BaseType):
+            value = value.copy()
+            if value.constraint:
+                value.constraint.base_type = value
+
+        attributes[name] = value
+
+    attributes["compact"] = compact
+    return MetaModel(model.__name__, (Model, ), attributes)
+
+def measure(model, number):
+    """Return the number of bytes used by an object of this model."""
+    arguments = [get_values(model, i) for i in range(number)]
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    objects = [model(**values) for values in arguments]
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del objects
+    return size / number
+
+def run(number=10000):
+    """Measure and display the memory used by the test models.
+
+    The compact objects shouldn't have a dictionary:  an
+    AssertionError is raised otherwise.
+
+    """
+    print("{} {}, {} objects".format(platform.python_implementation(),
+            platform.python_version(), number))
+    print("{:<10} {:>10} {:>10} {:>7}".format("Model", "Plain",
+            "Compact", "Saved"))
+    for model in models:
+        compact = copy_model(model, True)
+        assert not hasattr(compact(**get_values(compact, 0)), "__dict__")
+        plain = measure(copy_model(model, False), number)
+        slotted = measure(compact, number)
+        print("{:<10} {:>10.1f} {:>10.1f} {:>6.1f}%".format(
+                model.__name__, plain, slotted,
+                (plain - slotted) / plain * 100))
+
+if __name__ == "__main__":
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    run(number)
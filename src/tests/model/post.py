@@ -36,5 +36,6 @@ class Post(Model):
 
     title = String()
     content = String()
-    published_at = DateTime(default=lambda o: datetime.now())
+    published_at = DateTime(default=lambda o: datetime.now(),
+            index="sorted")
     comments = HasMany("Comment")
@@ -32,7 +32,7 @@ class User(Model):
     
     """A user model."""
     
-    username = String()
+    username = String(index=True)
     password = String(default="unknown")
     
     def __repr__(self):
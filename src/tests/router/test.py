@@ -0,0 +1,143 @@
+# Copyright (c) 2013 LE GOFF Vincent
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# * Neither the name of the copyright holder nor the names of its contributors
+#   may be used to endorse or promote products derived from this software
+#   without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT
+# OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+
+"""Test for the route index used by the dispatcher."""
+
+from unittest import TestCase
+
+from router.index import RouteIndex
+from router.route import Route
+
+class Request:
+
+    """A request, as seen by Route.match (only the method is used)."""
+
+    def __init__(self, method):
+        self.method = method
+
+
+class RouteIndexTest(TestCase):
+
+    """Test case for the router.index.RouteIndex class.
+
+    Testing methods:
+        test_precedence -- the first declared route wins
+        test_patterns -- the groups of the matching route are returned
+        test_methods -- the routes are filtered by HTTP method
+        test_format -- the format dependent routes are tested with the format
+        test_no_match -- no route matches the path
+
+    """
+
+    def setUp(self):
+        """Build the routes and their index."""
+        self.routes = [
+            Route("/users", None, None),
+            Route("/users/{id}", None, None),
+            Route("/users/{slug}", None, None),
+            Route("/comments/{?id}", None, None),
+            Route("/users/new", None, None, methods="POST"),
+            Route("/users/new", None, None),
+        ]
+        self.index = RouteIndex(self.routes)
+
+    def match(self, path, method="GET", without_format=None):
+        """Match the path with the index and check the linear result.
+
+        The route and groups returned by the index should be the ones
+        of the first route whose 'match' method succeeds.
+
+        """
+        if without_format is None:
+            without_format = path
+
+        expected = None
+        for route in self.routes:
+            to_test = path if route.format_dependent else without_format
+            groups = route.match(Request(method), to_test)
+            if groups is not False:
+                expected = (route, groups)
+                break
+
+        result = self.index.match(method, path, without_format)
+        self.assertEqual(result, expected)
+        return result
+
+    def test_precedence(self):
+        """Match a path matched by several routes."""
+        route, groups = self.match("/users/12")
+        self.assertIs(route, self.routes[1])
+        self.assertEqual(groups, ("12", ))
+        route, groups = self.match("/users/new")
+        self.assertIs(route, self.routes[2])
+        self.assertEqual(groups, ("new", ))
+
+    def test_patterns(self):
+        """Return the groups of a route placed after other patterns."""
+        route, groups = self.match("/comments/8")
+        self.assertIs(route, self.routes[3])
+        self.assertEqual(groups, ("8", ))
+        route, groups = self.match("/comments/")
+        self.assertIs(route, self.routes[3])
+        self.assertEqual(groups, (None, ))
+
+    def test_methods(self):
+        """Match routes restricted to some HTTP methods."""
+        routes = [
+            Route("/login", None, None, methods="POST"),
+            Route("/login", None, None, methods=["GET", "HEAD"]),
+            Route("/login", None, None),
+        ]
+        self.routes = routes
+        self.index = RouteIndex(routes)
+        self.assertIs(self.match("/login", "post")[0], routes[0])
+        self.assertIs(self.match("/login", "GET")[0], routes[1])
+        self.assertIs(self.match("/login", "DELETE")[0], routes[2])
+
+    def test_format(self):
+        """Match format dependent and independent routes."""
+        dependent = Route("/export.{slug}", None, None)
+        dependent.format_dependent = True
+        self.routes = [Route("/export", None, None), dependent,
+                Route("/export.csv", None, None)]
+        self.index = RouteIndex(self.routes)
+        self.assertIs(self.match("/export.json", without_format="/export")[0],
+                self.routes[0])
+        self.routes[0].methods = ("POST", )
+        self.index = RouteIndex(self.routes)
+        route, groups = self.match("/export.json", without_format="/export")
+        self.assertIs(route, dependent)
+        self.assertEqual(groups, ("json", ))
+
+    def test_no_match(self):
+        """Match a path without matching route."""
+        self.assertIsNone(self.match("/unknown"))
+        self.assertIsNone(self.match("/users/12/edit"))
+        self.assertIsNone(self.match("/comments/new"))
+        self.assertIsNone(RouteIndex([]).match("GET", "/", "/"))